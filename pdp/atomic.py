@@ -0,0 +1,26 @@
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+
+@contextmanager
+def atomic_write(path: str | Path, mode: str = "w"):
+    """Open a temporary file next to `path` for writing, and rename it over
+    `path` once the block succeeds. Readers, and a crash mid-write, only
+    ever see the old or the new contents, never a partial file."""
+    path = Path(path)
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+
+    try:
+        try:
+            os.chmod(temp_path, path.stat().st_mode)
+        except FileNotFoundError:
+            os.chmod(temp_path, 0o644)
+
+        with os.fdopen(fd, mode) as f:
+            yield f
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
@@ -0,0 +1,117 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from .task import Task
+from .hashing import HashIndex, entries_digest, folder_digest
+from .scan import top_level_files
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+# ioctl that asks the file system to share the source file's blocks with the
+# destination (copy-on-write), as `cp --reflink` does.
+FICLONE = 0x40049409
+
+
+def clone_file(source: str, destination: str) -> str:
+    """Copy a file as a reflink where the file system supports it, so
+    restoring from the cache is instant and takes no space, and as a
+    regular copy otherwise. Unlike hard links, the copy can be modified
+    without affecting the cache."""
+    if fcntl is not None:
+        try:
+            with open(source, "rb") as src, open(destination, "wb") as dst:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                if os.fstat(dst.fileno()).st_size != os.fstat(src.fileno()).st_size:
+                    raise OSError("Incomplete clone")
+            shutil.copystat(source, destination)
+            return destination
+        except OSError:
+            pass
+
+    return shutil.copy2(source, destination)
+
+
+def cache_key(
+    task: Task,
+    key: str,
+    dependencies: dict[str, Task] | None = None,
+    index: HashIndex | None = None,
+) -> str:
+    """A hash of the task's key, the contents of its input and src folders,
+    the files at the top of its directory, its entrypoint, and the outputs
+    of its `dependencies` by key. Unlike the build state's fingerprints it
+    does not depend on modification times, so it matches across checkouts
+    and machines. Given an `index`, only files that changed since they were
+    last hashed are read."""
+    hasher = hashlib.blake2b()
+    hasher.update(f"key\0{key}\n".encode())
+    hasher.update(f"entrypoint\0{task.entrypoint}\n".encode())
+
+    for folder in (task.input_folder, task.src_folder):
+        hasher.update(f"folder\0{folder.name}\n".encode())
+        folder_digest(folder, hasher, index)
+
+    hasher.update(b"task\n")
+    entries_digest(top_level_files(task.task_directory), hasher, index)
+
+    # Dependencies have finished by the time a task runs, so their outputs
+    # cover whatever the task reads from them, including through their own
+    # dependencies.
+    dependencies = dependencies or {}
+    for dependency_key in sorted(dependencies):
+        hasher.update(f"dependency\0{dependency_key}\n".encode())
+        folder_digest(dependencies[dependency_key].output_folder, hasher, index)
+
+    return hasher.hexdigest()
+
+
+class OutputCache:
+    """Task outputs stored by the cache key of the inputs that produced
+    them. The cache directory can be shared between checkouts, and between
+    machines over a network file system."""
+
+    def __init__(self, directory: str | Path) -> None:
+        self.directory = Path(directory)
+
+    def entry(self, key: str) -> Path:
+        return self.directory / key[:2] / key
+
+    def restore(self, key: str, output_folder: Path) -> bool:
+        """Replace `output_folder` with the cached outputs for `key`.
+        Returns False if nothing is cached for `key`."""
+        entry = self.entry(key)
+        if not entry.is_dir():
+            return False
+
+        if output_folder.exists():
+            shutil.rmtree(output_folder)
+
+        shutil.copytree(entry, output_folder, copy_function=clone_file)
+        return True
+
+    def store(self, key: str, output_folder: Path) -> None:
+        entry = self.entry(key)
+        if entry.exists() or not output_folder.exists():
+            return
+
+        entry.parent.mkdir(parents=True, exist_ok=True)
+
+        # Copy into a staging folder and rename it into place, so that other
+        # checkouts never see a partially written entry.
+        staging = Path(tempfile.mkdtemp(dir=entry.parent, prefix=f".{key}."))
+        try:
+            shutil.copytree(
+                output_folder, staging, copy_function=clone_file, dirs_exist_ok=True
+            )
+            os.rename(staging, entry)
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+            # Another checkout may have stored the same outputs first.
+            if not entry.exists():
+                raise
@@ -1,23 +1,41 @@
+import json
+import os
+import signal
+import sys
+import threading
+from enum import Enum
+
 import typer
 from typing_extensions import Annotated
 from rich.console import Console
-from rich import print as rprint
 
-from pdp.pdp import PDP, PDPConfig
+from pdp.pdp_errors import InvalidConfigError, UninitializedProjectError
+
+# The rest of pdp is imported inside the commands that use it, so that
+# `pdp --help` and typos do not pay for loading it.
 
 app = typer.Typer()
 err_console = Console(stderr=True)
 console = Console()
 
 
-def load_pdp():
+def load_pdp(read_only: bool = False):
+    from pdp.pdp import PDP
+
     pdp = PDP()
 
     if not pdp.initialized:
         err_console.print("No project detected. Try `pdp init`.")
         raise typer.Exit(1)
 
-    pdp.initialize()
+    if read_only:
+        try:
+            pdp.load()
+        except (InvalidConfigError, UninitializedProjectError) as e:
+            err_console.print(str(e))
+            raise typer.Exit(1)
+    else:
+        pdp.initialize()
 
     #    if not pdp.validate():
     #        err_console.print("Invalid pdp.yml file.")
@@ -33,6 +51,7 @@ def init(
     """
     Initialize the project.
     """
+    from pdp.pdp import PDP
 
     pdp = PDP(project_name)
     pdp.initialize()
@@ -57,8 +76,7 @@ def create(task_names: list[str]) -> None:
     pdp = load_pdp()
 
     try:
-        for task_name in task_names:
-            pdp.create_task_from_current_location(task_name)
+        pdp.create_tasks_from_current_location(task_names)
     except ValueError:
         err_console.print(
             "Cannot create task from current location. Not at project root or a valid task directory."
@@ -69,10 +87,10 @@ def create(task_names: list[str]) -> None:
 @app.command()
 def validate():
     """
-    Validate the pdp yml.
+    Validate pdp.yml and the task.yml of every task.
     """
 
-    pdp = load_pdp()
+    pdp = load_pdp(read_only=True)
     result = pdp.validate()
 
     if not result:
@@ -83,39 +101,413 @@ def validate():
 
 
 @app.command()
-def run(task_name: Annotated[str, typer.Argument()] = None) -> None:
+def run(
+    targets: Annotated[
+        list[str],
+        typer.Argument(help="Tasks to run, or changed paths with --affected."),
+    ] = None,
+    affected: bool = typer.Option(
+        False,
+        "--affected",
+        "-a",
+        help="Run only the tasks containing the changed paths given as arguments "
+        "or on stdin, and the tasks downstream of them.",
+    ),
+    resume: bool = typer.Option(
+        False,
+        "--resume",
+        help="Run only the tasks of the last run that failed or did not get to run.",
+    ),
+    jobs: int = typer.Option(
+        None,
+        "--jobs",
+        "-j",
+        min=1,
+        help="Number of tasks to run concurrently. Defaults to 1, or to the "
+        "number of slots of the workers.",
+    ),
+    workers: list[str] = typer.Option(
+        None,
+        "--worker",
+        "-w",
+        help="Address (host:port) of a `pdp worker` to run tasks on. Repeat for "
+        "more workers. Defaults to the `workers` listed in pdp.yml.",
+    ),
+    force: bool = typer.Option(
+        False, "--force", "-f", help="Run tasks even if they are up to date."
+    ),
+    quiet: bool = typer.Option(
+        False,
+        "--quiet",
+        "-q",
+        help="Only write task output to the log files, not to the console.",
+    ),
+    prefetch: bool = typer.Option(
+        False,
+        "--prefetch",
+        help="Read the input files of the next task into memory while the "
+        "current tasks run.",
+    ),
+    prefetch_budget: int = typer.Option(
+        None,
+        "--prefetch-budget",
+        min=1,
+        help="Most MiB of inputs to read ahead. Defaults to a quarter of the "
+        "free memory.",
+    ),
+    fail_fast: bool = typer.Option(
+        False,
+        "--fail-fast/--keep-going",
+        help="Stop everything at the first failure, or keep running the tasks "
+        "that do not depend on a failed task.",
+    ),
+    timeout: float = typer.Option(
+        None,
+        "--timeout",
+        help="Seconds after which a task is terminated, for every task. "
+        "Defaults to the `timeout` in each task.yml.",
+    ),
+    retries: int = typer.Option(
+        None,
+        "--retries",
+        min=0,
+        help="Times to run a failing task again, for every task. Defaults to "
+        "the `retries` in each task.yml.",
+    ),
+) -> None:
     """
-    Run a task.
+    Run tasks. Without arguments, runs the current task, or all tasks from the project root.
     """
 
-    pdp = load_pdp()
+    if timeout is not None and timeout <= 0:
+        raise typer.BadParameter("must be positive", param_hint="--timeout")
+
+    pdp = load_pdp(read_only=True)
+    options = dict(
+        jobs=jobs,
+        force=force,
+        tee=not quiet,
+        prefetch=prefetch,
+        prefetch_budget=prefetch_budget and prefetch_budget * 1024 * 1024,
+        workers=workers,
+        fail_fast=fail_fast,
+        timeout=timeout,
+        retries=retries,
+    )
 
-    if task_name:
-        return_code = pdp.run_task(task_name)
-    else:
-        current_task = pdp.current_task
+    try:
+        if resume:
+            if affected or targets:
+                raise ValueError("--resume runs the tasks of the last run only.")
+            return_code = pdp.resume(**options)
 
-        if current_task == ".":
-            return_code = pdp.run_all()
+        elif affected:
+            paths = targets or sys.stdin.read().splitlines()
+            return_code = pdp.run_affected([p for p in paths if p.strip()], **options)
+
+        elif targets:
+            return_code = pdp.run_tasks(targets, **options)
 
         else:
-            return_code = pdp.run_task(current_task.task_name)
+            current_task = pdp.current_task
+
+            if current_task == ".":
+                return_code = pdp.run_all(**options)
+
+            elif current_task is None:
+                raise ValueError("Not at project root or a task directory.")
+
+            else:
+                return_code = pdp.run_task(pdp.task_key(current_task), **options)
+    except (InvalidConfigError, ValueError, ConnectionError) as e:
+        err_console.print(str(e))
+        raise typer.Exit(1)
+
+    err_console.print(pdp.last_report.summary_table())
+
+    if return_code != 0:
+        err_console.print(f"Task output is logged in {pdp.log_directory}.")
 
     raise typer.Exit(return_code)
 
 
+@app.command()
+def watch(
+    jobs: int = typer.Option(
+        1, "--jobs", "-j", min=1, help="Number of tasks to run concurrently."
+    ),
+    quiet: bool = typer.Option(
+        False,
+        "--quiet",
+        "-q",
+        help="Only write task output to the log files, not to the console.",
+    ),
+    debounce: float = typer.Option(
+        0.2,
+        "--debounce",
+        min=0,
+        help="Seconds without changes to wait for before running tasks.",
+    ),
+    poll: bool = typer.Option(
+        False,
+        "--poll",
+        help="Look for changes periodically instead of using inotify, "
+        "for example on network file systems.",
+    ),
+) -> None:
+    """
+    Watch the input and src folders of all tasks, and run the tasks affected by each change.
+    """
+
+    from pdp.watch import watch_folders
+
+    pdp = load_pdp(read_only=True)
+    watcher = watch_folders(pdp.watched_folders, poll=poll)
+    err_console.print("Watching for changes. Press Ctrl+C to stop.")
+
+    try:
+        for _, return_code in pdp.watch(watcher, debounce, jobs=jobs, tee=not quiet):
+            err_console.print(pdp.last_report.summary_table())
+            if return_code != 0:
+                err_console.print(f"Task output is logged in {pdp.log_directory}.")
+    except KeyboardInterrupt:
+        pass
+    except InvalidConfigError as e:
+        err_console.print(str(e))
+        raise typer.Exit(1)
+    finally:
+        watcher.close()
+
+
 @app.command()
 def tree() -> None:
     """
     Print the task tree.
     """
 
-    pdp = load_pdp()
+    pdp = load_pdp(read_only=True)
     tree = pdp.task_tree()
-    rprint(tree)
+    console.print(tree)
 
     raise typer.Exit(0)
 
 
+@app.command()
+def status(
+    json_output: bool = typer.Option(
+        False, "--json", help="Print a JSON object of task paths to statuses."
+    ),
+) -> None:
+    """
+    Show which tasks are up to date, and which would run.
+    """
+    pdp = load_pdp(read_only=True)
+    statuses = pdp.status()
+
+    if json_output:
+        typer.echo(json.dumps(statuses, indent=2))
+        return
+
+    for key, task_status in statuses.items():
+        typer.echo(f"{task_status:<10}  {key}")
+
+
+@app.command()
+def profile(
+    runs: int = typer.Option(
+        10, "--runs", "-n", min=1, help="Number of recent runs to look at."
+    ),
+) -> None:
+    """
+    Show which tasks dominate the run time, and how their run times change.
+    """
+    from pdp.report import format_duration
+
+    pdp = load_pdp(read_only=True)
+
+    try:
+        profile = pdp.profile(runs)
+    except InvalidConfigError as e:
+        err_console.print(str(e))
+        raise typer.Exit(1)
+
+    if not profile.reports:
+        err_console.print("No runs recorded yet. Try `pdp run`.")
+        raise typer.Exit(1)
+
+    console.print(profile.contribution_table())
+    console.print(
+        f"Critical path: {' -> '.join(profile.critical_path)} "
+        f"({format_duration(profile.critical_path_time)})"
+    )
+    console.print(
+        f"Running every task one at a time takes {format_duration(profile.total_time)}. "
+        f"Running independent tasks concurrently can speed this up by at most "
+        f"{profile.max_speedup:.1f}x."
+    )
+    console.print(profile.trend_table())
+
+
+@app.command()
+def worker(
+    host: str = typer.Option(
+        "127.0.0.1",
+        "--host",
+        help="Address to listen on. Anyone who can connect and knows the "
+        "token can run commands.",
+    ),
+    port: int = typer.Option(8765, "--port", help="Port to listen on."),
+    jobs: int = typer.Option(
+        1, "--jobs", "-j", min=1, help="Number of tasks to run concurrently."
+    ),
+    insecure: bool = typer.Option(
+        False,
+        "--insecure",
+        help="Accept clients without a token, so that anyone who can connect "
+        "can run commands.",
+    ),
+) -> None:
+    """
+    Run tasks sent by `pdp run --worker` from other machines.
+    """
+    import secrets
+
+    from pdp.remote import WorkerServer
+
+    token = os.environ.get("PDP_WORKER_TOKEN")
+    if insecure:
+        token = None
+    elif not token:
+        token = secrets.token_urlsafe(32)
+        err_console.print(
+            f"Set PDP_WORKER_TOKEN={token} for `pdp run` to use this worker.",
+            soft_wrap=True,
+        )
+
+    server = WorkerServer((host, port), slots=jobs, token=token)
+    err_console.print(f"Listening on {host}:{server.server_address[1]}.")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+@app.command()
+def daemon() -> None:
+    """
+    Keep the project loaded, and serve `pdp run`, `tree`, `validate` and `status` from it.
+    """
+    from pdp.daemon import DaemonServer
+
+    pdp = load_pdp(read_only=True)
+    os.chdir(pdp.project_root)
+
+    try:
+        server = DaemonServer(pdp.project_root)
+    except (RuntimeError, OSError) as e:
+        err_console.print(str(e))
+        raise typer.Exit(1)
+    err_console.print(f"Listening on {server.path}.")
+
+    # Stop cleanly, removing the socket, when stopped by a service manager.
+    # Raising from the handler could be swallowed if the signal arrives
+    # while forking, so the server is asked to stop from another thread.
+    signal.signal(
+        signal.SIGTERM,
+        lambda signum, frame: threading.Thread(target=server.shutdown).start(),
+    )
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+class TaskFolder(str, Enum):
+    input = "input"
+    src = "src"
+    output = "output"
+
+
+@app.command(name="hash")
+def hash_task(
+    task: str,
+    folder: TaskFolder = typer.Option(
+        TaskFolder.input, "--folder", help="Folder of the task to hash."
+    ),
+    jobs: int = typer.Option(
+        None,
+        "--jobs",
+        "-j",
+        min=1,
+        help="Number of threads to hash with. Defaults to the number of CPUs.",
+    ),
+    algorithm: str = typer.Option(
+        None,
+        "--algorithm",
+        help="Any algorithm supported by hashlib. Defaults to BLAKE2b.",
+    ),
+) -> None:
+    """
+    Print the digest of every file in a task's folder.
+    """
+    from pdp.hashing import DEFAULT_ALGORITHM, HashEngine
+
+    pdp = load_pdp(read_only=True)
+
+    try:
+        engine = HashEngine(algorithm or DEFAULT_ALGORITHM, jobs)
+        digests = pdp.hash_task(task, folder.value, engine)
+    except ValueError as e:
+        err_console.print(str(e))
+        raise typer.Exit(1)
+
+    for path, digest in digests.items():
+        typer.echo(f"{digest or 'dangling'}  {path}")
+
+
+@app.command()
+def rollback(task: str) -> None:
+    """
+    Put back a task's outputs from before its last successful run. Run it again to undo.
+    """
+    pdp = load_pdp(read_only=True)
+
+    try:
+        pdp.rollback(task)
+    except (ValueError, OSError) as e:
+        err_console.print(str(e))
+        raise typer.Exit(1)
+
+
+class GraphFormat(str, Enum):
+    dot = "dot"
+    json = "json"
+
+
+@app.command()
+def graph(
+    format: GraphFormat = typer.Option(
+        GraphFormat.dot, "--format", help="Output format."
+    ),
+) -> None:
+    """
+    Print the dependency graph of the tasks.
+    """
+
+    pdp = load_pdp(read_only=True)
+    graph = pdp.dependency_graph()
+
+    if format == GraphFormat.json:
+        typer.echo(graph.to_json())
+    else:
+        typer.echo(graph.to_dot(), nl=False)
+
+
 if __name__ == "__main__":
     app()
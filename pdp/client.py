@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import signal
+import socket
+import stat
+import struct
+import sys
+import tempfile
+from pathlib import Path
+
+from .root import find_project_root
+
+# Only the standard library is imported here, so that commands handed to a
+# daemon start without loading typer, rich or ruamel.yaml.
+
+# Commands that a running `pdp daemon` serves. The others always run in the
+# calling process.
+DAEMON_COMMANDS = {"run", "tree", "validate", "status"}
+
+# Longest path a Unix domain socket can be bound to on common platforms.
+MAX_SOCKET_PATH = 100
+
+
+def runtime_directory() -> Path:
+    """Where daemons listen whose socket path in the project is too long:
+    $XDG_RUNTIME_DIR, or a pdp-<uid> folder in the temporary directory.
+    Either must be private to the user, see `is_private_directory`."""
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime:
+        return Path(runtime)
+
+    return Path(tempfile.gettempdir()) / f"pdp-{os.getuid()}"
+
+
+def is_private_directory(path: Path) -> bool:
+    """Whether `path` is a directory, and not a symlink to one, that belongs
+    to this user and that no one else can access."""
+    try:
+        info = os.lstat(path)
+    except OSError:
+        return False
+
+    return (
+        stat.S_ISDIR(info.st_mode)
+        and info.st_uid == os.getuid()
+        and not info.st_mode & 0o077
+    )
+
+
+def socket_path(project_root: Path) -> Path:
+    """Where the daemon of the project at `project_root` listens: in its
+    .pdp folder, or in the runtime directory if that path is too long for a
+    socket."""
+    path = project_root / ".pdp" / "daemon.sock"
+    if len(os.fsencode(path)) <= MAX_SOCKET_PATH:
+        return path
+
+    digest = hashlib.sha256(os.fsencode(project_root)).hexdigest()[:16]
+    return runtime_directory() / f"pdp-{digest}.sock"
+
+
+def connect(path: Path) -> socket.socket | None:
+    """A connection to the daemon listening on `path`, or None if no daemon
+    is listening there."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(os.fspath(path))
+    except OSError:
+        sock.close()
+        return None
+
+    return sock
+
+
+def same_user(sock: socket.socket) -> bool:
+    """Whether the process at the other end of `sock` runs as this user.
+    Where this cannot be checked, the socket's permissions keep others
+    out."""
+    if not hasattr(socket, "SO_PEERCRED"):
+        return True
+
+    credentials = sock.getsockopt(
+        socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i")
+    )
+    _, uid, _ = struct.unpack("3i", credentials)
+    return uid == os.getuid()
+
+
+def run_in_daemon(args: list[str]) -> int | None:
+    """Hand the command `args` to the project's daemon, which runs it on this
+    process's stdin, stdout and stderr, in its working directory and
+    environment. Returns the command's exit code, or None if no daemon of
+    this user is running."""
+    path = socket_path(find_project_root("pdp.yml"))
+    if path.parent == runtime_directory() and not is_private_directory(path.parent):
+        return None
+
+    sock = connect(path)
+    if sock is None:
+        return None
+
+    with sock:
+        # Do not hand this terminal and environment to another user's
+        # process listening in our place.
+        if not same_user(sock):
+            return None
+
+        request = {"args": args, "cwd": os.getcwd(), "env": dict(os.environ)}
+        try:
+            socket.send_fds(sock, [b"\0"], [0, 1, 2])
+            sock.sendall(json.dumps(request).encode() + b"\n")
+        except OSError:
+            return None
+
+        reader = sock.makefile("rb")
+        started = reader.readline()
+        if not started:
+            return None
+
+        # Ctrl+C reaches this process only, so pass it on.
+        pid = json.loads(started)["pid"]
+        previous = {
+            signum: signal.signal(signum, lambda signum, _: os.kill(pid, signum))
+            for signum in (signal.SIGINT, signal.SIGTERM)
+        }
+        try:
+            finished = reader.readline()
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+
+    if not finished:
+        sys.stderr.write("The pdp daemon stopped before the command finished.\n")
+        return 1
+
+    return json.loads(finished)["returncode"]
+
+
+def main() -> None:
+    """The `pdp` command. Commands that a daemon serves are handed to it if
+    one is running for the project, and everything else runs here."""
+    args = sys.argv[1:]
+    if args and args[0] in DAEMON_COMMANDS and not os.environ.get("PDP_NO_DAEMON"):
+        returncode = run_in_daemon(args)
+        if returncode is not None:
+            sys.exit(returncode)
+
+    from .cli import app
+
+    app()
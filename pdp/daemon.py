@@ -0,0 +1,161 @@
+import importlib
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+from pathlib import Path
+
+from .client import (
+    DAEMON_COMMANDS,
+    connect,
+    is_private_directory,
+    runtime_directory,
+    same_user,
+    socket_path,
+)
+from .pdp import PDP
+from .pdp_errors import InvalidConfigError, UninitializedProjectError
+
+# Loaded before serving, so that commands do not pay for them. The modules
+# that the CLI otherwise imports lazily are the expensive ones.
+PRELOADED_MODULES = [
+    "pdp.cli",
+    "pdp.logs",
+    "pdp.report",
+    "ruamel.yaml",
+    "rich.table",
+    "rich.tree",
+]
+
+
+class DaemonHandler(socketserver.StreamRequestHandler):
+    """Runs one command in a process forked from the daemon, which starts
+    with the modules and parsed configs of the daemon already loaded."""
+
+    def handle(self) -> None:
+        _, fds, _, _ = socket.recv_fds(self.request, 1, 3)
+        if len(fds) != 3 or not self.same_user():
+            return
+
+        request = json.loads(self.rfile.readline())
+        if not request["args"] or request["args"][0] not in DAEMON_COMMANDS:
+            return
+
+        self.wfile.write(json.dumps({"pid": os.getpid()}).encode() + b"\n")
+        self.wfile.flush()
+
+        returncode = run_command(request, fds)
+        self.wfile.write(json.dumps({"returncode": returncode}).encode() + b"\n")
+
+    def same_user(self) -> bool:
+        """Whether the client runs as the same user as the daemon."""
+        return same_user(self.request)
+
+
+def run_command(request: dict, fds: list[int]) -> int:
+    """Run the CLI with the client's arguments, working directory,
+    environment, and stdin, stdout and stderr. Only called in a forked
+    process, as it takes all of these over."""
+    from rich.console import Console
+
+    from . import cli
+
+    # The daemon may have been started with these ignored, in the
+    # background, while the command should stop when the client passes
+    # them on.
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    os.chdir(request["cwd"])
+    os.environ.clear()
+    os.environ.update(request["env"])
+
+    for target, fd in enumerate(fds):
+        os.dup2(fd, target)
+        os.close(fd)
+    sys.stdin = open(0, closefd=False)
+    sys.stdout = open(1, "w", buffering=1, closefd=False)
+    sys.stderr = open(2, "w", buffering=1, closefd=False)
+
+    # The consoles detected the daemon's terminal, not the client's.
+    cli.console = Console()
+    cli.err_console = Console(stderr=True)
+
+    try:
+        cli.app(args=request["args"], prog_name="pdp")
+        returncode = 0
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            returncode = e.code or 0
+        else:
+            sys.stderr.write(f"{e.code}\n")
+            returncode = 1
+    except KeyboardInterrupt:
+        returncode = 130
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+    return returncode
+
+
+class DaemonServer(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    """Serves `pdp run`, `tree`, `validate` and `status` for one project,
+    from a process that keeps the project loaded.
+
+    The client sends its stdin, stdout and stderr file descriptors, then
+    {"args", "cwd", "env"} as a JSON line. It receives {"pid"} of the
+    process that runs the command, to pass signals on to, and
+    {"returncode"} once the command has finished."""
+
+    def __init__(self, project_root: Path) -> None:
+        self.project_root = project_root
+        self.path = socket_path(project_root)
+
+        for module in PRELOADED_MODULES:
+            importlib.import_module(module)
+        self.refresh()
+
+        running = connect(self.path)
+        if running is not None:
+            running.close()
+            raise RuntimeError(f"A pdp daemon is already listening on {self.path}")
+
+        if self.path.parent == runtime_directory():
+            # Shared with other users when in the temporary directory, so
+            # only use it if no one else can have placed a socket there.
+            self.path.parent.mkdir(mode=0o700, exist_ok=True)
+            if not is_private_directory(self.path.parent):
+                raise RuntimeError(
+                    f"{self.path.parent} must be a folder that only you can access"
+                )
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.unlink(missing_ok=True)
+
+        umask = os.umask(0o077)
+        try:
+            super().__init__(os.fspath(self.path), DaemonHandler)
+        finally:
+            os.umask(umask)
+
+    def refresh(self) -> None:
+        """Load the project again, so that the parsed configs are cached for
+        the processes forked from here. Configs that did not change since
+        the last load are not parsed again, so this only costs a stat of
+        each."""
+        try:
+            PDP().load()
+        except (InvalidConfigError, UninitializedProjectError):
+            pass
+
+    def process_request(self, request, client_address) -> None:
+        # Forked processes inherit what is loaded here, up to date.
+        self.refresh()
+        super().process_request(request, client_address)
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.path.unlink(missing_ok=True)
@@ -0,0 +1,63 @@
+from pathlib import Path
+from typing import Protocol
+
+from .process import ChildProcesses, ProcessResult, child_processes
+from .task import Task
+
+
+class Executor(Protocol):
+    """Runs the entrypoints of tasks for the Scheduler, which calls `run`
+    from as many threads as it runs tasks at once."""
+
+    def run(
+        self,
+        task: Task,
+        log_directory: Path | None = None,
+        prefix: str | None = None,
+        tee: bool = True,
+        timeout: float | None = None,
+        retries: int | None = None,
+    ) -> ProcessResult | None:
+        """Run `task`'s own entrypoint and wait for it, as
+        `Task.run_entrypoint` does. Returns None if the task has no
+        entrypoint."""
+
+    def cancel(self) -> None:
+        """Terminate the entrypoints that are running, and any that `run`
+        starts from now on. Called from another thread than `run`."""
+
+    def close(self) -> None: ...
+
+
+class LocalExecutor:
+    """Runs tasks as child processes of this one."""
+
+    def __init__(self) -> None:
+        self.processes = ChildProcesses()
+
+    def run(
+        self,
+        task: Task,
+        log_directory: Path | None = None,
+        prefix: str | None = None,
+        tee: bool = True,
+        timeout: float | None = None,
+        retries: int | None = None,
+    ) -> ProcessResult | None:
+        token = child_processes.set(self.processes)
+        try:
+            return task.run_entrypoint(
+                log_directory=log_directory,
+                prefix=prefix,
+                tee=tee,
+                timeout=timeout,
+                retries=retries,
+            )
+        finally:
+            child_processes.reset(token)
+
+    def cancel(self) -> None:
+        self.processes.terminate()
+
+    def close(self) -> None:
+        pass
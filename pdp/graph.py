@@ -0,0 +1,211 @@
+import heapq
+import json
+import os
+from pathlib import Path, PurePosixPath
+from typing import Iterator
+
+from .task import Task
+from .pdp_errors import InvalidConfigError
+
+
+def task_key(task: Task, project_root: Path) -> str:
+    return task.task_directory.relative_to(project_root).as_posix()
+
+
+def normalize_key(key: str) -> str:
+    return PurePosixPath(key).as_posix()
+
+
+def symlink_targets(folder: Path) -> Iterator[Path]:
+    """Where each symlink under `folder` points, without following links
+    into other folders. Targets that do not exist yet are included."""
+    stack = [folder]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+
+        with entries:
+            for entry in entries:
+                if entry.is_symlink():
+                    # A link that loops back on itself points at no task.
+                    try:
+                        yield Path(entry.path).resolve()
+                    except (RuntimeError, OSError):
+                        continue
+                elif entry.is_dir():
+                    stack.append(entry.path)
+
+
+class TaskGraph:
+    """Dependency graph over a task tree.
+
+    Nodes are keyed by the task's path relative to the project root,
+    e.g. "clean/geocode". A task depends on each of its subtasks (its
+    entrypoint runs after them) and on every task listed under
+    `depends_on` in its task.yml. It also depends on every task whose
+    output folder one of the symlinks in its input folder points into.
+    Insertion order follows the declared order in pdp.yml and task.yml,
+    and is used to break ties."""
+
+    def __init__(self) -> None:
+        self.tasks: dict[str, Task] = {}
+        self.dependencies: dict[str, set[str]] = {}
+
+    @classmethod
+    def from_tasks(cls, tasks: list[Task], project_root: Path) -> "TaskGraph":
+        graph = cls()
+        for task in tasks:
+            graph._add_subtree(task, project_root)
+
+        # Dependencies outside of the selected tasks are assumed to be built.
+        for key, task in graph.tasks.items():
+            for dependency in task.depends_on:
+                dependency = normalize_key(dependency)
+                if dependency in graph.tasks:
+                    graph.add_dependency(key, dependency)
+
+        graph._infer_dependencies()
+
+        return graph
+
+    def _infer_dependencies(self) -> None:
+        producers = {
+            task.output_folder.resolve(): key for key, task in self.tasks.items()
+        }
+
+        for key, task in self.tasks.items():
+            for target in symlink_targets(task.input_folder):
+                candidates = [target, *target.parents]
+                producer = next(
+                    (producers[p] for p in candidates if p in producers), None
+                )
+                if producer is not None and producer != key:
+                    self.add_dependency(key, producer)
+
+    def _add_subtree(self, task: Task, project_root: Path) -> str:
+        key = task_key(task, project_root)
+        self.add_task(key, task)
+
+        for subtask in task.subtasks:
+            subtask_key = self._add_subtree(subtask, project_root)
+            self.add_dependency(key, subtask_key)
+
+        return key
+
+    def add_task(self, key: str, task: Task) -> None:
+        self.tasks[key] = task
+        self.dependencies.setdefault(key, set())
+
+    def add_dependency(self, key: str, dependency: str) -> None:
+        if key == dependency:
+            raise InvalidConfigError(f"Task {key} depends on itself")
+
+        self.dependencies[key].add(dependency)
+
+    def owner(self, path: Path) -> str | None:
+        """The innermost task whose folder contains `path`, or None if there
+        is none or `path` is in that task's output folder, since changing a
+        task's outputs does not change what it computes."""
+        directories = {task.task_directory: key for key, task in self.tasks.items()}
+
+        for folder in [path, *path.parents]:
+            key = directories.get(folder)
+            if key is None:
+                continue
+
+            output_folder = self.tasks[key].task_directory / "output"
+            if path == output_folder or output_folder in path.parents:
+                return None
+
+            return key
+
+        return None
+
+    def downstream(self, keys: set[str]) -> set[str]:
+        """`keys` and every task that depends on them, directly or not."""
+        dependents = self.dependents()
+        found = set(keys)
+        stack = list(keys)
+        while stack:
+            for dependent in dependents[stack.pop()]:
+                if dependent not in found:
+                    found.add(dependent)
+                    stack.append(dependent)
+
+        return found
+
+    def subgraph(self, keys: set[str]) -> "TaskGraph":
+        """The graph of only the tasks in `keys` and the dependencies
+        between them."""
+        graph = TaskGraph()
+        for key, task in self.tasks.items():
+            if key in keys:
+                graph.add_task(key, task)
+                graph.dependencies[key] = self.dependencies[key] & keys
+
+        return graph
+
+    def dependents(self) -> dict[str, set[str]]:
+        dependents = {key: set() for key in self.tasks}
+        for key, dependencies in self.dependencies.items():
+            for dependency in dependencies:
+                dependents[dependency].add(key)
+
+        return dependents
+
+    def topological_order(self) -> list[str]:
+        """Order tasks so that each comes after its dependencies, preferring
+        the declared order wherever the dependencies allow it."""
+        declared = {key: i for i, key in enumerate(self.tasks)}
+        dependents = self.dependents()
+        waiting = {key: len(deps) for key, deps in self.dependencies.items()}
+
+        ready = [(declared[key], key) for key, n in waiting.items() if n == 0]
+        heapq.heapify(ready)
+        order = []
+        while ready:
+            _, key = heapq.heappop(ready)
+            order.append(key)
+            for dependent in dependents[key]:
+                waiting[dependent] -= 1
+                if waiting[dependent] == 0:
+                    heapq.heappush(ready, (declared[dependent], dependent))
+
+        if len(order) != len(self.tasks):
+            cycle = sorted(set(self.tasks) - set(order))
+            raise InvalidConfigError(f"Dependency cycle between tasks: {cycle}")
+
+        return order
+
+    def to_dict(self) -> dict:
+        return {
+            "tasks": list(self.tasks),
+            "dependencies": {
+                key: sorted(dependencies)
+                for key, dependencies in self.dependencies.items()
+            },
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_dot(self) -> str:
+        """The graph in Graphviz's DOT language, with edges pointing from
+        each task to the tasks that depend on it."""
+        lines = ["digraph tasks {"]
+        for key in self.tasks:
+            lines.append(f"  {json.dumps(key)};")
+        for key, dependencies in self.dependencies.items():
+            for dependency in sorted(dependencies):
+                lines.append(f"  {json.dumps(dependency)} -> {json.dumps(key)};")
+        lines.append("}")
+
+        return "\n".join(lines) + "\n"
+
+    def __len__(self) -> int:
+        return len(self.tasks)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.tasks
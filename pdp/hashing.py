@@ -0,0 +1,263 @@
+import hashlib
+import json
+import mmap
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable
+
+from .atomic import atomic_write
+from .scan import RACY_INTERVAL_NS, FileEntry, scan_files
+
+DEFAULT_ALGORITHM = "blake2b"
+
+# Files are hashed in chunks of this size, which are the unit of work
+# spread over the hashing threads.
+CHUNK_SIZE = 16 * 1024 * 1024
+READ_SIZE = 1024 * 1024
+
+# Chunks at least this large are memory-mapped instead of read into a
+# buffer; for smaller ones setting up the mapping costs more than it saves.
+MMAP_THRESHOLD = 1024 * 1024
+
+
+class HashEngine:
+    """Hashes files on a pool of threads. Large files are split into
+    chunks that are hashed concurrently, so a single file also uses
+    several cores. hashlib releases the GIL while it hashes, so threads
+    scale without the cost of a process pool.
+
+    A file's digest is the hash of its size and the digests of its chunks,
+    so it depends on the algorithm and chunk size but not on the number of
+    jobs."""
+
+    def __init__(
+        self,
+        algorithm: str = DEFAULT_ALGORITHM,
+        jobs: int | None = None,
+        chunk_size: int = CHUNK_SIZE,
+    ) -> None:
+        if algorithm not in hashlib.algorithms_available:
+            raise ValueError(f"Unknown hash algorithm {algorithm}")
+        if hashlib.new(algorithm).digest_size == 0:
+            raise ValueError(f"{algorithm} has no fixed digest size")
+        if chunk_size <= 0 or chunk_size % mmap.ALLOCATIONGRANULARITY:
+            raise ValueError(
+                f"chunk_size must be a multiple of {mmap.ALLOCATIONGRANULARITY}"
+            )
+        if jobs is not None and jobs < 1:
+            raise ValueError("jobs must be at least 1")
+
+        self.algorithm = algorithm
+        self.jobs = jobs or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+
+    def digest_file(self, path: str | Path) -> str:
+        return self.digest_files([path])[0]
+
+    def digest_files(
+        self, paths: list[str | Path], sizes: list[int] | None = None
+    ) -> list[str]:
+        """The digests of `paths`, in the same order. `sizes` saves
+        stat'ing files whose size is already known."""
+        if sizes is None:
+            sizes = [os.stat(path).st_size for path in paths]
+
+        chunks = [
+            (path, offset, min(self.chunk_size, size - offset))
+            for path, size in zip(paths, sizes)
+            for offset in range(0, max(size, 1), self.chunk_size)
+        ]
+
+        if self.jobs == 1 or len(chunks) <= 1:
+            chunk_digests = [self._digest_chunk(*chunk) for chunk in chunks]
+        else:
+            with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+                chunk_digests = list(pool.map(lambda c: self._digest_chunk(*c), chunks))
+
+        digests = []
+        position = 0
+        for size in sizes:
+            count = max(1, -(-size // self.chunk_size))
+            digests.append(
+                self._combine(size, chunk_digests[position : position + count])
+            )
+            position += count
+
+        return digests
+
+    def _digest_chunk(self, path: str | Path, offset: int, length: int) -> bytes:
+        hasher = hashlib.new(self.algorithm)
+
+        with open(path, "rb") as f:
+            if length >= MMAP_THRESHOLD:
+                try:
+                    with mmap.mmap(
+                        f.fileno(), length, offset=offset, access=mmap.ACCESS_READ
+                    ) as chunk:
+                        hasher.update(chunk)
+                    return hasher.digest()
+                except (OSError, ValueError):
+                    # The file shrank since it was stat'ed, or can't be mapped.
+                    pass
+
+            f.seek(offset)
+            remaining = length
+            while remaining and (data := f.read(min(READ_SIZE, remaining))):
+                hasher.update(data)
+                remaining -= len(data)
+
+        return hasher.digest()
+
+    def _combine(self, size: int, chunk_digests: list[bytes]) -> str:
+        hasher = hashlib.new(self.algorithm)
+        hasher.update(f"{size}\0".encode())
+        for digest in chunk_digests:
+            hasher.update(digest)
+
+        return hasher.hexdigest()
+
+
+class HashIndex:
+    """Digests of file contents, persisted as JSON and keyed by path. An
+    entry is reused as long as the file's mtime, size and inode are
+    unchanged, so only new or modified files are read and hashed again.
+    The index holds digests of a single algorithm; an index file written
+    with another algorithm is ignored."""
+
+    def __init__(
+        self,
+        path_to_index: str | Path | None = None,
+        algorithm: str = DEFAULT_ALGORITHM,
+    ) -> None:
+        self.path_to_index = None if path_to_index is None else Path(path_to_index)
+        self.algorithm = algorithm
+        self.entries = self.read_index_file()
+        self.dirty = False
+        self._lock = threading.Lock()
+
+    def read_index_file(self) -> dict:
+        if self.path_to_index is None:
+            return {}
+
+        try:
+            with open(self.path_to_index) as f:
+                index = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+        if not isinstance(index, dict) or index.get("algorithm") != self.algorithm:
+            return {}
+
+        return index.get("files", {})
+
+    def save(self) -> None:
+        if self.path_to_index is None or not self.dirty:
+            return
+
+        self.path_to_index.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            with atomic_write(self.path_to_index) as f:
+                index = {"algorithm": self.algorithm, "files": self.entries}
+                json.dump(index, f, separators=(",", ":"))
+            self.dirty = False
+
+    def lookup(self, path: str, stat: os.stat_result) -> str | None:
+        entry = self.entries.get(path)
+        if entry is not None and entry[:3] == self._signature(stat):
+            return entry[3]
+
+        return None
+
+    def record(self, path: str, stat: os.stat_result, digest: str) -> None:
+        if time.time_ns() - stat.st_mtime_ns <= RACY_INTERVAL_NS:
+            return
+
+        with self._lock:
+            self.entries[path] = self._signature(stat) + [digest]
+            self.dirty = True
+
+    @staticmethod
+    def _signature(stat: os.stat_result) -> list[int]:
+        return [stat.st_mtime_ns, stat.st_size, stat.st_ino]
+
+
+def folder_digests(
+    folder: str | Path,
+    engine: HashEngine | None = None,
+    index: HashIndex | None = None,
+) -> dict[str, str | None]:
+    """The digest of every file under `folder`, by path relative to
+    `folder`, or None for symlinks whose target does not exist."""
+    return entry_digests(scan_files(folder), engine, index)
+
+
+def entry_digests(
+    entries: Iterable[FileEntry],
+    engine: HashEngine | None = None,
+    index: HashIndex | None = None,
+) -> dict[str, str | None]:
+    """The digest of each of `entries`, by relative path, or None for
+    entries without a stat. Files missing from `index` are hashed together,
+    so they share the engine's threads. An index of another algorithm than
+    the engine's is not used."""
+    if engine is None:
+        engine = HashEngine()
+    if index is not None and index.algorithm != engine.algorithm:
+        index = None
+
+    digests = {}
+    unhashed = []
+    for relative_path, path, stat in entries:
+        digests[relative_path] = None
+        if stat is None:
+            continue
+
+        digest = None if index is None else index.lookup(path, stat)
+        if digest is None:
+            unhashed.append((relative_path, path, stat))
+        else:
+            digests[relative_path] = digest
+
+    computed = engine.digest_files(
+        [path for _, path, _ in unhashed], [stat.st_size for _, _, stat in unhashed]
+    )
+    for (relative_path, path, stat), digest in zip(unhashed, computed):
+        digests[relative_path] = digest
+        if index is not None:
+            index.record(path, stat, digest)
+
+    return digests
+
+
+def folder_digest(
+    folder: Path,
+    hasher,
+    index: HashIndex | None = None,
+    engine: HashEngine | None = None,
+) -> None:
+    """Feed the relative path and contents of every file under `folder`
+    into `hasher`."""
+    if not folder.exists():
+        hasher.update(b"missing\n")
+        return
+
+    entries_digest(scan_files(folder), hasher, index, engine)
+
+
+def entries_digest(
+    entries: Iterable[FileEntry],
+    hasher,
+    index: HashIndex | None = None,
+    engine: HashEngine | None = None,
+) -> None:
+    """Feed the relative path and contents of each of `entries` into
+    `hasher`."""
+    for relative_path, digest in entry_digests(entries, engine, index).items():
+        if digest is None:
+            entry = f"{relative_path}\0dangling\n"
+        else:
+            entry = f"{relative_path}\0{digest}\n"
+        hasher.update(entry.encode())
@@ -0,0 +1,54 @@
+import json
+from pathlib import Path
+
+from .atomic import atomic_write
+
+
+class RunJournal:
+    """The tasks of the last run, and which of them finished successfully,
+    persisted as JSON each time a task finishes. Unlike a run report, it is
+    up to date even when the run is killed, so that the run can be resumed
+    from where it stopped."""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.tasks: list[str] = []
+        self.completed: set[str] = set()
+
+    @classmethod
+    def read(cls, path: str | Path) -> "RunJournal | None":
+        """The journal at `path`, or None if there is none."""
+        journal = cls(path)
+        try:
+            with open(journal.path) as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        journal.tasks = data["tasks"]
+        journal.completed = set(data["completed"])
+        return journal
+
+    @property
+    def remaining(self) -> list[str]:
+        """The tasks that failed, or did not get to run."""
+        return [key for key in self.tasks if key not in self.completed]
+
+    def start(self, tasks: list[str]) -> None:
+        self.tasks = list(tasks)
+        self.completed = set()
+        self.write()
+
+    def record(self, key: str) -> None:
+        self.completed.add(key)
+        self.write()
+
+    def write(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        with atomic_write(self.path) as f:
+            json.dump(
+                {"tasks": self.tasks, "completed": sorted(self.completed)},
+                f,
+                indent=2,
+            )
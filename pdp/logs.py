@@ -0,0 +1,100 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+from typing import BinaryIO, TextIO
+
+# Longest partial line held back before it is echoed anyway.
+LINE_LIMIT = 64 * 1024
+
+
+class PipeProtocol(asyncio.Protocol):
+    """Copies everything read from a child's pipe into its log file as it
+    arrives, and optionally echoes it line by line to the console with a
+    prefix naming the task."""
+
+    def __init__(
+        self,
+        log_file: BinaryIO,
+        console: TextIO | None,
+        prefix: str,
+        done: Future,
+    ) -> None:
+        self.log_file = log_file
+        self.console = console
+        self.prefix = prefix
+        self.done = done
+        self.pending = b""
+
+    def data_received(self, data: bytes) -> None:
+        self.log_file.write(data)
+
+        if self.console is None:
+            return
+
+        *lines, self.pending = (self.pending + data).split(b"\n")
+        for line in lines:
+            self.echo(line)
+
+        if len(self.pending) > LINE_LIMIT:
+            self.echo(self.pending)
+            self.pending = b""
+
+    def echo(self, line: bytes) -> None:
+        self.console.write(f"[{self.prefix}] {line.decode(errors='replace')}\n")
+        self.console.flush()
+
+    def connection_lost(self, exc: Exception | None) -> None:
+        if self.console is not None and self.pending:
+            self.echo(self.pending)
+
+        self.log_file.close()
+        self.done.set_result(None)
+
+
+class LogPump:
+    """One event loop, on a background thread, that drains the output pipes
+    of every running task. Output is written out as soon as it arrives, so
+    memory stays bounded and a chatty child never blocks on a full pipe."""
+
+    def __init__(self) -> None:
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=self._loop.run_forever, name="pdp-log-pump", daemon=True
+                ).start()
+
+        return self._loop
+
+    def pump(
+        self,
+        pipe: BinaryIO,
+        log_path: Path,
+        console: TextIO | None,
+        prefix: str,
+    ) -> Future:
+        """Start draining `pipe` into `log_path`. The returned future is done
+        once the pipe is closed and everything has been written."""
+        loop = self._ensure_loop()
+        done = Future()
+        log_file = open(log_path, "wb")
+
+        async def connect():
+            protocol = PipeProtocol(log_file, console, prefix, done)
+            await loop.connect_read_pipe(lambda: protocol, pipe)
+
+        try:
+            asyncio.run_coroutine_threadsafe(connect(), loop).result()
+        except BaseException:
+            log_file.close()
+            raise
+
+        return done
+
+
+log_pump = LogPump()
@@ -1,26 +1,25 @@
+import os
 from pathlib import Path
 from itertools import count
-
-from rich.tree import Tree
+from typing import TYPE_CHECKING, Iterator
 
 from .task import Task
-from .pdp_config import PDPConfig, TaskConfig
-from .pdp_errors import InvalidConfigError
-
-
-def find_project_root(config_name) -> Path:
-    current_path = Path.cwd()
-    while current_path != current_path.parent:
-        path_to_config = current_path / config_name
-        if path_to_config.exists():
-            return current_path.resolve()
-        current_path = current_path.parent
-
-    path_to_config = current_path / config_name
-    if path_to_config.exists():
-        return current_path.resolve()
-
-    return Path.cwd().resolve()
+from .root import find_project_root
+from .graph import TaskGraph, normalize_key, task_key
+from .scheduler import Scheduler
+from .journal import RunJournal
+from .state import BuildState
+from .report import RunReport
+from .profiling import Profile, read_reports
+from .cache import OutputCache
+from .watch import Watcher, debounced
+from .prefetch import Prefetcher
+from .hashing import HashEngine, HashIndex, folder_digests
+from .pdp_config import GenericConfig, PDPConfig, TaskConfig
+from .pdp_errors import InvalidConfigError, UninitializedProjectError
+
+if TYPE_CHECKING:
+    from rich.tree import Tree
 
 
 class PDP(object):
@@ -28,12 +27,17 @@ class PDP(object):
         self, project_name: str = None, config: PDPConfig | None = None
     ) -> None:
         self.project_name = project_name
+        self._project_root = None
+        self._manifest = {}
 
         if config:
             self.config = config
         else:
+            self._manifest = GenericConfig.load_manifest(self.manifest_path)
             self.config = PDPConfig(project_name, self.project_root / "pdp.yml")
         self.tasks = []
+        self.task_index: dict[str, Task] = {}
+        self.last_report: RunReport | None = None
 
     def initialize(self) -> None:
         if self.initialized and not self.validate():
@@ -42,8 +46,50 @@ class PDP(object):
         self.config.initialize()
         self.project_name = self.config.name
 
-        for task in self.config.tasks:
-            self.create_task(task)
+        with self.config.batch():
+            for task in self.config.tasks:
+                self.create_task(task)
+
+        self.save_manifest()
+
+    def load(self) -> None:
+        """Build the task tree from the existing config files without
+        scaffolding, for commands that only read the project."""
+        if not self.validate():
+            raise InvalidConfigError("Invalid config file")
+
+        self.project_name = self.config.name
+
+        self.tasks = [
+            Task.load(task_name, self.project_root / task_name)
+            for task_name in self.config.tasks
+        ]
+
+        for task in self.tasks:
+            self._index_subtree(task)
+
+        for key, task in self.task_index.items():
+            if not task.task_config.initialized:
+                raise UninitializedProjectError(
+                    f"Task {task.task_name} is not initialized. Try `pdp init`."
+                )
+            if not task.task_config.validate():
+                raise InvalidConfigError(
+                    f"Invalid config file for task {key}: "
+                    f"{task.task_config.path_to_config}"
+                )
+
+        self.save_manifest()
+
+    def save_manifest(self) -> None:
+        """Keep the parsed config files of the project in the manifest, so
+        that the next command only has to stat them."""
+        paths = [self.config.path_to_config] + [
+            task.task_config.path_to_config for task in self.task_index.values()
+        ]
+        self._manifest = GenericConfig.save_manifest(
+            self.manifest_path, paths, self._manifest
+        )
 
     def validate(self) -> bool:
         if not self.initialized:
@@ -52,7 +98,32 @@ class PDP(object):
         if not self.config.validate():
             return False
 
-        return True
+        return all(task.task_config.validate() for task in self.task_index.values())
+
+    def status(self) -> dict[str, str]:
+        """How each task stands, in the order tasks run: "not run" if it has
+        not run successfully, "changed" if its entrypoint, input, src or
+        output folder changed since it last did, "stale" if a task it
+        depends on is not up to date, and "up to date" otherwise. Only tasks
+        that are up to date would be skipped by `pdp run`."""
+        graph = self.dependency_graph()
+        state = BuildState(self.state_directory / "state.json")
+
+        statuses = {}
+        for key in graph.topological_order():
+            if key not in state.state:
+                statuses[key] = "not run"
+            elif not state.is_up_to_date(key, graph.tasks[key]):
+                statuses[key] = "changed"
+            elif any(
+                statuses[dependency] != "up to date"
+                for dependency in graph.dependencies[key]
+            ):
+                statuses[key] = "stale"
+            else:
+                statuses[key] = "up to date"
+
+        return statuses
 
     def create_task(self, task_name: str) -> Task:
         self.config.add_task(task_name)
@@ -63,17 +134,30 @@ class PDP(object):
         task.scaffold()
 
         self.tasks.append(task)
+        self._index_subtree(task)
 
         return task
 
     def create_task_from_current_location(self, task_name: str) -> None:
+        return self.create_tasks_from_current_location([task_name])[0]
+
+    def create_tasks_from_current_location(self, task_names: list[str]) -> list[Task]:
+        """Create tasks under the current task, or at the project root,
+        writing the parent's config only once."""
         current_task = self.current_task
 
         if isinstance(current_task, Task):
-            return current_task.create_subtask(task_name)
+            with current_task.task_config.batch():
+                subtasks = [current_task.create_subtask(n) for n in task_names]
+
+            for subtask in subtasks:
+                self._index_subtree(subtask)
+
+            return subtasks
 
         elif current_task == ".":
-            return self.create_task(task_name)
+            with self.config.batch():
+                return [self.create_task(n) for n in task_names]
 
         raise ValueError(
             "Tried to create task from location that is neither project root nor a task."
@@ -82,26 +166,183 @@ class PDP(object):
     def scaffold(self) -> None:
         for task in self.tasks:
             task.scaffold()
+            self._index_subtree(task)
+
+    def run_task(self, task_name: str, **options) -> int:
+        return self.run_tasks([task_name], **options)
+
+    def run_tasks(self, task_names: list[str], **options) -> int:
+        tasks = []
+        for task_name in task_names:
+            task = self._find_task_by_name(task_name)
+            if task is None:
+                raise ValueError(f"Task {task_name} not found")
+            tasks.append(task)
+
+        return self._run(self.dependency_graph(tasks), **options)
+
+    def run_all(self, **options) -> int:
+        return self._run(self.dependency_graph(), **options)
+
+    def run_affected(self, paths: list[str], **options) -> int:
+        graph = self.dependency_graph()
+        return self._run(graph.subgraph(self.affected_tasks(paths, graph)), **options)
+
+    def resume(self, **options) -> int:
+        """Run the tasks of the last run that failed or did not get to run,
+        as recorded in its journal."""
+        journal = RunJournal.read(self.journal_path)
+        if journal is None:
+            raise ValueError("No run to resume.")
+
+        graph = self.dependency_graph()
+        return self._run(graph.subgraph(set(journal.remaining)), **options)
+
+    def affected_tasks(
+        self, paths: list[str], graph: TaskGraph | None = None
+    ) -> set[str]:
+        """The tasks containing any of `paths`, relative to the current
+        directory, and every task downstream of them."""
+        if graph is None:
+            graph = self.dependency_graph()
+
+        changed = {graph.owner(Path(os.path.abspath(path))) for path in paths}
+        changed.discard(None)
+
+        return graph.downstream(changed)
+
+    def watch(
+        self, watcher: Watcher, debounce: float = 0.2, **options
+    ) -> Iterator[tuple[set[str], int]]:
+        """Run the tasks affected by each burst of changes `watcher` reports,
+        keeping the task tree in memory between runs. Yields the affected
+        tasks and the return code of each run."""
+        for changed in debounced(watcher, debounce):
+            graph = self.dependency_graph()
+            affected = self.affected_tasks(sorted(changed), graph)
+            if not affected:
+                continue
+
+            yield affected, self._run(graph.subgraph(affected), **options)
 
-    def run_task(self, task_name: str) -> int:
+    @property
+    def watched_folders(self) -> list[Path]:
+        """The input and src folders of every task."""
+        return [
+            task.task_directory / folder
+            for task in self.task_index.values()
+            for folder in ("input", "src")
+            if (task.task_directory / folder).is_dir()
+        ]
+
+    def dependency_graph(self, tasks: list[Task] | None = None) -> TaskGraph:
+        if tasks is None:
+            tasks = self.tasks
+
+        return TaskGraph.from_tasks(tasks, self.project_root)
+
+    def _run(
+        self,
+        graph: TaskGraph,
+        prefetch: bool = False,
+        prefetch_budget: int | None = None,
+        workers: list[str] | None = None,
+        **options,
+    ) -> int:
+        """Run the tasks in `graph`. `options`, such as `jobs` and `force`,
+        are passed on to the Scheduler. With `prefetch`, the inputs of the
+        next task are read ahead, up to `prefetch_budget` bytes.
+
+        Tasks run on the `workers`, or those listed in pdp.yml, if any, and
+        on this machine otherwise. By default as many run at once as the
+        workers have slots."""
+        index = HashIndex(self.state_directory / "hashes.json")
+
+        executor = None
+        workers = workers or self.config.workers
+        if workers:
+            from .remote import RemoteExecutor
+
+            executor = RemoteExecutor(workers)
+
+        if options.get("jobs") is None:
+            options["jobs"] = executor.slots if executor else 1
+
+        prefetcher = Prefetcher(prefetch_budget) if prefetch else None
+        scheduler = Scheduler(
+            graph,
+            state=BuildState(self.state_directory / "state.json"),
+            cache=self.output_cache,
+            log_directory=self.log_directory,
+            index=index,
+            prefetcher=prefetcher,
+            executor=executor,
+            journal=RunJournal(self.journal_path),
+            **options,
+        )
+        try:
+            returncode = scheduler.run()
+        finally:
+            if prefetcher is not None:
+                prefetcher.close()
+            if executor is not None:
+                executor.close()
+        index.save()
+
+        self.last_report = RunReport.from_scheduler(scheduler, returncode)
+        self.last_report.write(self.runs_directory)
+
+        return returncode
+
+    def hash_task(
+        self, task_name: str, folder: str = "input", engine: HashEngine | None = None
+    ) -> dict[str, str | None]:
+        """The digest of every file in one of a task's folders ("input",
+        "src" or "output"), by path relative to the folder."""
         task = self._find_task_by_name(task_name)
         if task is None:
             raise ValueError(f"Task {task_name} not found")
 
-        return task.run()
+        if engine is None:
+            engine = HashEngine()
 
-    def run_all(self) -> int:
-        for task in self.tasks:
-            self.run_task(task.task_name)
+        # Only used if the engine hashes with the default algorithm.
+        index = HashIndex(self.state_directory / "hashes.json")
+        digests = folder_digests(getattr(task, f"{folder}_folder"), engine, index)
+        index.save()
+
+        return digests
+
+    def rollback(self, task_name: str) -> None:
+        """Put back the outputs a task had before its last successful run,
+        if it writes its outputs atomically."""
+        task = self._find_task_by_name(task_name)
+        if task is None:
+            raise ValueError(f"Task {task_name} not found")
 
-        return 0
+        task.rollback_output()
+
+    def profile(self, runs: int = 10) -> Profile:
+        return Profile(self.dependency_graph(), read_reports(self.runs_directory, runs))
 
     def _find_task_by_name(self, task_name: str) -> Task | None:
-        return next((t for t in self.tasks if t.task_name == task_name), None)
+        """Look up a task by its path from the project root, such as
+        "clean/geocode"."""
+        return self.task_index.get(normalize_key(task_name))
+
+    def _index_subtree(self, task: Task) -> None:
+        self.task_index[self.task_key(task)] = task
+        for subtask in task.subtasks:
+            self._index_subtree(subtask)
+
+    def task_key(self, task: Task) -> str:
+        return task_key(task, self.project_root)
 
-    def task_tree(self) -> Tree:
+    def task_tree(self) -> "Tree":
         """Create a tree structure of the tasks and subtasks.
         Subtasks are recursively nested within tasks."""
+        from rich.tree import Tree
+
         tree = Tree(f"1. {self.project_name}")
         counter = count(2)
         for task in self.tasks:
@@ -128,7 +369,43 @@ class PDP(object):
 
     @property
     def project_root(self) -> Path:
-        return find_project_root("pdp.yml")
+        if self._project_root is None:
+            self._project_root = find_project_root("pdp.yml")
+
+        return self._project_root
+
+    def invalidate_project_root(self) -> None:
+        self._project_root = None
+
+    @property
+    def state_directory(self) -> Path:
+        return self.project_root / ".pdp"
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.state_directory / "manifest.json"
+
+    @property
+    def journal_path(self) -> Path:
+        return self.state_directory / "journal.json"
+
+    @property
+    def output_cache(self) -> OutputCache | None:
+        """The shared output cache, if one is configured by the PDP_CACHE
+        environment variable or the `cache` key in pdp.yml."""
+        cache_directory = os.environ.get("PDP_CACHE") or self.config.cache_directory
+        if not cache_directory:
+            return None
+
+        return OutputCache(self.project_root / cache_directory)
+
+    @property
+    def log_directory(self) -> Path:
+        return self.state_directory / "logs"
+
+    @property
+    def runs_directory(self) -> Path:
+        return self.state_directory / "runs"
 
     @property
     def initialized(self) -> bool:
@@ -1,9 +1,15 @@
+import copy
+import json
+import time
+from contextlib import contextmanager
 from pathlib import Path
 from abc import ABC, abstractmethod
 
-from ruamel.yaml import YAML
-
+from .atomic import atomic_write
 from .pdp_errors import UninitializedProjectError
+from .scan import RACY_INTERVAL_NS
+
+MANIFEST_VERSION = 1
 
 
 def requires_initialization(method):
@@ -15,31 +21,187 @@ def requires_initialization(method):
     return wrapper
 
 
+def load_yaml(path):
+    """Parse a YAML file into plain dicts and lists. The safe loader runs in
+    C when ruamel.yaml.clib is installed, and is much faster than the
+    round-trip loader, which is only needed to write config files."""
+    from ruamel.yaml import YAML
+
+    return YAML(typ="safe").load(path)
+
+
+def file_signature(path):
+    stat = path.stat()
+    return (stat.st_mtime_ns, stat.st_ctime_ns, stat.st_size, stat.st_ino)
+
+
 class GenericConfig(ABC):
+    # Parsed config files shared by every config in the process, keyed by
+    # path and validated against the file's signature on each read.
+    _cache = {}
+
     def __init__(self, name, task_key, path_to_config) -> None:
-        self.yaml = YAML()
+        self._yaml = None
 
         self.task_key = task_key
         self.path_to_config = Path(path_to_config).resolve()
         self.config = self.read_config_file()
         self.name = name or self.config.get("name", None)
 
+        self._batch_depth = 0
+        self._dirty = False
+
     def read_config_file(self):
         try:
-            return dict(self.yaml.load(self.path_to_config))
-        except (TypeError, FileNotFoundError):
+            signature = file_signature(self.path_to_config)
+        except FileNotFoundError:
+            return {}
+
+        cached = self._cache.get(self.path_to_config)
+        if cached is None or cached[0] != signature:
+            cached = (signature, self.parse_config_file())
+            self._cache[self.path_to_config] = cached
+
+        return copy.deepcopy(cached[1])
+
+    @property
+    def yaml(self):
+        # ruamel.yaml is imported on first use, as it is slow to import and
+        # many commands never write a config file.
+        if self._yaml is None:
+            from ruamel.yaml import YAML
+
+            self._yaml = YAML()
+        return self._yaml
+
+    def parse_config_file(self):
+        try:
+            return dict(load_yaml(self.path_to_config))
+        except (TypeError, ValueError, FileNotFoundError):
+            return {}
+
+    def editable_config(self):
+        """The config to change and write back, parsed with the round-trip
+        loader so that comments and formatting are kept, or the config with
+        changes waiting to be written at the end of a batch."""
+        if self._dirty:
+            return self.config
+
+        try:
+            config = self.yaml.load(self.path_to_config)
+        except (ValueError, FileNotFoundError):
+            return {}
+        return config if isinstance(config, dict) else {}
+
+    def write_config_file(self, config):
+        with atomic_write(self.path_to_config) as f:
+            self.yaml.dump(config, f)
+        self._cache.pop(self.path_to_config, None)
+
+    def refresh_config(self):
+        """Re-read the config from disk, unless it has changes that are
+        waiting to be written at the end of a batch."""
+        if not self._dirty:
+            self.config = self.read_config_file()
+        return self.config
+
+    @contextmanager
+    def batch(self):
+        """Hold back writes until the outermost batch exits, then write the
+        config once."""
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0 and self._dirty:
+                self._dirty = False
+                self.write_config_file(self.config)
+
+    @classmethod
+    def clear_cache(cls):
+        cls._cache.clear()
+
+    @classmethod
+    def load_manifest(cls, path_to_manifest):
+        """Seed the cache with the configs parsed by an earlier process, so
+        that files unchanged since are not parsed again. Returns the
+        manifest's configs, to pass to `save_manifest`."""
+        try:
+            with open(path_to_manifest) as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, NotADirectoryError, json.JSONDecodeError):
+            return {}
+
+        if (
+            not isinstance(manifest, dict)
+            or manifest.get("version") != MANIFEST_VERSION
+        ):
+            return {}
+
+        # Anything but {path: [signature, config]} is from another tool or
+        # a damaged file, and is treated as an empty manifest.
+        configs = manifest.get("configs", {})
+        if not isinstance(configs, dict) or not all(
+            isinstance(entry, list)
+            and len(entry) == 2
+            and isinstance(entry[0], list)
+            and isinstance(entry[1], dict)
+            for entry in configs.values()
+        ):
             return {}
 
+        for path, (signature, config) in configs.items():
+            cls._cache.setdefault(Path(path), (tuple(signature), config))
+
+        return configs
+
+    @classmethod
+    def save_manifest(cls, path_to_manifest, paths, previous=None):
+        """Write the cached configs of `paths` to the manifest, unless they
+        are the same as the `previous` ones loaded from it, or it cannot be
+        written. Returns the configs now in the manifest."""
+        now = time.time_ns()
+        configs = {}
+        for path in paths:
+            cached = cls._cache.get(path)
+            if cached is None or now - cached[0][1] <= RACY_INTERVAL_NS:
+                continue
+            configs[str(path)] = [list(cached[0]), cached[1]]
+
+        if configs == (previous or {}):
+            return configs
+
+        try:
+            manifest = json.dumps({"version": MANIFEST_VERSION, "configs": configs})
+        except (TypeError, ValueError):
+            # A config holds values JSON cannot represent, such as dates.
+            return previous or {}
+
+        # The manifest is only a cache, so a project that cannot be written
+        # to, such as a read-only checkout, is loaded without it.
+        try:
+            path_to_manifest.parent.mkdir(parents=True, exist_ok=True)
+            with atomic_write(path_to_manifest) as f:
+                f.write(manifest)
+        except OSError:
+            return previous or {}
+
+        return configs
+
     @requires_initialization
     def update_config(self, config):
-        self.yaml.dump(config, self.path_to_config)
+        if self._batch_depth > 0:
+            self._dirty = True
+        else:
+            self.write_config_file(config)
         self.config = config
 
     @requires_initialization
     def update_config_key(self, key, value):
-
-        self.config[key] = value
-        self.update_config(self.config)
+        config = self.editable_config()
+        config[key] = value
+        self.update_config(config)
 
     @property
     def initialized(self):
@@ -53,12 +215,18 @@ class GenericConfig(ABC):
 
     @requires_initialization
     def add_task(self, task_name):
-        tasks = self.config[self.task_key]
+        # Most calls find the task already listed, so only parse the file
+        # with the slower round-trip loader when it has to be rewritten.
+        if task_name in self.tasks:
+            return
+
+        config = self.editable_config()
+        tasks = config[self.task_key]
 
         if task_name not in tasks:
             tasks.append(task_name)
 
-            self.update_config_key(self.task_key, tasks)
+            self.update_config(config)
 
     @property
     def tasks(self):
@@ -84,7 +252,7 @@ class PDPConfig(GenericConfig):
         if self.initialized:
             return
 
-        self.yaml.dump({"name": self.name, "tasks": []}, self.path_to_config)
+        self.write_config_file({"name": self.name, "tasks": []})
 
         self.config = self.read_config_file()
 
@@ -95,8 +263,19 @@ class PDPConfig(GenericConfig):
         if not isinstance(self.config["tasks"], list):
             return False
 
+        if not isinstance(self.config.get("workers", []), list):
+            return False
+
         return True
 
+    @property
+    def cache_directory(self):
+        return self.config.get("cache")
+
+    @property
+    def workers(self):
+        return self.config.get("workers", [])
+
 
 class TaskConfig(GenericConfig):
     def __init__(self, task_name, path_to_config) -> None:
@@ -107,9 +286,7 @@ class TaskConfig(GenericConfig):
             self.config = self.read_config_file()
             return
 
-        self.yaml.dump(
-            {"name": self.name, "entrypoint": "", "subtasks": []}, self.path_to_config
-        )
+        self.write_config_file({"name": self.name, "entrypoint": "", "subtasks": []})
 
         self.config = self.read_config_file()
 
@@ -120,10 +297,47 @@ class TaskConfig(GenericConfig):
         if not isinstance(self.config["subtasks"], list):
             return False
 
+        if not isinstance(self.config.get("depends_on", []), list):
+            return False
+
+        if not isinstance(self.config.get("atomic_output", False), bool):
+            return False
+
+        timeout = self.config.get("timeout")
+        if timeout is not None and (
+            isinstance(timeout, bool)
+            or not isinstance(timeout, (int, float))
+            or timeout <= 0
+        ):
+            return False
+
+        retries = self.config.get("retries", 0)
+        if isinstance(retries, bool) or not isinstance(retries, int) or retries < 0:
+            return False
+
         return True
 
     @property
     @requires_initialization
     def entrypoint(self):
-        self.config = self.read_config_file()
-        return self.config["entrypoint"]
+        return self.refresh_config()["entrypoint"]
+
+    @property
+    @requires_initialization
+    def depends_on(self):
+        return self.refresh_config().get("depends_on", [])
+
+    @property
+    @requires_initialization
+    def atomic_output(self):
+        return self.refresh_config().get("atomic_output", False)
+
+    @property
+    @requires_initialization
+    def timeout(self):
+        return self.refresh_config().get("timeout")
+
+    @property
+    @requires_initialization
+    def retries(self):
+        return self.refresh_config().get("retries", 0)
@@ -0,0 +1,100 @@
+import os
+import queue
+import threading
+from pathlib import Path
+
+from .scan import scan_files
+
+READ_SIZE = 1024 * 1024
+
+
+def default_budget() -> int:
+    """A quarter of the memory that is free right now, so that prefetched
+    inputs fit without evicting pages that running tasks use."""
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") // 4
+    except (AttributeError, ValueError, OSError):
+        return 256 * 1024 * 1024
+
+
+def advise_willneed(path: str, length: int) -> None:
+    """Ask the kernel to start reading the first `length` bytes of `path`
+    into the page cache. Where posix_fadvise is not available, the bytes
+    are read instead."""
+    with open(path, "rb") as f:
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(f.fileno(), 0, length, os.POSIX_FADV_WILLNEED)
+            return
+
+        remaining = length
+        while remaining > 0 and (data := f.read(min(READ_SIZE, remaining))):
+            remaining -= len(data)
+
+
+class Prefetcher:
+    """Warms the page cache with the input files of tasks that are about to
+    run, on a background thread, so that a task does not start by waiting
+    on slow storage. Symlinks to upstream outputs are followed.
+
+    At most `budget` bytes are held for tasks that have not started yet.
+    Once a task starts, its inputs count as part of its working set and
+    their bytes are released for the next task."""
+
+    def __init__(self, budget: int | None = None) -> None:
+        self.budget = default_budget() if budget is None else budget
+        self.reserved: dict[str, int] = {}
+        self._queued: set[str] = set()
+        self._started: set[str] = set()
+        self._closed = False
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._work, name="pdp-prefetch", daemon=True
+        )
+        self._thread.start()
+
+    def prefetch(self, key: str, folder: Path) -> None:
+        """Warm the files under `folder`, the inputs of task `key`."""
+        with self._lock:
+            if key in self._queued or key in self._started:
+                return
+            self._queued.add(key)
+
+        self._queue.put((key, folder))
+
+    def started(self, key: str) -> None:
+        """Stop warming the inputs of `key`, which is now running, and
+        release the bytes held for them."""
+        with self._lock:
+            self._started.add(key)
+            self.reserved.pop(key, None)
+
+    def close(self) -> None:
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def _work(self) -> None:
+        while (item := self._queue.get()) is not None:
+            self._warm(*item)
+
+    def _warm(self, key: str, folder: Path) -> None:
+        for _, path, stat in scan_files(folder):
+            if stat is None or stat.st_size == 0:
+                continue
+
+            with self._lock:
+                if self._closed or key in self._started:
+                    return
+
+                available = self.budget - sum(self.reserved.values())
+                if available <= 0:
+                    return
+
+                length = min(stat.st_size, available)
+                self.reserved[key] = self.reserved.get(key, 0) + length
+
+            try:
+                advise_willneed(path, length)
+            except OSError:
+                pass
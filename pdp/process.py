@@ -0,0 +1,268 @@
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+# Seconds a process group gets to exit after SIGTERM before it is killed.
+KILL_GRACE = 5.0
+
+# Seconds before the first retry of a failed command, doubling for each
+# further retry up to MAX_RETRY_DELAY.
+RETRY_DELAY = 1.0
+MAX_RETRY_DELAY = 60.0
+
+
+@dataclass
+class ProcessResult:
+    returncode: int
+    wall_time: float = 0.0
+    user_time: float = 0.0
+    system_time: float = 0.0
+    max_rss: int = 0
+    timed_out: bool = False
+    attempts: int = 1
+
+    def to_dict(self) -> dict:
+        return {
+            "returncode": self.returncode,
+            "wall_time": self.wall_time,
+            "user_time": self.user_time,
+            "system_time": self.system_time,
+            "max_rss": self.max_rss,
+            "timed_out": self.timed_out,
+            "attempts": self.attempts,
+        }
+
+    @classmethod
+    def from_dict(cls, result: dict) -> "ProcessResult":
+        # Results written by older versions lack the newer fields.
+        return cls(
+            **{key: result[key] for key in cls.__dataclass_fields__ if key in result}
+        )
+
+
+def max_rss_bytes(rusage) -> int:
+    # ru_maxrss is in bytes on macOS and in kilobytes everywhere else.
+    if sys.platform == "darwin":
+        return rusage.ru_maxrss
+
+    return rusage.ru_maxrss * 1024
+
+
+class ChildProcesses:
+    """Processes that are running on behalf of one owner, such as an
+    executor, so that another thread can terminate them all. Processes
+    added after `terminate` are terminated as soon as they are added."""
+
+    def __init__(self) -> None:
+        self.terminated = threading.Event()
+        self._processes: set[subprocess.Popen] = set()
+        self._lock = threading.Lock()
+
+    def add(self, process: subprocess.Popen) -> None:
+        with self._lock:
+            self._processes.add(process)
+            terminated = self.terminated.is_set()
+
+        if terminated:
+            terminate_process(process)
+
+    def remove(self, process: subprocess.Popen) -> None:
+        with self._lock:
+            self._processes.discard(process)
+
+    def terminate(self) -> None:
+        with self._lock:
+            self.terminated.set()
+            processes = list(self._processes)
+
+        for process in processes:
+            terminate_process(process)
+
+
+# run_process registers the processes it starts with these, if set.
+child_processes: ContextVar[ChildProcesses | None] = ContextVar(
+    "child_processes", default=None
+)
+
+
+def terminate_process(
+    process: subprocess.Popen, sig: signal.Signals = signal.SIGTERM
+) -> None:
+    """Send `sig` to the process group of `process`, which was started in a
+    group of its own, so that the commands its shell started get it too."""
+    if process.returncode is not None:
+        return
+
+    try:
+        os.killpg(process.pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+class Deadline:
+    """Terminates the process group of `process` once `timeout` seconds
+    have passed, and kills it if it is still running KILL_GRACE seconds
+    later, unless `cancel` is called first. Does nothing if `timeout` is
+    None."""
+
+    def __init__(self, process: subprocess.Popen, timeout: float | None) -> None:
+        self.process = process
+        self.timeout = timeout
+        self.expired = False
+        self._finished = threading.Event()
+
+        if timeout is not None:
+            threading.Thread(target=self._expire, daemon=True).start()
+
+    def _expire(self) -> None:
+        if self._finished.wait(self.timeout):
+            return
+
+        self.expired = True
+        terminate_process(self.process)
+        if not self._finished.wait(KILL_GRACE):
+            terminate_process(self.process, signal.SIGKILL)
+
+    def cancel(self) -> None:
+        self._finished.set()
+
+
+def run_process(
+    command: str,
+    cwd: Path,
+    log_directory: Path | None = None,
+    prefix: str = "",
+    tee: bool = True,
+    env: dict[str, str] | None = None,
+    timeout: float | None = None,
+) -> ProcessResult:
+    """Run `command` through the shell and wait for it, measuring the wall
+    time and the CPU time and peak memory of the process and everything it
+    waited for.
+
+    With a `log_directory`, the command's stdout and stderr are streamed to
+    stdout.log and stderr.log in it, and also echoed to the console with
+    each line prefixed by `[prefix]` if `tee` is set. Otherwise the command
+    shares this process's stdout and stderr. `env` replaces the environment
+    the command runs in.
+
+    If `child_processes` is set, the command runs in a process group of its
+    own and is registered there while it runs, so that it can be terminated
+    with everything it started. So it does with a `timeout`, after which it
+    is terminated and the result is marked as timed out."""
+    start = time.monotonic()
+    processes = child_processes.get()
+    if processes is None and timeout is None:
+        group = {}
+    else:
+        group = {"process_group": 0}
+
+    if log_directory is None:
+        process = subprocess.Popen(command, cwd=cwd, env=env, shell=True, **group)
+        drained = []
+    else:
+        # Imported here, as the pump loads asyncio, which slows down CLI
+        # startup for commands that run no tasks.
+        from .logs import log_pump
+
+        log_directory.mkdir(parents=True, exist_ok=True)
+        process = subprocess.Popen(
+            command,
+            cwd=cwd,
+            env=env,
+            shell=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            **group,
+        )
+        drained = [
+            log_pump.pump(
+                process.stdout,
+                log_directory / "stdout.log",
+                sys.stdout if tee else None,
+                prefix,
+            ),
+            log_pump.pump(
+                process.stderr,
+                log_directory / "stderr.log",
+                sys.stderr if tee else None,
+                prefix,
+            ),
+        ]
+
+    if processes is not None:
+        processes.add(process)
+    deadline = Deadline(process, timeout)
+    try:
+        result = wait_process(process, start)
+    finally:
+        deadline.cancel()
+        if processes is not None:
+            processes.remove(process)
+    result.timed_out = deadline.expired
+
+    for done in drained:
+        done.result()
+
+    return result
+
+
+def wait_process(process: subprocess.Popen, start: float) -> ProcessResult:
+    """Wait for `process`, started at `start` on the monotonic clock, and
+    measure what it used."""
+    # wait4 gives the resource usage of this child alone, which
+    # getrusage(RUSAGE_CHILDREN) cannot when tasks run concurrently.
+    _, status, rusage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+
+    return ProcessResult(
+        returncode=process.returncode,
+        wall_time=time.monotonic() - start,
+        user_time=rusage.ru_utime,
+        system_time=rusage.ru_stime,
+        max_rss=max_rss_bytes(rusage),
+    )
+
+
+def run_with_retries(
+    run: Callable[[], ProcessResult],
+    retries: int,
+    prefix: str = "",
+    cancelled: threading.Event | None = None,
+) -> ProcessResult:
+    """Call `run` until it succeeds, or up to `retries` more times, waiting
+    RETRY_DELAY seconds before the first retry and twice as long before
+    each further one. Retrying stops once `cancelled` is set, which defaults
+    to the `child_processes` being terminated. The result of the last
+    attempt is returned, with the number of attempts."""
+    if cancelled is None:
+        processes = child_processes.get()
+        cancelled = threading.Event() if processes is None else processes.terminated
+
+    attempt = 1
+    while True:
+        result = run()
+        result.attempts = attempt
+        if result.returncode == 0 or attempt > retries:
+            return result
+
+        delay = min(RETRY_DELAY * 2 ** (attempt - 1), MAX_RETRY_DELAY)
+        if result.timed_out:
+            reason = "Timed out"
+        else:
+            reason = f"Failed with exit code {result.returncode}"
+        sys.stderr.write(
+            f"[{prefix}] {reason}, retrying in {delay:g}s "
+            f"(retry {attempt} of {retries}).\n"
+        )
+        if cancelled.wait(delay):
+            return result
+
+        attempt += 1
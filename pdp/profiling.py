@@ -0,0 +1,134 @@
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from .graph import TaskGraph
+from .report import RunReport, format_duration
+
+if TYPE_CHECKING:
+    from rich.table import Table
+
+
+def read_reports(runs_directory: Path, limit: int) -> list[RunReport]:
+    """The last `limit` run reports, oldest first."""
+    if not runs_directory.exists():
+        return []
+
+    paths = sorted(runs_directory.glob("*.json"))[-limit:]
+    return [RunReport.read(path) for path in paths]
+
+
+def latest_durations(reports: list[RunReport]) -> dict[str, float]:
+    """The most recently measured wall time of each task. Tasks that were
+    skipped in later runs keep the time from the last run they ran in."""
+    durations = {}
+    for report in reports:
+        for key, result in report.results.items():
+            durations[key] = result.wall_time
+
+    return durations
+
+
+def critical_path(
+    graph: TaskGraph, durations: dict[str, float]
+) -> tuple[list[str], float]:
+    """The chain of dependent tasks with the longest total duration, which
+    bounds the wall time of a run however many jobs it uses."""
+    finish = {}
+    previous = {}
+    for key in graph.topological_order():
+        slowest = max(sorted(graph.dependencies[key]), key=finish.get, default=None)
+        previous[key] = slowest
+        finish[key] = durations.get(key, 0.0) + finish.get(slowest, 0.0)
+
+    if not finish:
+        return [], 0.0
+
+    key = max(finish, key=finish.get)
+    length = finish[key]
+
+    path = []
+    while key is not None:
+        path.append(key)
+        key = previous[key]
+
+    return path[::-1], length
+
+
+class Profile:
+    """Where the time goes in a project's runs, based on recent run reports."""
+
+    def __init__(self, graph: TaskGraph, reports: list[RunReport]) -> None:
+        self.graph = graph
+        self.reports = reports
+        self.durations = {
+            key: duration
+            for key, duration in latest_durations(reports).items()
+            if key in graph
+        }
+        self.critical_path, self.critical_path_time = critical_path(
+            graph, self.durations
+        )
+
+    @property
+    def total_time(self) -> float:
+        """Wall time of running every task one after another."""
+        return sum(self.durations.values())
+
+    @property
+    def max_speedup(self) -> float:
+        """Best speedup over running tasks one at a time, with enough jobs
+        to run all independent tasks at once."""
+        if self.critical_path_time == 0:
+            return 1.0
+
+        return self.total_time / self.critical_path_time
+
+    def contribution_table(self) -> "Table":
+        from rich.table import Table
+
+        table = Table(title="Task contributions")
+        table.add_column("Task")
+        table.add_column("Time", justify="right")
+        table.add_column("Share", justify="right")
+        table.add_column("Critical path", justify="center")
+
+        critical = set(self.critical_path)
+        by_duration = sorted(self.durations.items(), key=lambda i: i[1], reverse=True)
+        for key, duration in by_duration:
+            share = duration / self.total_time if self.total_time else 0.0
+            table.add_row(
+                key,
+                format_duration(duration),
+                f"{share:.1%}",
+                "*" if key in critical else "",
+                style="bold" if key in critical else None,
+            )
+
+        return table
+
+    def trend_table(self) -> "Table":
+        from rich.table import Table
+
+        table = Table(title=f"Wall time over the last {len(self.reports)} runs")
+        table.add_column("Task")
+        for report in self.reports:
+            table.add_column(f"{report.started_at:%m-%d %H:%M}", justify="right")
+        table.add_column("Change", justify="right")
+
+        by_duration = sorted(self.durations, key=self.durations.get, reverse=True)
+        for key in by_duration:
+            times = [
+                report.results[key].wall_time if key in report.results else None
+                for report in self.reports
+            ]
+            cells = ["" if t is None else format_duration(t) for t in times]
+
+            measured = [t for t in times if t is not None]
+            change = ""
+            if len(measured) > 1 and measured[0] > 0:
+                ratio = measured[-1] / measured[0] - 1
+                change = f"{ratio:+.0%}" if abs(ratio) >= 0.005 else "+0%"
+
+            table.add_row(key, *cells, change)
+
+        return table
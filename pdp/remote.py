@@ -0,0 +1,417 @@
+import hmac
+import json
+import os
+import queue
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+
+from .process import (
+    ChildProcesses,
+    Deadline,
+    ProcessResult,
+    run_with_retries,
+    wait_process,
+)
+from .task import Task
+
+DEFAULT_PORT = 8765
+READ_SIZE = 64 * 1024
+
+
+def parse_address(address: str) -> tuple[str, int]:
+    """Split "host:port" or "[v6 host]:port"; the port defaults to 8765."""
+    host, colon, port = address.rpartition(":")
+    if not colon or "]" in port:
+        host, port = address, str(DEFAULT_PORT)
+
+    try:
+        return host.strip("[]"), int(port)
+    except ValueError:
+        raise ValueError(f"Invalid worker address {address}") from None
+
+
+def encode(data: bytes) -> str:
+    return data.decode("utf-8", errors="surrogateescape")
+
+
+def decode(data: str) -> bytes:
+    return data.encode("utf-8", errors="surrogateescape")
+
+
+class Channel:
+    """JSON messages, one per line, over a socket."""
+
+    def __init__(self, sock: socket.socket) -> None:
+        self.sock = sock
+        self.reader = sock.makefile("rb")
+        self.writer = sock.makefile("wb")
+        self._lock = threading.Lock()
+
+    def send(self, message: dict) -> None:
+        with self._lock:
+            self.writer.write(json.dumps(message).encode() + b"\n")
+            self.writer.flush()
+
+    def receive(self) -> dict | None:
+        """The next message, or None once the other end has closed. Raises
+        ValueError for lines that are not JSON objects."""
+        line = self.reader.readline()
+        if not line:
+            return None
+
+        message = json.loads(line)
+        if not isinstance(message, dict):
+            raise ValueError(f"Invalid message {line!r}")
+
+        return message
+
+    def close(self) -> None:
+        # Wake up a thread blocked in receive. Closing the reader would wait
+        # for it otherwise.
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+        for closeable in (self.reader, self.writer, self.sock):
+            try:
+                closeable.close()
+            except OSError:
+                pass
+
+
+class WorkerHandler(socketserver.BaseRequestHandler):
+    def handle(self) -> None:
+        channel = Channel(self.request)
+        try:
+            hello = channel.receive()
+            if hello is None:
+                return
+
+            token = self.server.token
+            if token and not hmac.compare_digest(
+                str(hello.get("token")).encode(errors="surrogatepass"),
+                token.encode(errors="surrogatepass"),
+            ):
+                channel.send({"error": "Invalid token"})
+                return
+
+            channel.send({"slots": self.server.slots})
+
+            # Requests are read on another thread, so that a cancel message
+            # or a closed connection can terminate the running command.
+            self.processes = ChildProcesses()
+            requests = queue.Queue()
+            threading.Thread(
+                target=self.read, args=(channel, requests), daemon=True
+            ).start()
+
+            while (request := requests.get()) is not None:
+                with self.server.semaphore:
+                    result = self.run(request, channel)
+                channel.send({"result": result.to_dict()})
+        except (OSError, ValueError):
+            pass
+        finally:
+            channel.close()
+
+    def read(self, channel: Channel, requests: queue.Queue) -> None:
+        try:
+            while (message := channel.receive()) is not None:
+                if message.get("cancel"):
+                    self.processes.terminate()
+                else:
+                    requests.put(message)
+        except (OSError, ValueError):
+            pass
+        finally:
+            self.processes.terminate()
+            requests.put(None)
+
+    def run(self, request: dict, channel: Channel) -> ProcessResult:
+        start = time.monotonic()
+        try:
+            process = subprocess.Popen(
+                request["command"],
+                cwd=request["cwd"],
+                env={**os.environ, **request.get("env", {})},
+                shell=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                process_group=0,
+            )
+        except OSError as e:
+            # The task cannot start here, for example because its folder is
+            # not mounted on this machine. The worker itself is fine.
+            channel.send({"stream": "stderr", "data": f"{e}\n"})
+            return ProcessResult(returncode=127, wall_time=time.monotonic() - start)
+        self.processes.add(process)
+        self.server.processes.add(process)
+
+        def forward(pipe, stream: str) -> None:
+            with pipe:
+                while data := os.read(pipe.fileno(), READ_SIZE):
+                    try:
+                        channel.send({"stream": stream, "data": encode(data)})
+                    except OSError:
+                        pass
+
+        forwarders = [
+            threading.Thread(target=forward, args=(process.stdout, "stdout")),
+            threading.Thread(target=forward, args=(process.stderr, "stderr")),
+        ]
+        for forwarder in forwarders:
+            forwarder.start()
+
+        deadline = Deadline(process, request.get("timeout"))
+        try:
+            result = wait_process(process, start)
+        finally:
+            deadline.cancel()
+            self.processes.remove(process)
+            self.server.processes.remove(process)
+        result.timed_out = deadline.expired
+
+        for forwarder in forwarders:
+            forwarder.join()
+
+        return result
+
+
+class WorkerServer(socketserver.ThreadingTCPServer):
+    """Runs the commands clients send, at most `slots` at a time.
+
+    The protocol is JSON lines over TCP. A client connects, sends
+    {"token": ...} and receives {"slots": n}. It then sends one
+    {"command", "cwd", "env", "timeout"} request at a time, where "env"
+    holds variables to add to the worker's environment, and receives the command's output
+    as {"stream", "data"} messages followed by {"result"}. Output bytes are
+    carried as text with surrogate escapes, so they arrive unchanged. A
+    command that cannot be started, for example in a folder that does not
+    exist on the worker, fails with exit code 127 and the error on stderr.
+
+    A {"cancel": true} message, or closing the connection, terminates the
+    command that is running for the client, as does closing the server
+    for all clients."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(
+        self,
+        address: tuple[str, int],
+        slots: int = 1,
+        token: str | None = None,
+    ) -> None:
+        super().__init__(address, WorkerHandler)
+        self.slots = slots
+        self.token = token
+        self.semaphore = threading.BoundedSemaphore(slots)
+        self.processes = ChildProcesses()
+
+    def server_close(self) -> None:
+        self.processes.terminate()
+        super().server_close()
+
+
+class WorkerConnection:
+    """One slot on a worker: a connection that runs one task at a time."""
+
+    def __init__(self, address: str, token: str | None, timeout: float) -> None:
+        self.address = address
+        sock = socket.create_connection(parse_address(address), timeout=timeout)
+        sock.settimeout(None)
+        self.channel = Channel(sock)
+
+        self.channel.send({"token": token})
+        hello = self.channel.receive()
+        if hello is None or "slots" not in hello:
+            self.close()
+            reason = (hello or {}).get("error", "no response")
+            raise ConnectionError(f"Worker {address} refused the connection: {reason}")
+
+        self.slots = hello["slots"]
+
+    def run(
+        self, request: dict, log_directory: Path | None, prefix: str, tee: bool
+    ) -> ProcessResult:
+        """Send `request` to the worker and wait for its result, logging the
+        command's output as run_process does."""
+        from .logs import PipeProtocol
+
+        if log_directory is not None:
+            log_directory.mkdir(parents=True, exist_ok=True)
+
+        outputs = {}
+        for stream, console in (("stdout", sys.stdout), ("stderr", sys.stderr)):
+            if log_directory is None:
+                log_file = open(os.devnull, "wb")
+            else:
+                log_file = open(log_directory / f"{stream}.log", "wb")
+                console = console if tee else None
+            outputs[stream] = PipeProtocol(log_file, console, prefix, Future())
+
+        try:
+            self.channel.send(request)
+
+            while (message := self.channel.receive()) is not None:
+                if "result" in message:
+                    return ProcessResult.from_dict(message["result"])
+
+                outputs[message["stream"]].data_received(decode(message["data"]))
+
+            raise ConnectionError(f"Worker {self.address} closed the connection")
+        finally:
+            for output in outputs.values():
+                output.connection_lost(None)
+
+    def cancel(self) -> None:
+        """Ask the worker to terminate the command it is running."""
+        try:
+            self.channel.send({"cancel": True})
+        except OSError:
+            pass
+
+    def close(self) -> None:
+        self.channel.close()
+
+
+class RemoteExecutor:
+    """Runs tasks on `pdp worker` processes, each task on whichever worker
+    slot is free. If a worker goes away, its tasks are run again on the
+    others.
+
+    Workers run commands in the same paths as here, so the project must be
+    on a file system that every worker mounts at the same place. Workers
+    run any command they are sent: bind them to localhost and reach them
+    through SSH tunnels, or give the workers and the client the same
+    PDP_WORKER_TOKEN."""
+
+    def __init__(
+        self,
+        workers: list[str],
+        token: str | None = None,
+        timeout: float = 10.0,
+    ) -> None:
+        if token is None:
+            token = os.environ.get("PDP_WORKER_TOKEN")
+
+        self._free = queue.Queue()
+        self._busy: set[WorkerConnection] = set()
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self.slots = 0
+
+        try:
+            for address in workers:
+                connection = WorkerConnection(address, token, timeout)
+                self._release(connection)
+                for _ in range(connection.slots - 1):
+                    self._release(WorkerConnection(address, token, timeout))
+                self.slots += connection.slots
+        except BaseException:
+            self.close()
+            raise
+
+        self._live = self.slots
+
+    def run(
+        self,
+        task: Task,
+        log_directory: Path | None = None,
+        prefix: str | None = None,
+        tee: bool = True,
+        timeout: float | None = None,
+        retries: int | None = None,
+    ) -> ProcessResult | None:
+        entrypoint = task.entrypoint
+        if not entrypoint:
+            return None
+
+        if timeout is None:
+            timeout = task.timeout
+        if retries is None:
+            retries = task.retries
+        prefix = prefix or task.task_name
+
+        return run_with_retries(
+            lambda: self._run_once(
+                task, entrypoint, log_directory, prefix, tee, timeout
+            ),
+            retries,
+            prefix,
+            self._cancelled,
+        )
+
+    def _run_once(
+        self,
+        task: Task,
+        entrypoint: str,
+        log_directory: Path | None,
+        prefix: str,
+        tee: bool,
+        timeout: float | None,
+    ) -> ProcessResult:
+        while (connection := self._acquire()) is not None:
+            with self._lock:
+                self._busy.add(connection)
+                if self._cancelled.is_set():
+                    connection.cancel()
+            staging = task.stage_output()
+            request = {
+                "command": entrypoint,
+                "cwd": os.fspath(task.task_directory),
+                "env": {} if staging is None else task.output_environment(staging),
+                "timeout": timeout,
+            }
+            try:
+                result = connection.run(request, log_directory, prefix, tee)
+            except (OSError, ValueError) as e:
+                task.finish_output(staging, success=False)
+                connection.close()
+                with self._lock:
+                    self._busy.discard(connection)
+                    self._live -= 1
+                sys.stderr.write(f"[{prefix}] Lost worker {connection.address}: {e}\n")
+                continue
+
+            with self._lock:
+                self._busy.discard(connection)
+            self._release(connection)
+            task.finish_output(staging, success=result.returncode == 0)
+            return result
+
+        sys.stderr.write(f"[{prefix}] No workers left to run the task.\n")
+        return ProcessResult(returncode=1)
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._cancelled.set()
+            for connection in self._busy:
+                connection.cancel()
+
+    def _acquire(self) -> WorkerConnection | None:
+        while True:
+            with self._lock:
+                if self._live == 0:
+                    return None
+            try:
+                return self._free.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+    def _release(self, connection: WorkerConnection) -> None:
+        self._free.put(connection)
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._free.get_nowait().close()
+            except queue.Empty:
+                return
@@ -0,0 +1,188 @@
+import json
+import signal
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from .atomic import atomic_write
+from .process import ProcessResult
+
+if TYPE_CHECKING:
+    from rich.table import Table
+
+
+def format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(int(minutes), 60)
+
+    if hours:
+        return f"{hours}h{minutes:02d}m{seconds:02.0f}s"
+    if minutes:
+        return f"{minutes}m{seconds:04.1f}s"
+
+    return f"{seconds:.2f}s"
+
+
+def format_bytes(size: int) -> str:
+    for unit in ["B", "KiB", "MiB", "GiB"]:
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+    return f"{size:.1f} TiB"
+
+
+def format_returncode(result: ProcessResult) -> str:
+    """The exit code, or the name of the signal that killed the process,
+    or "timeout" if it was terminated for running too long."""
+    if result.timed_out:
+        return "timeout"
+
+    returncode = result.returncode
+    if returncode < 0:
+        try:
+            return signal.Signals(-returncode).name
+        except ValueError:
+            pass
+
+    return str(returncode)
+
+
+class RunReport:
+    """Exit status, timing and resource usage of every task in one run."""
+
+    def __init__(
+        self,
+        started_at: datetime,
+        wall_time: float,
+        returncode: int,
+        jobs: int,
+        results: dict[str, ProcessResult],
+        skipped: list[str],
+        restored: list[str] | None = None,
+        blocked: list[str] | None = None,
+        cancelled: list[str] | None = None,
+    ) -> None:
+        self.started_at = started_at
+        self.wall_time = wall_time
+        self.returncode = returncode
+        self.jobs = jobs
+        self.results = results
+        self.skipped = skipped
+        self.restored = restored or []
+        self.blocked = blocked or []
+        self.cancelled = cancelled or []
+
+    @classmethod
+    def from_scheduler(cls, scheduler, returncode: int) -> "RunReport":
+        return cls(
+            started_at=scheduler.started_at,
+            wall_time=scheduler.wall_time,
+            returncode=returncode,
+            jobs=scheduler.jobs,
+            results=dict(scheduler.results),
+            skipped=sorted(scheduler.skipped),
+            restored=sorted(scheduler.restored),
+            blocked=sorted(scheduler.blocked),
+            cancelled=sorted(scheduler.cancelled),
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "started_at": self.started_at.isoformat(),
+            "wall_time": self.wall_time,
+            "returncode": self.returncode,
+            "jobs": self.jobs,
+            "tasks": {key: result.to_dict() for key, result in self.results.items()},
+            "skipped": self.skipped,
+            "restored": self.restored,
+            "blocked": self.blocked,
+            "cancelled": self.cancelled,
+        }
+
+    @classmethod
+    def from_dict(cls, report: dict) -> "RunReport":
+        return cls(
+            started_at=datetime.fromisoformat(report["started_at"]),
+            wall_time=report["wall_time"],
+            returncode=report["returncode"],
+            jobs=report["jobs"],
+            results={
+                key: ProcessResult.from_dict(result)
+                for key, result in report["tasks"].items()
+            },
+            skipped=report["skipped"],
+            restored=report.get("restored", []),
+            blocked=report.get("blocked", []),
+            cancelled=report.get("cancelled", []),
+        )
+
+    def write(self, runs_directory: Path) -> Path:
+        runs_directory.mkdir(parents=True, exist_ok=True)
+        path = runs_directory / f"{self.started_at:%Y%m%dT%H%M%S%fZ}.json"
+
+        with atomic_write(path) as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+        return path
+
+    @classmethod
+    def read(cls, path: Path) -> "RunReport":
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    @property
+    def failed(self) -> list[str]:
+        return sorted(
+            key for key, result in self.results.items() if result.returncode != 0
+        )
+
+    def summary_table(self) -> "Table":
+        """Tasks that ran, slowest first, followed by tasks restored from the
+        cache, skipped tasks, and tasks that were not run because of a
+        failure."""
+        from rich.table import Table
+
+        table = Table(title=f"Ran in {format_duration(self.wall_time)}")
+        if self.failed:
+            not_run = len(self.blocked) + len(self.cancelled)
+            table.caption = f"{len(self.failed)} failed, {not_run} not run"
+        table.add_column("Task")
+        table.add_column("Exit", justify="right")
+        table.add_column("Wall", justify="right")
+        table.add_column("User", justify="right")
+        table.add_column("Sys", justify="right")
+        table.add_column("Peak RSS", justify="right")
+        retried = any(result.attempts > 1 for result in self.results.values())
+        if retried:
+            table.add_column("Attempts", justify="right")
+
+        by_wall_time = sorted(
+            self.results.items(), key=lambda item: item[1].wall_time, reverse=True
+        )
+        for key, result in by_wall_time:
+            cells = [
+                key,
+                format_returncode(result),
+                format_duration(result.wall_time),
+                format_duration(result.user_time),
+                format_duration(result.system_time),
+                format_bytes(result.max_rss),
+            ]
+            if retried:
+                cells.append(str(result.attempts))
+            table.add_row(*cells, style=None if result.returncode == 0 else "red")
+
+        for key in self.restored:
+            table.add_row(key, "cached", "", "", "", "", style="dim")
+
+        for key in self.skipped:
+            table.add_row(key, "skipped", "", "", "", "", style="dim")
+
+        for key in self.blocked:
+            table.add_row(key, "blocked", "", "", "", "", style="yellow")
+
+        for key in self.cancelled:
+            table.add_row(key, "cancelled", "", "", "", "", style="yellow")
+
+        return table
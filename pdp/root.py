@@ -0,0 +1,20 @@
+import os
+from pathlib import Path
+
+
+def find_project_root(config_name) -> Path:
+    if os.environ.get("PDP_ROOT"):
+        return Path(os.environ["PDP_ROOT"]).resolve()
+
+    current_path = Path.cwd()
+    while current_path != current_path.parent:
+        path_to_config = current_path / config_name
+        if path_to_config.exists():
+            return current_path.resolve()
+        current_path = current_path.parent
+
+    path_to_config = current_path / config_name
+    if path_to_config.exists():
+        return current_path.resolve()
+
+    return Path.cwd().resolve()
@@ -0,0 +1,87 @@
+import errno
+import os
+from pathlib import Path
+from typing import Iterator, NamedTuple
+
+# Files changed this recently may change again within the same timestamp
+# tick without their size changing, so their stat cannot vouch for their
+# contents yet, and caches keyed by it must not keep them.
+RACY_INTERVAL_NS = 2 * 10**9
+
+# Errors from stat that leave an entry without a readable target, like a
+# dangling symlink: no target, a symlink loop, or no permission on the way.
+UNREADABLE_ERRNOS = {errno.ENOENT, errno.ELOOP, errno.EACCES}
+
+
+class FileEntry(NamedTuple):
+    relative_path: str
+    path: str
+    # None for symlinks whose target does not exist or cannot be reached.
+    stat: os.stat_result | None
+
+
+def scan_files(folder: str | Path) -> Iterator[FileEntry]:
+    """Every file under `folder`, in a stable order (each directory's files
+    by name, then its subdirectories by name, depth first), with the stat of each
+    file taken once from its directory entry. Symlinks to files and
+    directories are followed, skipping directories already visited."""
+    folder = os.fspath(folder)
+    visited = set()
+    stack = [(folder, "")]
+
+    while stack:
+        directory, prefix = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                entries = sorted(entries, key=lambda entry: entry.name)
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+
+        directory_stat = os.stat(directory)
+        visited.add((directory_stat.st_dev, directory_stat.st_ino))
+
+        subdirectories = []
+        for entry in entries:
+            relative_path = prefix + entry.name
+            try:
+                if entry.is_dir():
+                    stat = entry.stat()
+                    if (stat.st_dev, stat.st_ino) not in visited:
+                        subdirectories.append((entry.path, relative_path + "/"))
+                    continue
+
+                yield FileEntry(relative_path, entry.path, entry.stat())
+            except OSError as e:
+                if e.errno not in UNREADABLE_ERRNOS:
+                    raise
+                yield FileEntry(relative_path, entry.path, None)
+
+        stack.extend(reversed(subdirectories))
+
+
+def top_level_files(folder: str | Path) -> list[FileEntry]:
+    """The files directly in `folder`, by name, without its subdirectories.
+    Symlinks to files are followed, and symlinks that lead nowhere are left
+    out."""
+    files = []
+    try:
+        with os.scandir(folder) as entries:
+            for entry in sorted(entries, key=lambda entry: entry.name):
+                try:
+                    if entry.is_file():
+                        files.append(FileEntry(entry.name, entry.path, entry.stat()))
+                except OSError as e:
+                    if e.errno not in UNREADABLE_ERRNOS:
+                        raise
+    except (FileNotFoundError, NotADirectoryError):
+        return []
+
+    return files
+
+
+def is_empty(directory: str | Path) -> bool:
+    try:
+        with os.scandir(directory) as entries:
+            return next(entries, None) is None
+    except FileNotFoundError:
+        return True
@@ -0,0 +1,267 @@
+import heapq
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, timezone
+from pathlib import Path
+
+from .graph import TaskGraph
+from .process import ProcessResult
+from .state import BuildState, input_fingerprint
+from .cache import OutputCache, cache_key
+from .hashing import HashIndex
+from .prefetch import Prefetcher
+from .executor import Executor, LocalExecutor
+from .journal import RunJournal
+
+SKIPPED = "skipped"
+RESTORED = "restored"
+RAN = "ran"
+
+
+class Scheduler:
+    """Runs the entrypoints of a task graph in a bounded pool of workers.
+
+    A task is started as soon as all of its dependencies have finished,
+    so with `jobs > 1` independent tasks run concurrently. Among ready
+    tasks, the one that comes first in the graph's topological order is
+    started first; with `jobs == 1` this is the declared order.
+
+    Given a `BuildState`, tasks whose inputs and outputs are unchanged
+    since their last successful run, and none of whose dependencies ran,
+    are skipped unless `force` is set.
+
+    Given an `OutputCache`, tasks whose inputs match a previous successful
+    run are restored from the cache instead of being run, unless `force` is
+    set, and the outputs of tasks that run successfully are added to it.
+    Given a `HashIndex`, cache keys only hash files that changed since
+    they were last hashed.
+
+    Entrypoints are run by `executor`, on this machine by default. A
+    `timeout` or number of `retries` overrides the ones in task.yml.
+
+    Given a `RunJournal`, the tasks of the run are written to it when the
+    run starts, and each task is recorded in it as soon as it finishes
+    successfully.
+
+    Given a `Prefetcher`, the input folder of the next task in order that
+    has not started yet is warmed while the running tasks run.
+
+    Given a `log_directory`, each task's output is written to its own
+    folder in it, named after the task's path, and echoed to the console
+    if `tee` is set.
+
+    Tasks that depend on a task that failed are not run, and are recorded
+    as blocked, while tasks on other branches of the graph keep running.
+    With `fail_fast`, the first failure stops the whole run instead: the
+    entrypoints that are running are terminated, and the tasks that have
+    not started are recorded as cancelled."""
+
+    def __init__(
+        self,
+        graph: TaskGraph,
+        jobs: int = 1,
+        state: BuildState | None = None,
+        force: bool = False,
+        cache: OutputCache | None = None,
+        log_directory: Path | None = None,
+        tee: bool = True,
+        index: HashIndex | None = None,
+        prefetcher: Prefetcher | None = None,
+        executor: Executor | None = None,
+        fail_fast: bool = False,
+        journal: RunJournal | None = None,
+        timeout: float | None = None,
+        retries: int | None = None,
+    ) -> None:
+        if jobs < 1:
+            raise ValueError("jobs must be at least 1")
+
+        self.graph = graph
+        self.jobs = jobs
+        self.state = state
+        self.force = force
+        self.cache = cache
+        self.log_directory = log_directory
+        self.tee = tee
+        self.index = index
+        self.prefetcher = prefetcher
+        self.executor = LocalExecutor() if executor is None else executor
+        self.fail_fast = fail_fast
+        self.journal = journal
+        self.timeout = timeout
+        self.retries = retries
+        self.returncodes: dict[str, int] = {}
+        self.results: dict[str, ProcessResult] = {}
+        self.skipped: set[str] = set()
+        self.restored: set[str] = set()
+        self.blocked: set[str] = set()
+        self.cancelled: set[str] = set()
+        self.started_at: datetime | None = None
+        self.wall_time = 0.0
+
+    def run(self) -> int:
+        self.started_at = datetime.now(timezone.utc)
+        start = time.monotonic()
+
+        order = self.graph.topological_order()
+        priority = {key: i for i, key in enumerate(order)}
+        dependents = self.graph.dependents()
+        waiting = {key: len(deps) for key, deps in self.graph.dependencies.items()}
+        if self.journal is not None:
+            self.journal.start(order)
+
+        ready = [priority[key] for key in order if waiting[key] == 0]
+        heapq.heapify(ready)
+        running = {}
+        started = set()
+        upcoming = 0
+        stopped = False
+
+        def release(key: str) -> None:
+            for dependent in dependents[key]:
+                waiting[dependent] -= 1
+                if waiting[dependent] == 0:
+                    heapq.heappush(ready, priority[dependent])
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            try:
+                while running or (ready and not stopped):
+                    while ready and len(running) < self.jobs and not stopped:
+                        key = order[heapq.heappop(ready)]
+                        started.add(key)
+                        if self._is_blocked(key):
+                            self.blocked.add(key)
+                            release(key)
+                            continue
+
+                        running[pool.submit(self._execute, key)] = key
+                        if self.prefetcher is not None:
+                            self.prefetcher.started(key)
+
+                    while upcoming < len(order) and order[upcoming] in started:
+                        upcoming += 1
+                    if self.prefetcher is not None and upcoming < len(order):
+                        task = self.graph.tasks[order[upcoming]]
+                        self.prefetcher.prefetch(order[upcoming], task.input_folder)
+
+                    if not running:
+                        continue
+
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        key = running.pop(future)
+                        self._finish(key, *future.result())
+                        release(key)
+
+                        if self.fail_fast and self.returncodes.get(key, 0) != 0:
+                            if not stopped:
+                                self.executor.cancel()
+                            stopped = True
+            except BaseException:
+                # Do not leave entrypoints running, for example on Ctrl+C,
+                # while the pool waits for them.
+                self.executor.cancel()
+                raise
+
+        self.cancelled = set(order) - started
+        self.wall_time = time.monotonic() - start
+
+        if all(rc == 0 for rc in self.returncodes.values()):
+            return 0
+
+        return 1
+
+    def _execute(self, key: str) -> tuple[str, ProcessResult | None, str | None]:
+        """Bring one task up to date, on a worker thread. Returns how, the
+        result of running its entrypoint if it ran, and the fingerprint of
+        its inputs."""
+        task = self.graph.tasks[key]
+
+        inputs = None
+        if self.state is not None:
+            inputs = input_fingerprint(task)
+            if self._is_up_to_date(key, inputs):
+                return SKIPPED, None, inputs
+
+        key_in_cache = None
+        if self.cache is not None and task.entrypoint:
+            dependencies = {
+                dependency: self.graph.tasks[dependency]
+                for dependency in self.graph.dependencies[key]
+            }
+            key_in_cache = cache_key(task, key, dependencies, self.index)
+            restored = not self.force and self.cache.restore(
+                key_in_cache, task.output_folder
+            )
+            if restored:
+                return RESTORED, None, inputs
+
+        result = self.executor.run(
+            task,
+            log_directory=self._log_directory(key),
+            prefix=key,
+            tee=self.tee,
+            timeout=self.timeout,
+            retries=self.retries,
+        )
+
+        if key_in_cache is not None and result.returncode == 0:
+            self.cache.store(key_in_cache, task.output_folder)
+
+        return RAN, result, inputs
+
+    def _finish(
+        self, key: str, status: str, result: ProcessResult | None, inputs: str | None
+    ) -> None:
+        if status == SKIPPED:
+            self.skipped.add(key)
+            self._journal(key)
+            return
+
+        if status == RESTORED:
+            self.restored.add(key)
+
+        if result is None:
+            self.returncodes[key] = 0
+        else:
+            self.results[key] = result
+            self.returncodes[key] = result.returncode
+
+        self._record(key, inputs)
+        if self.returncodes[key] == 0:
+            self._journal(key)
+
+    def _journal(self, key: str) -> None:
+        if self.journal is not None:
+            self.journal.record(key)
+
+    def _log_directory(self, key: str) -> Path | None:
+        if self.log_directory is None:
+            return None
+
+        return self.log_directory / key
+
+    def _is_blocked(self, key: str) -> bool:
+        """Whether a task that `key` depends on failed or was blocked."""
+        return any(
+            self.returncodes.get(dependency, 0) != 0 or dependency in self.blocked
+            for dependency in self.graph.dependencies[key]
+        )
+
+    def _is_up_to_date(self, key: str, inputs: str) -> bool:
+        if self.force:
+            return False
+
+        if not self.graph.dependencies[key] <= self.skipped:
+            return False
+
+        return self.state.is_up_to_date(key, self.graph.tasks[key], inputs)
+
+    def _record(self, key: str, inputs: str | None) -> None:
+        if self.state is None:
+            return
+
+        if self.returncodes[key] == 0:
+            self.state.record_success(key, self.graph.tasks[key], inputs)
+        else:
+            self.state.record_failure(key)
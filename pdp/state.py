@@ -0,0 +1,96 @@
+import hashlib
+import json
+from pathlib import Path
+from typing import Iterable
+
+from .task import Task
+from .atomic import atomic_write
+from .scan import FileEntry, scan_files, top_level_files
+
+
+def entries_fingerprint(entries: Iterable[FileEntry], hasher) -> None:
+    """Feed the relative path, mtime and size of each of `entries` into
+    `hasher`."""
+    for relative_path, _, stat in entries:
+        if stat is None:
+            entry = f"{relative_path}\0dangling\n"
+        else:
+            entry = f"{relative_path}\0{stat.st_mtime_ns}\0{stat.st_size}\n"
+        hasher.update(entry.encode())
+
+
+def folder_fingerprint(folder: Path, hasher) -> None:
+    """Feed the relative path, mtime and size of every file under `folder`
+    into `hasher`. Symlinks are followed, so a changed upstream output that
+    is linked into an input folder changes the fingerprint."""
+    if not folder.exists():
+        hasher.update(b"missing\n")
+        return
+
+    entries_fingerprint(scan_files(folder), hasher)
+
+
+def input_fingerprint(task: Task) -> str:
+    hasher = hashlib.sha256()
+    hasher.update(f"entrypoint\0{task.entrypoint}\n".encode())
+
+    for folder in (task.input_folder, task.src_folder):
+        hasher.update(f"folder\0{folder.name}\n".encode())
+        folder_fingerprint(folder, hasher)
+
+    # The entrypoint runs in the task directory, so the files there, such
+    # as its Makefile and task.yml, are inputs too.
+    hasher.update(b"task\n")
+    entries_fingerprint(top_level_files(task.task_directory), hasher)
+
+    return hasher.hexdigest()
+
+
+def output_fingerprint(task: Task) -> str:
+    hasher = hashlib.sha256()
+    folder_fingerprint(task.output_folder, hasher)
+
+    return hasher.hexdigest()
+
+
+class BuildState:
+    """Fingerprints of the inputs and outputs of each task's last successful
+    run, persisted as JSON and keyed by task path."""
+
+    def __init__(self, path_to_state: str | Path) -> None:
+        self.path_to_state = Path(path_to_state)
+        self.state = self.read_state_file()
+
+    def read_state_file(self) -> dict:
+        try:
+            with open(self.path_to_state) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def write_state_file(self) -> None:
+        self.path_to_state.parent.mkdir(parents=True, exist_ok=True)
+
+        with atomic_write(self.path_to_state) as f:
+            json.dump(self.state, f, indent=2, sort_keys=True)
+
+    def is_up_to_date(self, key: str, task: Task, inputs: str | None = None) -> bool:
+        recorded = self.state.get(key)
+        if recorded is None:
+            return False
+
+        if inputs is None:
+            inputs = input_fingerprint(task)
+
+        if recorded["inputs"] != inputs:
+            return False
+
+        return recorded["outputs"] == output_fingerprint(task)
+
+    def record_success(self, key: str, task: Task, inputs: str) -> None:
+        self.state[key] = {"inputs": inputs, "outputs": output_fingerprint(task)}
+        self.write_state_file()
+
+    def record_failure(self, key: str) -> None:
+        if self.state.pop(key, None) is not None:
+            self.write_state_file()
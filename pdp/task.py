@@ -1,13 +1,12 @@
+import os
+import shutil
+import tempfile
 from pathlib import Path
-import subprocess
-
-from rich.tree import Tree
 
 from .pdp_config import TaskConfig
-
-
-def is_empty(directory):
-    return not directory.exists() or not any(directory.iterdir())
+from .hashing import HashEngine, HashIndex, folder_digests
+from .process import ProcessResult, run_process, run_with_retries
+from .scan import is_empty
 
 
 class Task:
@@ -20,13 +19,26 @@ class Task:
         self.src_folder = task_directory / "src"
         self.subtasks = []
 
+    @classmethod
+    def load(cls, task_name: str, task_directory: str | Path) -> "Task":
+        """Build the task and its subtasks from their task.yml files,
+        without creating or writing anything."""
+        task = cls(task_name, Path(task_directory))
+
+        for subtask_name in task.task_config.tasks:
+            subtask = cls.load(subtask_name, task.task_directory / subtask_name)
+            task.subtasks.append(subtask)
+
+        return task
+
     def scaffold(self):
         self.task_directory.mkdir(parents=True, exist_ok=True)
 
         self.task_config.initialize()
 
-        for subtask in self.task_config.tasks:
-            self.create_subtask(subtask)
+        with self.task_config.batch():
+            for subtask in self.task_config.tasks:
+                self.create_subtask(subtask)
 
         if len(self.subtasks) == 0:
             self.input_folder.mkdir(parents=True, exist_ok=True)
@@ -34,20 +46,163 @@ class Task:
             self.src_folder.mkdir(parents=True, exist_ok=True)
 
     def run(self):
-        returncodes = []
+        """Run the subtasks in order, then this task's entrypoint. Stops at
+        the first subtask that fails, so the entrypoint never runs after a
+        subtask failed."""
         for subtask in self.subtasks:
-            returncodes.append(subtask.run())
+            if subtask.run() != 0:
+                return 1
+
+        result = self.run_entrypoint()
+        if result is not None and result.returncode != 0:
+            return 1
+
+        return 0
+
+    def run_entrypoint(
+        self,
+        log_directory: Path | None = None,
+        prefix: str | None = None,
+        tee: bool = True,
+        timeout: float | None = None,
+        retries: int | None = None,
+    ) -> ProcessResult | None:
+        """Run only this task's own entrypoint, without its subtasks.
+        Returns None if the task has no entrypoint.
+
+        The entrypoint is terminated after `timeout` seconds, and run again
+        up to `retries` times while it fails. Both default to the task's
+        `timeout` and `retries` in task.yml."""
+        entrypoint = self.entrypoint
+        if not entrypoint:
+            return None
+
+        if timeout is None:
+            timeout = self.timeout
+        if retries is None:
+            retries = self.retries
+        prefix = prefix or self.task_name
+
+        return run_with_retries(
+            lambda: self._run_entrypoint_once(
+                entrypoint, log_directory, prefix, tee, timeout
+            ),
+            retries,
+            prefix,
+        )
+
+    def _run_entrypoint_once(
+        self,
+        entrypoint: str,
+        log_directory: Path | None,
+        prefix: str,
+        tee: bool,
+        timeout: float | None,
+    ) -> ProcessResult:
+        staging = self.stage_output()
+        options = {}
+        if staging is not None:
+            options["env"] = {**os.environ, **self.output_environment(staging)}
+        if timeout is not None:
+            options["timeout"] = timeout
+
+        try:
+            result = run_process(
+                entrypoint,
+                cwd=self.task_directory,
+                log_directory=log_directory,
+                prefix=prefix,
+                tee=tee,
+                **options,
+            )
+        except BaseException:
+            self.finish_output(staging, success=False)
+            raise
+
+        self.finish_output(staging, success=result.returncode == 0)
+        return result
+
+    def stage_output(self) -> Path | None:
+        """With `atomic_output` set in task.yml, a new empty folder for the
+        entrypoint to write its outputs to, named in PDP_OUTPUT. Returns
+        None otherwise. Staging folders left by runs that were killed are
+        removed."""
+        if not self.atomic_output:
+            return None
+
+        for stale in self.task_directory.glob(".output.staging.*"):
+            shutil.rmtree(stale, ignore_errors=True)
 
-        if self.entrypoint:
-            result = subprocess.run(self.entrypoint, cwd=self.task_directory)
-            returncodes.append(result.returncode)
+        staging = Path(
+            tempfile.mkdtemp(dir=self.task_directory, prefix=".output.staging.")
+        )
+        try:
+            os.chmod(staging, self.output_folder.stat().st_mode)
+        except FileNotFoundError:
+            os.chmod(staging, 0o755)
 
-        all_success = all([rc == 0 for rc in returncodes])
+        return staging
 
-        if all_success:
-            return 0
+    def output_environment(self, staging: Path) -> dict[str, str]:
+        return {"PDP_OUTPUT": os.fspath(staging)}
 
-        return 1
+    def finish_output(self, staging: Path | None, success: bool) -> None:
+        """Rename `staging` to the output folder if the entrypoint succeeded,
+        keeping the outputs it replaces in `previous_output_folder`, and
+        discard it otherwise, leaving the outputs as they were."""
+        if staging is None:
+            return
+
+        if not success:
+            shutil.rmtree(staging, ignore_errors=True)
+            return
+
+        shutil.rmtree(self.previous_output_folder, ignore_errors=True)
+        if self.output_folder.exists():
+            os.rename(self.output_folder, self.previous_output_folder)
+        os.rename(staging, self.output_folder)
+
+    def rollback_output(self) -> None:
+        """Swap the outputs from before the last successful run back in. The
+        outputs they replace become the previous ones, so rolling back
+        again undoes the rollback."""
+        previous = self.previous_output_folder
+        if not previous.is_dir():
+            raise ValueError(f"Task {self.task_name} has no previous outputs")
+
+        swap = self.task_directory / ".output.rollback"
+        shutil.rmtree(swap, ignore_errors=True)
+        if self.output_folder.exists():
+            os.rename(self.output_folder, swap)
+        os.rename(previous, self.output_folder)
+        if swap.exists():
+            os.rename(swap, previous)
+
+    @property
+    def previous_output_folder(self) -> Path:
+        return self.task_directory / ".output.previous"
+
+    def input_digests(
+        self, engine: HashEngine | None = None, index: HashIndex | None = None
+    ) -> dict[str, str | None]:
+        """The digest of every file in the input folder, by path relative to
+        it."""
+        return folder_digests(self.input_folder, engine, index)
+
+    def changed_inputs(
+        self,
+        previous: dict[str, str | None],
+        engine: HashEngine | None = None,
+        index: HashIndex | None = None,
+    ) -> set[str]:
+        """The input files that were added, removed or changed since
+        `previous` was taken with `input_digests`."""
+        current = self.input_digests(engine, index)
+        return {
+            path
+            for path in current.keys() | previous.keys()
+            if current.get(path) != previous.get(path)
+        }
 
     def create_subtask(self, subtask_name: str) -> None:
         self.task_config.add_task(subtask_name)
@@ -100,6 +255,22 @@ class Task:
     def entrypoint(self) -> str:
         return self.task_config.entrypoint
 
+    @property
+    def depends_on(self) -> list[str]:
+        return self.task_config.depends_on
+
+    @property
+    def atomic_output(self) -> bool:
+        return self.task_config.atomic_output
+
+    @property
+    def timeout(self) -> float | None:
+        return self.task_config.timeout
+
+    @property
+    def retries(self) -> int:
+        return self.task_config.retries
+
     def __repr__(self):
         return f"Task({self.task_name}, {self.task_directory})"
 
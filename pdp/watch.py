@@ -0,0 +1,260 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Iterator, Protocol
+
+# inotify(7) event masks.
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (
+    IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_ONLYDIR
+    | IN_DONT_FOLLOW
+)
+
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class Watcher(Protocol):
+    def read(self, timeout: float | None = None) -> set[str]:
+        """The paths that changed, waiting up to `timeout` seconds for a
+        change, or until there is one if `timeout` is None."""
+
+    def close(self) -> None: ...
+
+
+def walk_directories(folder: str | Path) -> Iterator[str]:
+    """`folder` and every directory under it, without following symlinks,
+    so that the outputs of upstream tasks linked into an input folder are
+    not watched."""
+    stack = [os.fspath(folder)]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                subdirectories = [
+                    entry.path
+                    for entry in entries
+                    if entry.is_dir(follow_symlinks=False)
+                ]
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+
+        yield directory
+        stack.extend(subdirectories)
+
+
+def snapshot(folders: list[Path]) -> dict[str, tuple[int, int]]:
+    """The mtime and size of every entry under `folders`, not following
+    symlinks."""
+    entries = {}
+    for folder in folders:
+        for directory in walk_directories(folder):
+            try:
+                with os.scandir(directory) as scanned:
+                    for entry in scanned:
+                        stat = entry.stat(follow_symlinks=False)
+                        entries[entry.path] = (stat.st_mtime_ns, stat.st_size)
+            except FileNotFoundError:
+                continue
+
+    return entries
+
+
+class PollingWatcher:
+    """Finds changes by comparing snapshots of the watched folders every
+    `interval` seconds. Works on every platform and file system, including
+    network file systems that do not report changes."""
+
+    def __init__(self, folders: list[Path], interval: float = 1.0) -> None:
+        self.folders = list(folders)
+        self.interval = interval
+        self.entries = snapshot(self.folders)
+
+    def read(self, timeout: float | None = None) -> set[str]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            wait = self.interval
+            if deadline is not None:
+                wait = min(wait, max(0.0, deadline - time.monotonic()))
+            time.sleep(wait)
+
+            changed = self._changes()
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def _changes(self) -> set[str]:
+        entries = snapshot(self.folders)
+        changed = {
+            path
+            for path in entries.keys() | self.entries.keys()
+            if entries.get(path) != self.entries.get(path)
+        }
+        self.entries = entries
+
+        return changed
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher:
+    """Waits for the kernel to report changes to the watched folders,
+    through inotify(7). Directories created later are watched as they
+    appear.
+
+    Every directory takes one of the user's inotify watches. If one cannot
+    be added, for example once fs.inotify.max_user_watches is used up,
+    creating the watcher raises OSError. If it happens for a directory
+    created later, the watcher looks for changes by polling from then on,
+    so that no change goes unseen."""
+
+    def __init__(self, folders: list[Path]) -> None:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+
+        self.folders = list(folders)
+        self.fd = libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+
+        self.directories: dict[int, str] = {}
+        self.polling: PollingWatcher | None = None
+        try:
+            for folder in self.folders:
+                self._watch_tree(folder)
+        except OSError:
+            self.close()
+            raise
+
+    def read(self, timeout: float | None = None) -> set[str]:
+        if self.polling is not None:
+            return self.polling.read(timeout)
+
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+
+        data = os.read(self.fd, 64 * 1024)
+        changed = set()
+        error = None
+
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                # Events were dropped, so anything may have changed.
+                changed.update(os.fspath(folder) for folder in self.folders)
+                continue
+
+            if mask & IN_IGNORED:
+                self.directories.pop(wd, None)
+                continue
+
+            directory = self.directories.get(wd)
+            if directory is None:
+                continue
+
+            path = os.path.join(directory, name) if name else directory
+            changed.add(path)
+
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO) and error is None:
+                try:
+                    self._watch_tree(path)
+                except OSError as e:
+                    error = e
+
+        if error is not None:
+            sys.stderr.write(f"{watch_error(error)}, polling from now on.\n")
+            self.close()
+            self.polling = PollingWatcher(self.folders)
+
+        return changed
+
+    def _watch_tree(self, folder: str | Path) -> None:
+        for directory in walk_directories(folder):
+            wd = self._add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+            if wd >= 0:
+                self.directories[wd] = directory
+                continue
+
+            error = ctypes.get_errno()
+            # The directory was removed after it was listed.
+            if error in (errno.ENOENT, errno.ENOTDIR):
+                continue
+            raise OSError(error, os.strerror(error), directory)
+
+    def close(self) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def watch_error(error: OSError) -> str:
+    """Why a folder cannot be watched with inotify."""
+    if error.filename is None:
+        return f"Cannot use inotify: {error.strerror}"
+    if error.errno == errno.ENOSPC:
+        return (
+            f"Cannot watch {error.filename} with inotify, as all inotify "
+            "watches are in use (see fs.inotify.max_user_watches)"
+        )
+
+    return f"Cannot watch {error.filename} with inotify: {error.strerror}"
+
+
+def watch_folders(folders: list[Path], poll: bool = False) -> Watcher:
+    """An inotify watcher, or a polling one if `poll` is set, inotify is
+    not available, or not every folder can be watched with it."""
+    if not poll:
+        try:
+            return InotifyWatcher(folders)
+        except (AttributeError, TypeError):
+            pass
+        except OSError as e:
+            sys.stderr.write(f"{watch_error(e)}, polling instead.\n")
+
+    return PollingWatcher(folders)
+
+
+def debounced(watcher: Watcher, delay: float) -> Iterator[set[str]]:
+    """Changed paths in bursts: waits for a change, then keeps collecting
+    changes until none arrive for `delay` seconds."""
+    while True:
+        changed = watcher.read()
+        while more := watcher.read(delay):
+            changed |= more
+
+        yield changed
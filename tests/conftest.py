@@ -0,0 +1,4 @@
+# pdp imports ruamel.yaml lazily. Import it here, before pyfakefs patches
+# the file system, as pyfakefs breaks ruamel.yaml's loaders when it is first
+# imported inside a test.
+import ruamel.yaml  # noqa: F401
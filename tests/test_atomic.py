@@ -0,0 +1,44 @@
+import os
+from pathlib import Path
+
+from expects import *
+import pytest
+
+from pdp.atomic import atomic_write
+
+
+@pytest.fixture
+def project(fs):
+    Path("/project").mkdir()
+
+
+def test_atomic_write_replaces_contents(project):
+    Path("/project/data.txt").write_text("old")
+
+    with atomic_write("/project/data.txt") as f:
+        f.write("new")
+
+    expect(Path("/project/data.txt").read_text()).to(equal("new"))
+    expect(os.listdir("/project")).to(equal(["data.txt"]))
+
+
+def test_atomic_write_keeps_old_contents_on_error(project):
+    Path("/project/data.txt").write_text("old")
+
+    with pytest.raises(RuntimeError):
+        with atomic_write("/project/data.txt") as f:
+            f.write("half")
+            raise RuntimeError
+
+    expect(Path("/project/data.txt").read_text()).to(equal("old"))
+    expect(os.listdir("/project")).to(equal(["data.txt"]))
+
+
+def test_atomic_write_preserves_file_mode(project):
+    Path("/project/data.txt").write_text("old")
+    os.chmod("/project/data.txt", 0o640)
+
+    with atomic_write("/project/data.txt") as f:
+        f.write("new")
+
+    expect(os.stat("/project/data.txt").st_mode & 0o777).to(equal(0o640))
@@ -0,0 +1,111 @@
+from pathlib import Path
+
+from expects import *
+import pytest
+
+from pdp.task import Task
+from pdp.cache import OutputCache, cache_key, clone_file
+
+
+@pytest.fixture
+def task(fs):
+    task = Task("hello", Path("hello"))
+    task.scaffold()
+    (task.src_folder / "main.py").write_text("print('hello')")
+
+    return task
+
+
+@pytest.fixture
+def cache(fs):
+    return OutputCache("/cache")
+
+
+def test_cache_key_depends_on_contents_not_mtimes(task, fs):
+    before = cache_key(task, "hello")
+
+    (task.src_folder / "main.py").write_text("print('hello')")
+    expect(cache_key(task, "hello")).to(equal(before))
+
+    (task.src_folder / "main.py").write_text("print('world')")
+    expect(cache_key(task, "hello")).not_to(equal(before))
+
+
+def test_cache_key_depends_on_files_in_task_directory(task, fs):
+    before = cache_key(task, "hello")
+
+    Path("hello/Makefile").write_text("all:\n")
+
+    expect(cache_key(task, "hello")).not_to(equal(before))
+
+
+def test_cache_key_matches_across_checkouts(task, fs):
+    other = Task("hello", Path("/other/hello"))
+    other.scaffold()
+    (other.src_folder / "main.py").write_text("print('hello')")
+
+    expect(cache_key(other, "hello")).to(equal(cache_key(task, "hello")))
+
+
+def test_cache_key_depends_on_task_key(task, fs):
+    expect(cache_key(task, "world")).not_to(equal(cache_key(task, "hello")))
+
+
+def test_cache_key_depends_on_outputs_of_dependencies(task, fs):
+    upstream = Task("upstream", Path("upstream"))
+    upstream.scaffold()
+    (upstream.output_folder / "result.csv").write_text("a,b\n")
+    before = cache_key(task, "hello", {"upstream": upstream})
+
+    (upstream.output_folder / "result.csv").write_text("a,b\n1,2\n")
+
+    expect(cache_key(task, "hello", {"upstream": upstream})).not_to(equal(before))
+    expect(cache_key(task, "hello")).not_to(equal(before))
+
+
+def test_cache_restores_stored_outputs(task, cache):
+    (task.output_folder / "result.csv").write_text("a,b\n1,2\n")
+    cache.store("abc123", task.output_folder)
+
+    (task.output_folder / "result.csv").unlink()
+    (task.output_folder / "stale.csv").write_text("old")
+
+    expect(cache.restore("abc123", task.output_folder)).to(be_true)
+    expect((task.output_folder / "result.csv").read_text()).to(equal("a,b\n1,2\n"))
+    expect((task.output_folder / "stale.csv").exists()).to(be_false)
+
+
+def test_cache_misses_unknown_keys(task, cache):
+    expect(cache.restore("unknown", task.output_folder)).to(be_false)
+
+
+def test_cache_keeps_first_stored_entry(task, cache):
+    (task.output_folder / "result.csv").write_text("first")
+    cache.store("abc123", task.output_folder)
+
+    (task.output_folder / "result.csv").write_text("second")
+    cache.store("abc123", task.output_folder)
+
+    expect(Path("/cache/ab/abc123/result.csv").read_text()).to(equal("first"))
+
+
+def test_restored_outputs_are_independent_of_cache(task, cache):
+    (task.output_folder / "result.csv").write_text("cached")
+    cache.store("abc123", task.output_folder)
+    cache.restore("abc123", task.output_folder)
+
+    (task.output_folder / "result.csv").write_text("modified")
+
+    expect(Path("/cache/ab/abc123/result.csv").read_text()).to(equal("cached"))
+
+
+def test_clone_file_copies_contents_and_mtime(tmp_path):
+    source = tmp_path / "source.csv"
+    source.write_text("a,b\n")
+
+    clone_file(source, tmp_path / "copy.csv")
+
+    expect((tmp_path / "copy.csv").read_text()).to(equal("a,b\n"))
+    expect((tmp_path / "copy.csv").stat().st_mtime_ns).to(
+        equal(source.stat().st_mtime_ns)
+    )
@@ -1,6 +1,6 @@
 from pathlib import Path
+import json
 import os
-import subprocess
 from unittest.mock import patch, call
 
 from expects import *
@@ -9,6 +9,7 @@ from typer.testing import CliRunner
 from ruamel.yaml import YAML
 
 from pdp.cli import app
+from pdp.process import ProcessResult
 
 
 @pytest.fixture
@@ -82,13 +83,17 @@ def test_runs_current_task(runner, fs):
     with open("/hello/task.yml", "w") as f:
         f.write("name: hello\nentrypoint: echo hello\nsubtasks: []")
 
-    mock_result = subprocess.CompletedProcess(
-        args=["echo", "hello"], returncode=0, stdout="world\n"
-    )
+    mock_result = ProcessResult(returncode=0)
 
-    with patch("subprocess.run", return_value=mock_result) as mock_run:
+    with patch("pdp.task.run_process", return_value=mock_result) as mock_run:
         result = runner.invoke(app, ["run"])
-        mock_run.assert_called_once_with("echo hello", cwd=Path("/hello"))
+        mock_run.assert_called_once_with(
+            "echo hello",
+            cwd=Path("/hello"),
+            log_directory=Path("/.pdp/logs/hello"),
+            prefix="hello",
+            tee=True,
+        )
         expect(result.exit_code).to(equal(0))
 
 
@@ -102,20 +107,30 @@ def test_runs_whole_project(runner, fs):
     with open("/world/task.yml", "w") as f:
         f.write("entrypoint: echo world\nsubtasks: []")
 
-    mock_hello = subprocess.CompletedProcess(
-        args=["echo", "hello"], returncode=0, stdout="world\n"
-    )
+    mock_hello = ProcessResult(returncode=0)
 
-    mock_world = subprocess.CompletedProcess(
-        args=["echo", "hello"], returncode=0, stdout="world\n"
-    )
+    mock_world = ProcessResult(returncode=0)
 
-    with patch("subprocess.run", side_effect=[mock_hello, mock_world]) as mock_run:
+    with patch(
+        "pdp.task.run_process", side_effect=[mock_hello, mock_world]
+    ) as mock_run:
         result = runner.invoke(app, ["run"])
         mock_run.assert_has_calls(
             [
-                call("echo hello", cwd=Path("/hello")),
-                call("echo world", cwd=Path("/world")),
+                call(
+                    "echo hello",
+                    cwd=Path("/hello"),
+                    log_directory=Path("/.pdp/logs/hello"),
+                    prefix="hello",
+                    tee=True,
+                ),
+                call(
+                    "echo world",
+                    cwd=Path("/world"),
+                    log_directory=Path("/.pdp/logs/world"),
+                    prefix="world",
+                    tee=True,
+                ),
             ]
         )
         expect(result.exit_code).to(equal(0))
@@ -139,3 +154,267 @@ def test_tree_enumerates_tasks_and_subtasks(runner, fs):
 """
         )
     )
+
+
+def test_status_lists_tasks_that_would_run(runner, fs):
+    runner.invoke(app, ["create", "hello", "world"])
+
+    for name in ["hello", "world"]:
+        with open(f"/{name}/task.yml", "w") as f:
+            f.write(f"name: {name}\nentrypoint: echo {name}\nsubtasks: []")
+
+    with patch("pdp.task.run_process", return_value=ProcessResult(returncode=0)):
+        runner.invoke(app, ["run", "hello"])
+
+    result = runner.invoke(app, ["status"])
+    expect(result.stdout).to(equal("up to date  hello\nnot run     world\n"))
+
+    result = runner.invoke(app, ["status", "--json"])
+    expect(json.loads(result.stdout)).to(
+        equal({"hello": "up to date", "world": "not run"})
+    )
+
+
+@pytest.mark.parametrize("option", ['retries: "2"', 'timeout: "60"'])
+def test_validate_and_run_reject_invalid_task_configs(runner, fs, option):
+    runner.invoke(app, ["create", "hello"])
+    with open("/hello/task.yml", "w") as f:
+        f.write(f"name: hello\nentrypoint: echo hello\nsubtasks: []\n{option}\n")
+
+    result = runner.invoke(app, ["validate"])
+    expect(result.exit_code).to(equal(1))
+    expect(result.stderr).to(contain("Invalid config file for task hello"))
+
+    with patch("pdp.task.run_process") as mock_run:
+        result = runner.invoke(app, ["run"])
+    expect(result.exit_code).to(equal(1))
+    mock_run.assert_not_called()
+
+
+def test_run_reports_uninitialized_task(runner, fs):
+    with open("/pdp.yml", "w") as f:
+        f.write("name: test\ntasks:\n  - hello\n")
+
+    result = runner.invoke(app, ["run"])
+
+    expect(result.exit_code).to(equal(1))
+    expect(result.stderr).to(contain("Task hello is not initialized"))
+    expect(Path("/hello").exists()).to(be_false)
+
+
+def test_runs_current_nested_task(runner, fs):
+    runner.invoke(app, ["create", "hello"])
+    os.chdir("/hello")
+    runner.invoke(app, ["create", "world"])
+    os.chdir("/hello/world")
+
+    with open("/hello/world/task.yml", "w") as f:
+        f.write("name: world\nentrypoint: echo world\nsubtasks: []")
+
+    mock_result = ProcessResult(returncode=0)
+
+    with patch("pdp.task.run_process", return_value=mock_result) as mock_run:
+        result = runner.invoke(app, ["run"])
+        mock_run.assert_called_once_with(
+            "echo world",
+            cwd=Path("/hello/world"),
+            log_directory=Path("/.pdp/logs/hello/world"),
+            prefix="hello/world",
+            tee=True,
+        )
+        expect(result.exit_code).to(equal(0))
+
+
+def test_run_prints_summary(runner, fs):
+    runner.invoke(app, ["create", "hello"])
+
+    with open("/hello/task.yml", "w") as f:
+        f.write("name: hello\nentrypoint: echo hello\nsubtasks: []")
+
+    mock_result = ProcessResult(returncode=0, wall_time=2.5)
+
+    with patch("pdp.task.run_process", return_value=mock_result):
+        result = runner.invoke(app, ["run"])
+
+    expect(result.stderr).to(contain("hello"))
+    expect(result.stderr).to(contain("2.50s"))
+
+
+def test_run_fail_fast_cancels_remaining_tasks(runner, fs):
+    runner.invoke(app, ["create", "hello", "world"])
+
+    for name in ["hello", "world"]:
+        with open(f"/{name}/task.yml", "w") as f:
+            f.write(f"name: {name}\nentrypoint: echo {name}\nsubtasks: []")
+
+    with patch(
+        "pdp.task.run_process", return_value=ProcessResult(returncode=1)
+    ) as mock_run:
+        result = runner.invoke(app, ["run", "--fail-fast"])
+
+    expect(mock_run.call_count).to(equal(1))
+    expect(result.exit_code).to(equal(1))
+    expect(result.stderr).to(contain("cancelled"))
+    expect(result.stderr).to(contain("1 failed, 1 not run"))
+
+
+def test_run_resume_runs_what_the_last_run_left(runner, fs):
+    runner.invoke(app, ["create", "hello", "world"])
+
+    for name in ["hello", "world"]:
+        with open(f"/{name}/task.yml", "w") as f:
+            f.write(f"name: {name}\nentrypoint: echo {name}\nsubtasks: []")
+
+    with patch("pdp.task.run_process", return_value=ProcessResult(returncode=1)):
+        runner.invoke(app, ["run", "--fail-fast"])
+
+    with patch(
+        "pdp.task.run_process", return_value=ProcessResult(returncode=0)
+    ) as mock_run:
+        result = runner.invoke(app, ["run", "--resume"])
+
+    expect(mock_run.call_count).to(equal(2))
+    expect(result.exit_code).to(equal(0))
+
+
+def test_run_resume_rejects_targets(runner, fs):
+    result = runner.invoke(app, ["run", "--resume", "hello"])
+
+    expect(result.exit_code).to(equal(1))
+    expect(result.stderr).to(contain("--resume"))
+
+
+def test_run_passes_timeout_and_retries_to_every_task(runner, fs):
+    runner.invoke(app, ["create", "hello"])
+
+    with open("/hello/task.yml", "w") as f:
+        f.write("name: hello\nentrypoint: echo hello\nsubtasks: []\nretries: 3")
+
+    with patch(
+        "pdp.task.run_process", return_value=ProcessResult(returncode=1)
+    ) as mock_run:
+        result = runner.invoke(app, ["run", "--timeout", "30", "--retries", "0"])
+
+    expect(mock_run.call_count).to(equal(1))
+    expect(mock_run.call_args.kwargs["timeout"]).to(equal(30))
+    expect(result.exit_code).to(equal(1))
+
+
+def test_run_rejects_non_positive_timeout(runner, fs):
+    result = runner.invoke(app, ["run", "--timeout", "0"])
+
+    expect(result.exit_code).to(equal(2))
+
+
+def test_profile_shows_critical_path(runner, fs):
+    runner.invoke(app, ["create", "hello"])
+
+    with open("/hello/task.yml", "w") as f:
+        f.write("name: hello\nentrypoint: echo hello\nsubtasks: []")
+
+    with patch("pdp.task.run_process", return_value=ProcessResult(0, 2.5)):
+        runner.invoke(app, ["run"])
+
+    result = runner.invoke(app, ["profile"])
+
+    expect(result.exit_code).to(equal(0))
+    expect(result.stdout).to(contain("Critical path: hello (2.50s)"))
+
+
+def test_profile_errs_without_recorded_runs(runner, fs):
+    result = runner.invoke(app, ["profile"])
+
+    expect(result.exit_code).to(equal(1))
+    expect(result.stderr).to(contain("No runs recorded yet"))
+
+
+def test_graph_prints_inferred_dependencies(runner, fs):
+    runner.invoke(app, ["create", "clean", "model"])
+    Path("/model/input/data.csv").symlink_to("/clean/output/data.csv")
+
+    result = runner.invoke(app, ["graph", "--format", "json"])
+
+    expect(result.exit_code).to(equal(0))
+    expect(result.stdout).to(contain('"model": [\n      "clean"\n    ]'))
+
+
+def test_run_affected_reads_changed_paths_from_stdin(runner, fs):
+    runner.invoke(app, ["create", "clean", "model", "other"])
+    Path("/model/input/data.csv").symlink_to("/clean/output/data.csv")
+
+    for name in ["clean", "model", "other"]:
+        with open(f"/{name}/task.yml", "w") as f:
+            f.write(f"name: {name}\nentrypoint: make\nsubtasks: []")
+
+    with patch(
+        "pdp.task.run_process", return_value=ProcessResult(returncode=0)
+    ) as mock_run:
+        result = runner.invoke(
+            app, ["run", "--affected"], input="clean/src/clean.py\nREADME.md\n"
+        )
+
+    expect(result.exit_code).to(equal(0))
+    expect([c.kwargs["prefix"] for c in mock_run.call_args_list]).to(
+        equal(["clean", "model"])
+    )
+
+
+def test_run_errs_for_unknown_task(runner, fs):
+    result = runner.invoke(app, ["run", "missing"])
+
+    expect(result.exit_code).to(equal(1))
+    expect(result.stderr).to(contain("Task missing not found"))
+
+
+def test_hash_prints_digest_of_each_input_file(runner, fs):
+    runner.invoke(app, ["create", "hello"])
+    Path("/hello/input/a.csv").write_text("a,b\n")
+    Path("/hello/input/b.csv").write_text("c,d\n")
+
+    result = runner.invoke(app, ["hash", "hello", "--algorithm", "sha256"])
+
+    expect(result.exit_code).to(equal(0))
+    lines = result.stdout.splitlines()
+    expect([line.split("  ")[1] for line in lines]).to(equal(["a.csv", "b.csv"]))
+    expect(lines[0].split("  ")[0]).to(have_len(64))
+
+
+def test_rollback_errs_without_previous_outputs(runner, fs):
+    runner.invoke(app, ["create", "hello"])
+
+    result = runner.invoke(app, ["rollback", "hello"])
+
+    expect(result.exit_code).to(equal(1))
+    expect(result.stderr).to(contain("Task hello has no previous outputs"))
+
+
+def test_hash_errs_for_unknown_algorithm(runner, fs):
+    runner.invoke(app, ["create", "hello"])
+
+    result = runner.invoke(app, ["hash", "hello", "--algorithm", "crc7"])
+
+    expect(result.exit_code).to(equal(1))
+    expect(result.stderr).to(contain("Unknown hash algorithm crc7"))
+
+
+def test_worker_generates_token_if_none_is_set(runner, fs):
+    with patch("pdp.remote.WorkerServer") as server:
+        result = runner.invoke(app, ["worker"], env={"PDP_WORKER_TOKEN": None})
+
+    token = server.call_args.kwargs["token"]
+    expect(token).to(have_len(43))
+    expect(result.stderr).to(contain(f"PDP_WORKER_TOKEN={token}"))
+
+
+def test_worker_uses_token_from_environment(runner, fs):
+    with patch("pdp.remote.WorkerServer") as server:
+        runner.invoke(app, ["worker"], env={"PDP_WORKER_TOKEN": "secret"})
+
+    expect(server.call_args.kwargs["token"]).to(equal("secret"))
+
+
+def test_worker_accepts_any_client_when_insecure(runner, fs):
+    with patch("pdp.remote.WorkerServer") as server:
+        runner.invoke(app, ["worker", "--insecure"], env={"PDP_WORKER_TOKEN": None})
+
+    expect(server.call_args.kwargs["token"]).to(be_none)
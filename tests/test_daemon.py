@@ -0,0 +1,182 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+from expects import *
+import pytest
+
+from pdp.client import (
+    connect,
+    is_private_directory,
+    run_in_daemon,
+    runtime_directory,
+    socket_path,
+)
+from pdp.daemon import DaemonServer
+from pdp.pdp import PDP
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("PDP_ROOT", raising=False)
+    pdp = PDP("test")
+    pdp.initialize()
+    for name, entrypoint in [("clean", "touch output/done"), ("model", "exit 3")]:
+        task = pdp.create_task(name)
+        with open(task.task_config.path_to_config, "w") as f:
+            f.write(f"name: {name}\nentrypoint: {entrypoint}\nsubtasks: []\n")
+
+    return tmp_path
+
+
+@pytest.fixture
+def daemon(project):
+    # A separate process, as the daemon forks for every command.
+    process = subprocess.Popen(
+        [sys.executable, "-c", "from pdp.cli import app; app(['daemon'])"],
+        env={**os.environ, "PYTHONPATH": os.fspath(Path(__file__).parent.parent)},
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 10
+    while (sock := connect(socket_path(project))) is None:
+        assert process.poll() is None and time.monotonic() < deadline
+        time.sleep(0.01)
+    sock.close()
+
+    yield project
+
+    process.terminate()
+    process.wait()
+
+
+def test_daemon_runs_commands_on_clients_output(daemon, capfd):
+    returncode = run_in_daemon(["tree"])
+
+    expect(returncode).to(equal(0))
+    expect(capfd.readouterr().out).to(contain("clean", "model"))
+
+
+def test_daemon_returns_exit_code_of_command(daemon, capfd):
+    returncode = run_in_daemon(["run", "--quiet"])
+
+    expect(returncode).to(equal(1))
+    expect((daemon / "clean" / "output" / "done").exists()).to(be_true)
+
+
+def test_daemon_runs_commands_in_clients_directory(daemon, monkeypatch, capfd):
+    monkeypatch.chdir(daemon / "clean")
+
+    returncode = run_in_daemon(["run", "--quiet"])
+
+    expect(returncode).to(equal(0))
+
+
+def test_run_in_daemon_refuses_daemons_of_other_users(daemon, capfd):
+    with patch("os.getuid", return_value=os.getuid() + 1):
+        returncode = run_in_daemon(["tree"])
+
+    expect(returncode).to(be_none)
+    expect(capfd.readouterr().out).to(equal(""))
+
+
+def test_daemon_refuses_to_start_twice(daemon):
+    expect(lambda: DaemonServer(daemon)).to(raise_error(RuntimeError))
+
+
+def test_daemon_removes_its_socket_when_closed(project):
+    server = DaemonServer(project)
+    server.server_close()
+
+    expect(socket_path(project).exists()).to(be_false)
+
+
+def test_run_in_daemon_returns_none_without_daemon(project):
+    expect(run_in_daemon(["tree"])).to(be_none)
+
+
+def test_run_in_daemon_ignores_stale_socket(project):
+    path = socket_path(project)
+    path.parent.mkdir(exist_ok=True)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as stale:
+        stale.bind(str(path))
+
+    expect(run_in_daemon(["tree"])).to(be_none)
+
+
+@pytest.fixture
+def temp_directory(tmp_path, monkeypatch):
+    monkeypatch.delenv("XDG_RUNTIME_DIR", raising=False)
+    monkeypatch.setattr("tempfile.tempdir", os.fspath(tmp_path / "tmp"))
+    (tmp_path / "tmp").mkdir()
+
+    return tmp_path / "tmp"
+
+
+def test_socket_path_moves_to_runtime_directory_for_long_project_paths(
+    monkeypatch, tmp_path
+):
+    monkeypatch.setenv("XDG_RUNTIME_DIR", os.fspath(tmp_path))
+    path = socket_path(Path("/" + "deep/" * 30))
+
+    expect(path.parent).to(equal(tmp_path))
+    expect(path.name).to(start_with("pdp-"))
+
+
+def test_socket_path_moves_to_user_folder_in_temp_directory(temp_directory):
+    path = socket_path(Path("/" + "deep/" * 30))
+
+    expect(path.parent).to(equal(temp_directory / f"pdp-{os.getuid()}"))
+    expect(len(str(path))).to(be_below(100))
+
+
+def test_private_directory_is_only_accessible_by_its_owner(tmp_path):
+    private = tmp_path / "private"
+    private.mkdir(mode=0o700)
+    shared = tmp_path / "shared"
+    shared.mkdir(mode=0o755)
+    (tmp_path / "link").symlink_to(private)
+
+    expect(is_private_directory(private)).to(be_true)
+    expect(is_private_directory(shared)).to(be_false)
+    expect(is_private_directory(tmp_path / "link")).to(be_false)
+    expect(is_private_directory(tmp_path / "missing")).to(be_false)
+
+
+def test_daemon_creates_private_folder_for_long_project_paths(
+    project, temp_directory, monkeypatch
+):
+    monkeypatch.setattr("pdp.client.MAX_SOCKET_PATH", 0)
+
+    server = DaemonServer(project)
+    server.server_close()
+
+    expect(server.path.parent).to(equal(runtime_directory()))
+    expect(is_private_directory(runtime_directory())).to(be_true)
+
+
+def test_daemon_refuses_folder_that_others_can_access(
+    project, temp_directory, monkeypatch
+):
+    monkeypatch.setattr("pdp.client.MAX_SOCKET_PATH", 0)
+    runtime_directory().mkdir(mode=0o777)
+    runtime_directory().chmod(0o777)
+
+    expect(lambda: DaemonServer(project)).to(raise_error(RuntimeError))
+
+
+def test_run_in_daemon_ignores_folder_that_others_can_access(
+    project, temp_directory, monkeypatch
+):
+    monkeypatch.setattr("pdp.client.MAX_SOCKET_PATH", 0)
+    server = DaemonServer(project)
+    runtime_directory().chmod(0o777)
+
+    try:
+        expect(run_in_daemon(["tree"])).to(be_none)
+    finally:
+        server.server_close()
@@ -0,0 +1,174 @@
+import json
+from pathlib import Path
+
+from expects import *
+import pytest
+
+from pdp.graph import TaskGraph
+from pdp.pdp import PDP
+from pdp.pdp_errors import InvalidConfigError
+
+
+@pytest.fixture
+def pdp(fs):
+    pdp = PDP("test")
+    pdp.initialize()
+
+    yield pdp
+
+
+def write_task_config(task, text):
+    with open(task.task_config.path_to_config, "w") as f:
+        f.write(text)
+
+
+def test_graph_keys_tasks_by_path_from_project_root(pdp):
+    hello = pdp.create_task("hello")
+    hello.create_subtask("world")
+
+    graph = TaskGraph.from_tasks(pdp.tasks, pdp.project_root)
+
+    expect(list(graph.tasks)).to(equal(["hello", "hello/world"]))
+
+
+def test_graph_tasks_depend_on_their_subtasks(pdp):
+    hello = pdp.create_task("hello")
+    hello.create_subtask("world")
+
+    graph = TaskGraph.from_tasks(pdp.tasks, pdp.project_root)
+
+    expect(graph.dependencies["hello"]).to(equal({"hello/world"}))
+    expect(graph.topological_order()).to(equal(["hello/world", "hello"]))
+
+
+def test_graph_reads_depends_on_from_task_config(pdp):
+    first = pdp.create_task("first")
+    second = pdp.create_task("second")
+    write_task_config(first, "entrypoint: make\nsubtasks: []\ndepends_on: [second]")
+
+    graph = TaskGraph.from_tasks(pdp.tasks, pdp.project_root)
+
+    expect(graph.dependencies["first"]).to(equal({"second"}))
+    expect(graph.topological_order()).to(equal(["second", "first"]))
+
+
+def test_graph_keeps_declared_order_for_independent_tasks(pdp):
+    for name in ["c", "a", "b"]:
+        pdp.create_task(name)
+
+    graph = TaskGraph.from_tasks(pdp.tasks, pdp.project_root)
+
+    expect(graph.topological_order()).to(equal(["c", "a", "b"]))
+
+
+def test_graph_ignores_dependencies_outside_selection(pdp):
+    first = pdp.create_task("first")
+    pdp.create_task("second")
+    write_task_config(first, "entrypoint: make\nsubtasks: []\ndepends_on: [second]")
+
+    graph = TaskGraph.from_tasks([first], pdp.project_root)
+
+    expect(graph.dependencies["first"]).to(equal(set()))
+
+
+def test_graph_raises_on_dependency_cycle(pdp):
+    first = pdp.create_task("first")
+    second = pdp.create_task("second")
+    write_task_config(first, "entrypoint: make\nsubtasks: []\ndepends_on: [second]")
+    write_task_config(second, "entrypoint: make\nsubtasks: []\ndepends_on: [first]")
+
+    graph = TaskGraph.from_tasks(pdp.tasks, pdp.project_root)
+
+    with pytest.raises(InvalidConfigError):
+        graph.topological_order()
+
+
+def test_graph_infers_dependencies_from_input_symlinks(pdp):
+    clean = pdp.create_task("clean")
+    model = pdp.create_task("model")
+    pdp.create_task("report")
+    (model.input_folder / "data.csv").symlink_to("../../clean/output/data.csv")
+
+    graph = TaskGraph.from_tasks(pdp.tasks, pdp.project_root)
+
+    expect(graph.dependencies["model"]).to(equal({"clean"}))
+    expect(graph.dependencies["report"]).to(equal(set()))
+
+
+def test_graph_skips_symlink_loops(pdp):
+    clean = pdp.create_task("clean")
+    model = pdp.create_task("model")
+    (model.input_folder / "data.csv").symlink_to("../../clean/output/data.csv")
+    (model.input_folder / "loop").symlink_to("loop")
+
+    graph = TaskGraph.from_tasks(pdp.tasks, pdp.project_root)
+
+    expect(graph.dependencies["model"]).to(equal({"clean"}))
+
+
+def test_graph_infers_dependencies_from_symlinked_folders(pdp):
+    hello = pdp.create_task("hello")
+    foo = hello.create_subtask("foo")
+    model = pdp.create_task("model")
+    Path("/model/input/nested").mkdir()
+    Path("/model/input/nested/foo").symlink_to("/hello/foo/output")
+
+    graph = TaskGraph.from_tasks(pdp.tasks, pdp.project_root)
+
+    expect(graph.dependencies["model"]).to(equal({"hello/foo"}))
+
+
+def test_graph_prints_as_dot_and_json(pdp):
+    pdp.create_task("clean")
+    model = pdp.create_task("model")
+    (model.input_folder / "data.csv").symlink_to("/clean/output/data.csv")
+
+    graph = TaskGraph.from_tasks(pdp.tasks, pdp.project_root)
+
+    expect(graph.to_dot()).to(
+        equal('digraph tasks {\n  "clean";\n  "model";\n  "clean" -> "model";\n}\n')
+    )
+    expect(json.loads(graph.to_json())).to(
+        equal(
+            {
+                "tasks": ["clean", "model"],
+                "dependencies": {"clean": [], "model": ["clean"]},
+            }
+        )
+    )
+
+
+def test_graph_finds_innermost_task_owning_a_path(pdp):
+    hello = pdp.create_task("hello")
+    hello.create_subtask("foo")
+
+    graph = TaskGraph.from_tasks(pdp.tasks, pdp.project_root)
+
+    expect(graph.owner(Path("/hello/foo/src/main.py"))).to(equal("hello/foo"))
+    expect(graph.owner(Path("/hello/task.yml"))).to(equal("hello"))
+    expect(graph.owner(Path("/hello/foo/output/result.csv"))).to(be_none)
+    expect(graph.owner(Path("/README.md"))).to(be_none)
+
+
+def test_graph_finds_everything_downstream(pdp):
+    for name in ["clean", "model", "report", "other"]:
+        pdp.create_task(name)
+    Path("/model/input/data.csv").symlink_to("/clean/output/data.csv")
+    Path("/report/input/model.csv").symlink_to("/model/output/model.csv")
+
+    graph = TaskGraph.from_tasks(pdp.tasks, pdp.project_root)
+
+    expect(graph.downstream({"clean"})).to(equal({"clean", "model", "report"}))
+
+
+def test_subgraph_keeps_dependencies_between_selected_tasks(pdp):
+    for name in ["clean", "model", "report"]:
+        pdp.create_task(name)
+    Path("/model/input/data.csv").symlink_to("/clean/output/data.csv")
+    Path("/report/input/model.csv").symlink_to("/model/output/model.csv")
+
+    graph = TaskGraph.from_tasks(pdp.tasks, pdp.project_root)
+    subgraph = graph.subgraph({"model", "report"})
+
+    expect(list(subgraph.tasks)).to(equal(["model", "report"]))
+    expect(subgraph.dependencies).to(equal({"model": set(), "report": {"model"}}))
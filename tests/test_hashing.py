@@ -0,0 +1,156 @@
+import mmap
+import os
+import time
+from unittest.mock import patch
+
+from expects import *
+import pytest
+
+from pdp import hashing
+from pdp.hashing import HashEngine, HashIndex, folder_digests
+
+
+@pytest.fixture
+def old_file(fs):
+    fs.create_file("/data/a.csv", contents="a,b\n")
+    an_hour_ago = time.time() - 3600
+    os.utime("/data/a.csv", (an_hour_ago, an_hour_ago))
+
+    return "/data/a.csv"
+
+
+@pytest.fixture
+def large_file(tmp_path):
+    path = tmp_path / "large.csv"
+    path.write_bytes(os.urandom(mmap.ALLOCATIONGRANULARITY * 7 // 2))
+
+    return path
+
+
+def count_digests():
+    return patch.object(
+        HashEngine, "digest_files", autospec=True, side_effect=HashEngine.digest_files
+    )
+
+
+def test_digest_does_not_depend_on_jobs(large_file):
+    chunk_size = mmap.ALLOCATIONGRANULARITY
+
+    single = HashEngine(jobs=1, chunk_size=chunk_size).digest_file(large_file)
+    parallel = HashEngine(jobs=4, chunk_size=chunk_size).digest_file(large_file)
+
+    expect(parallel).to(equal(single))
+
+
+def test_memory_mapped_chunks_match_read_chunks(large_file):
+    engine = HashEngine(jobs=4, chunk_size=mmap.ALLOCATIONGRANULARITY)
+    read = engine.digest_file(large_file)
+
+    with patch.object(hashing, "MMAP_THRESHOLD", 0):
+        expect(engine.digest_file(large_file)).to(equal(read))
+
+
+def test_digest_changes_with_last_chunk(large_file):
+    engine = HashEngine(jobs=4, chunk_size=mmap.ALLOCATIONGRANULARITY)
+    before = engine.digest_file(large_file)
+
+    with open(large_file, "r+b") as f:
+        f.seek(-1, os.SEEK_END)
+        last = f.read(1)
+        f.seek(-1, os.SEEK_END)
+        f.write(bytes([last[0] ^ 1]))
+
+    expect(engine.digest_file(large_file)).not_to(equal(before))
+
+
+def test_digest_depends_on_algorithm(old_file):
+    expect(HashEngine("sha256").digest_file(old_file)).not_to(
+        equal(HashEngine().digest_file(old_file))
+    )
+
+
+def test_empty_files_have_a_digest(fs):
+    fs.create_file("/data/empty.csv")
+
+    expect(HashEngine().digest_file("/data/empty.csv")).to(be_a(str))
+
+
+def test_engine_rejects_unknown_algorithms():
+    expect(lambda: HashEngine("crc7")).to(raise_error(ValueError))
+    expect(lambda: HashEngine("shake_128")).to(raise_error(ValueError))
+
+
+def test_engine_rejects_unaligned_chunk_size():
+    expect(lambda: HashEngine(chunk_size=1000)).to(raise_error(ValueError))
+
+
+def test_folder_digests_by_relative_path(fs):
+    fs.create_file("/data/a.csv", contents="a")
+    fs.create_file("/data/nested/b.csv", contents="b")
+    os.symlink("/nowhere.csv", "/data/missing.csv")
+
+    digests = folder_digests("/data")
+
+    expect(list(digests)).to(equal(["a.csv", "missing.csv", "nested/b.csv"]))
+    expect(digests["a.csv"]).to(equal(HashEngine().digest_file("/data/a.csv")))
+    expect(digests["missing.csv"]).to(be_none)
+
+
+def test_index_hashes_unchanged_files_once(old_file):
+    index = HashIndex()
+
+    with count_digests() as digests:
+        first = folder_digests("/data", index=index)
+        second = folder_digests("/data", index=index)
+
+    expect(second).to(equal(first))
+    expect(digests.call_args_list[1].args[1]).to(be_empty)
+
+
+def test_index_rehashes_changed_files(old_file):
+    index = HashIndex()
+    before = folder_digests("/data", index=index)
+
+    with open(old_file, "w") as f:
+        f.write("c,d\n")
+
+    expect(folder_digests("/data", index=index)).not_to(equal(before))
+
+
+def test_index_does_not_keep_recently_modified_files(fs):
+    fs.create_file("/data/new.csv", contents="a,b\n")
+    index = HashIndex()
+
+    folder_digests("/data", index=index)
+
+    expect(index.entries).to(be_empty)
+
+
+def test_index_of_another_algorithm_is_not_used(old_file):
+    index = HashIndex()
+    folder_digests("/data", index=index)
+
+    sha256 = folder_digests("/data", HashEngine("sha256"), index)
+
+    expect(sha256["a.csv"]).to(equal(HashEngine("sha256").digest_file(old_file)))
+
+
+def test_index_is_not_written_unless_changed(fs):
+    HashIndex("/project/.pdp/hashes.json").save()
+
+    expect(os.path.exists("/project/.pdp/hashes.json")).to(be_false)
+
+
+def test_index_persists_between_runs(old_file):
+    first = HashIndex("/project/.pdp/hashes.json")
+    folder_digests("/data", index=first)
+    first.save()
+
+    second = HashIndex("/project/.pdp/hashes.json")
+    expect(second.lookup(old_file, os.stat(old_file))).not_to(be_none)
+
+
+def test_index_ignores_corrupt_index_file(fs):
+    fs.create_file("/project/.pdp/hashes.json", contents="{not json")
+
+    expect(HashIndex("/project/.pdp/hashes.json").entries).to(equal({}))
@@ -0,0 +1,84 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from expects import *
+
+# Modules that `pdp --help` should not load. They are only needed by the
+# commands that use them.
+LAZY_MODULES = ["pdp.pdp", "ruamel.yaml", "asyncio", "ctypes", "rich.tree"]
+
+# Packages whose import time is not ours to control.
+CLI_PACKAGES = {"typer", "click", "rich", "typing_extensions", "shellingham"}
+
+# Time that importing pdp may add on top of typer and rich, in milliseconds.
+BUDGET_MS = 15
+
+HELP = "import sys; sys.argv = ['pdp', '--help']; from pdp.cli import app; app()"
+
+# Modules that the client, which hands commands to a running daemon, should
+# not load.
+CLIENT_LAZY_MODULES = ["pdp.cli", "pdp.pdp", "typer", "rich", "ruamel.yaml"]
+
+
+def import_times(code: str = HELP):
+    """The import tree of `code`, `pdp --help` by default, from
+    `python -X importtime`, as (name, self time in µs, children) tuples."""
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=Path(__file__).parent.parent,
+        capture_output=True,
+        text=True,
+    )
+
+    stack = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+
+        self_time, _, name = line.removeprefix("import time:").split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+
+        # Children are printed before their parent, one level deeper.
+        children = []
+        while stack and stack[-1][0] > depth:
+            children.insert(0, stack.pop()[1])
+        stack.append((depth, (name.strip(), int(self_time), children)))
+
+    return [node for _, node in stack]
+
+
+def walk(nodes):
+    for node in nodes:
+        yield node
+        yield from walk(node[2])
+
+
+def own_time(node) -> int:
+    name, self_time, children = node
+    if name.split(".")[0] in CLI_PACKAGES:
+        return 0
+
+    return self_time + sum(own_time(child) for child in children)
+
+
+def test_help_does_not_import_lazy_modules():
+    imported = {name for name, _, _ in walk(import_times())}
+
+    expect(imported).not_to(contain(*LAZY_MODULES))
+
+
+def test_help_imports_within_budget():
+    # The best of a few runs, to keep a busy machine from failing the test.
+    best = min(
+        sum(own_time(node) for node in walk(import_times()) if node[0] == "pdp.cli")
+        for _ in range(3)
+    )
+
+    expect(best / 1000).to(be_below(BUDGET_MS))
+
+
+def test_client_does_not_import_cli():
+    imported = {name for name, _, _ in walk(import_times("import pdp.client"))}
+
+    expect(imported).not_to(contain(*CLIENT_LAZY_MODULES))
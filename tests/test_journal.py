@@ -0,0 +1,36 @@
+from expects import *
+
+from pdp.journal import RunJournal
+
+
+def test_journal_round_trips_through_json_file(fs):
+    journal = RunJournal("/.pdp/journal.json")
+    journal.start(["clean", "model", "report"])
+    journal.record("clean")
+
+    read = RunJournal.read("/.pdp/journal.json")
+
+    expect(read.tasks).to(equal(["clean", "model", "report"]))
+    expect(read.completed).to(equal({"clean"}))
+
+
+def test_journal_remaining_keeps_run_order(fs):
+    journal = RunJournal("/.pdp/journal.json")
+    journal.start(["clean", "model", "report"])
+    journal.record("model")
+
+    expect(journal.remaining).to(equal(["clean", "report"]))
+
+
+def test_journal_start_forgets_previous_run(fs):
+    journal = RunJournal("/.pdp/journal.json")
+    journal.start(["clean"])
+    journal.record("clean")
+
+    journal.start(["model"])
+
+    expect(RunJournal.read("/.pdp/journal.json").remaining).to(equal(["model"]))
+
+
+def test_read_returns_none_without_journal(fs):
+    expect(RunJournal.read("/.pdp/journal.json")).to(be_none)
@@ -1,11 +1,17 @@
 import os
-import subprocess
+import time
 from pathlib import Path
+import shutil
 from unittest.mock import patch, MagicMock
+
+from pyfakefs.helpers import reset_ids, set_uid
 from ruamel.yaml import YAML
 
-from pdp.pdp import PDP, PDPConfig
-from pdp.pdp_errors import InvalidConfigError
+from pdp.pdp import PDP, PDPConfig, find_project_root
+from pdp.pdp_config import GenericConfig
+from pdp.process import ProcessResult
+from pdp.report import RunReport
+from pdp.pdp_errors import InvalidConfigError, UninitializedProjectError
 from expects import *
 import pytest
 
@@ -29,7 +35,7 @@ def hello_world_tasks(fs):
 @pytest.fixture
 def make_task(pdp):
     task = pdp.create_task("hello")
-    task.run = MagicMock()
+    task.run_entrypoint = MagicMock(return_value=ProcessResult(returncode=0))
 
     with open("/hello/pdp.yml", "w") as f:
         f.write("entrypoint: make\nsubtasks: []")
@@ -152,13 +158,17 @@ def test_pdp_runs_task_by_name(pdp):
     task = pdp.create_task("hello")
     task.task_config.update_config({"entrypoint": "make"})
 
-    mock_result = subprocess.CompletedProcess(
-        args=["make"], returncode=0, stdout="hello\n"
-    )
+    mock_result = ProcessResult(returncode=0)
 
-    with patch("subprocess.run", return_value=mock_result) as mock_run:
+    with patch("pdp.task.run_process", return_value=mock_result) as mock_run:
         return_code = pdp.run_task("hello")
-        mock_run.assert_called_once_with("make", cwd=task.task_directory)
+        mock_run.assert_called_once_with(
+            "make",
+            cwd=task.task_directory,
+            log_directory=Path("/.pdp/logs/hello"),
+            prefix="hello",
+            tee=True,
+        )
         expect(return_code).to(equal(0))
 
 
@@ -231,7 +241,72 @@ def test_pdp_runs_all_tasks(make_task, pdp):
 
     pdp.run_all()
 
-    make_task.run.assert_called_once()
+    make_task.run_entrypoint.assert_called_once()
+
+
+def test_pdp_resume_runs_failed_and_unrun_tasks_of_last_run(pdp):
+    pdp.create_task("clean")
+    model = pdp.create_task("model")
+    pdp.create_task("other")
+    model.task_config.update_config({"entrypoint": "make", "depends_on": ["clean"]})
+    for name in ["clean", "other"]:
+        pdp.task_index[name].task_config.update_config({"entrypoint": "make"})
+
+    def fail_clean(command, cwd, **kwargs):
+        return ProcessResult(returncode=1 if cwd.name == "clean" else 0)
+
+    with patch("pdp.task.run_process", side_effect=fail_clean):
+        expect(pdp.run_all(force=True)).to(equal(1))
+
+    with patch(
+        "pdp.task.run_process", return_value=ProcessResult(returncode=0)
+    ) as mock_run:
+        return_code = pdp.resume(force=True)
+
+    expect([c.kwargs["cwd"].name for c in mock_run.call_args_list]).to(
+        equal(["clean", "model"])
+    )
+    expect(return_code).to(equal(0))
+
+
+def test_pdp_resume_errs_without_previous_run(pdp):
+    with pytest.raises(ValueError):
+        pdp.resume()
+
+
+def test_pdp_status_reports_which_tasks_would_run(pdp):
+    pdp.create_task("clean")
+    model = pdp.create_task("model")
+    pdp.create_task("other")
+    model.task_config.update_config({"entrypoint": "make", "depends_on": ["clean"]})
+    for name in ["clean", "other"]:
+        pdp.task_index[name].task_config.update_config({"entrypoint": "make"})
+
+    with patch("pdp.task.run_process", return_value=ProcessResult(returncode=0)):
+        pdp.run_all()
+    Path("/clean/src/clean.py").touch()
+    pdp.create_task("plot")
+
+    expect(pdp.status()).to(
+        equal(
+            {
+                "clean": "changed",
+                "model": "stale",
+                "other": "up to date",
+                "plot": "not run",
+            }
+        )
+    )
+
+
+def test_pdp_load_rejects_invalid_task_configs(pdp):
+    task = pdp.create_task("hello")
+    task.task_config.update_config(
+        {"name": "hello", "entrypoint": "make", "subtasks": [], "retries": "2"}
+    )
+
+    with pytest.raises(InvalidConfigError):
+        PDP().load()
 
 
 def test_pdp_picks_up_name_from_config(pdp):
@@ -273,3 +348,252 @@ def test_pdp_create_task_from_current_location_raises_if_not_in_task(fs):
 
     with pytest.raises(ValueError) as excinfo:
         pdp.create_task_from_current_location("foo")
+
+
+def test_pdp_resolves_project_root_once(pdp):
+    pdp.create_task("hello")
+
+    with patch("pdp.pdp.find_project_root") as mock_find:
+        os.chdir("/hello")
+        pdp.create_task("world")
+        expect(pdp.current_path).to(equal(Path("hello")))
+
+        mock_find.assert_not_called()
+
+
+def test_pdp_finds_project_root_again_after_invalidation(pdp):
+    pdp.project_root
+
+    with patch("pdp.pdp.find_project_root", return_value=Path("/")) as mock_find:
+        pdp.invalidate_project_root()
+        pdp.project_root
+        pdp.project_root
+
+        mock_find.assert_called_once_with("pdp.yml")
+
+
+def test_find_project_root_walks_up_from_current_directory(pdp):
+    Path("/hello/world").mkdir(parents=True)
+    os.chdir("/hello/world")
+
+    expect(find_project_root("pdp.yml")).to(equal(Path("/")))
+
+
+def test_find_project_root_prefers_pdp_root_environment_variable(pdp, monkeypatch):
+    Path("/elsewhere").mkdir()
+    monkeypatch.setenv("PDP_ROOT", "/elsewhere")
+
+    expect(find_project_root("pdp.yml")).to(equal(Path("/elsewhere")))
+
+
+def test_pdp_load_builds_task_tree_without_writing(pdp):
+    hello = pdp.create_task("hello")
+    hello.create_subtask("foo")
+    pdp.create_task("world")
+    Path("/world/input").rmdir()
+
+    with (
+        patch.object(Path, "mkdir") as mock_mkdir,
+        patch.object(YAML, "dump") as mock_dump,
+    ):
+        pdp2 = PDP()
+        pdp2.load()
+
+        mock_mkdir.assert_not_called()
+        mock_dump.assert_not_called()
+
+    expect(pdp2.tasks).to(equal(pdp.tasks))
+    expect(pdp2.tasks[0].subtasks[0].task_name).to(equal("foo"))
+    expect(pdp2.project_name).to(equal("test"))
+    expect(Path("/world/input").exists()).to(be_false)
+
+
+def test_pdp_load_raises_error_if_invalid_config(yaml_without_tasks):
+    with pytest.raises(InvalidConfigError):
+        PDP().load()
+
+
+def test_pdp_load_raises_error_if_task_not_initialized(hello_world_tasks):
+    with pytest.raises(UninitializedProjectError):
+        PDP().load()
+
+
+def test_pdp_creates_many_tasks_with_one_config_write(pdp):
+    with patch.object(
+        PDPConfig, "write_config_file", wraps=pdp.config.write_config_file
+    ) as mock_write:
+        pdp.create_tasks_from_current_location(["a", "b", "c"])
+
+        mock_write.assert_called_once()
+
+    expect(read_config_file("/pdp.yml")["tasks"]).to(equal(["a", "b", "c"]))
+
+
+def test_pdp_indexes_nested_tasks_by_path(pdp):
+    hello = pdp.create_task("hello")
+    hello.create_subtask("foo")
+    pdp.scaffold()
+
+    expect(list(pdp.task_index)).to(equal(["hello", "hello/foo"]))
+    expect(pdp._find_task_by_name("hello/foo/").task_name).to(equal("foo"))
+
+
+def test_pdp_runs_nested_task_by_path(pdp):
+    os.chdir("/")
+    pdp.create_task("hello")
+    os.chdir("/hello")
+    foo = pdp.create_task_from_current_location("foo")
+    foo.run_entrypoint = MagicMock(return_value=ProcessResult(returncode=0))
+
+    return_code = pdp.run_task("hello/foo")
+
+    foo.run_entrypoint.assert_called_once()
+    expect(return_code).to(equal(0))
+
+
+def test_pdp_detects_nested_current_task(pdp):
+    pdp.create_task("hello")
+    os.chdir("/hello")
+    pdp.create_task_from_current_location("foo")
+
+    os.chdir("/hello/foo")
+    expect(pdp.current_task.task_name).to(equal("foo"))
+
+    pdp.create_task_from_current_location("bar")
+    expect(read_config_file("/hello/foo/task.yml")["subtasks"]).to(equal(["bar"]))
+    expect(pdp.task_index).to(have_key("hello/foo/bar"))
+
+
+def test_pdp_load_indexes_nested_tasks(pdp):
+    pdp.create_task("hello").create_subtask("foo")
+
+    pdp2 = PDP()
+    pdp2.load()
+
+    expect(list(pdp2.task_index)).to(equal(["hello", "hello/foo"]))
+
+
+def test_pdp_run_writes_report(pdp):
+    hello = pdp.create_task("hello")
+    hello.run_entrypoint = MagicMock(return_value=ProcessResult(3, 1.5, 1.0, 0.2, 4096))
+
+    return_code = pdp.run_all()
+
+    expect(return_code).to(equal(1))
+    reports = list(Path("/.pdp/runs").iterdir())
+    expect(reports).to(have_length(1))
+
+    report = RunReport.read(reports[0])
+    expect(report.returncode).to(equal(1))
+    expect(report.results).to(equal({"hello": ProcessResult(3, 1.5, 1.0, 0.2, 4096)}))
+
+
+def test_pdp_reads_output_cache_location(pdp, monkeypatch):
+    expect(pdp.output_cache).to(be_none)
+
+    pdp.config.update_config_key("cache", "shared/cache")
+    expect(pdp.output_cache.directory).to(equal(Path("/shared/cache")))
+
+    monkeypatch.setenv("PDP_CACHE", "/mnt/cache")
+    expect(pdp.output_cache.directory).to(equal(Path("/mnt/cache")))
+
+
+def test_pdp_runs_only_affected_tasks(pdp):
+    for name in ["clean", "model", "other"]:
+        pdp.create_task(name)
+    Path("/model/input/data.csv").symlink_to("/clean/output/data.csv")
+
+    expect(pdp.affected_tasks(["clean/src/clean.py"])).to(equal({"clean", "model"}))
+    expect(pdp.affected_tasks(["model/input/data.csv"])).to(equal({"model"}))
+    expect(pdp.affected_tasks(["README.md"])).to(equal(set()))
+
+    runs = []
+    for key, task in pdp.task_index.items():
+        task.run_entrypoint = MagicMock(
+            side_effect=lambda key=key, **kwargs: runs.append(key)
+        )
+
+    pdp.run_affected(["clean/src/clean.py"])
+
+    expect(runs).to(equal(["clean", "model"]))
+
+
+class FakeWatcher:
+    def __init__(self, bursts):
+        self.reads = [*bursts, KeyboardInterrupt]
+
+    def read(self, timeout=None):
+        if timeout is not None:
+            return set()
+
+        changed = self.reads.pop(0)
+        if changed is KeyboardInterrupt:
+            raise KeyboardInterrupt
+
+        return changed
+
+
+def test_pdp_watch_runs_affected_tasks_for_each_change(pdp):
+    for name in ["clean", "model", "other"]:
+        pdp.create_task(name)
+    Path("/model/input/data.csv").symlink_to("/clean/output/data.csv")
+
+    runs = []
+    for key, task in pdp.task_index.items():
+        task.run_entrypoint = MagicMock(
+            side_effect=lambda key=key, **kwargs: runs.append(key)
+        )
+
+    watcher = FakeWatcher([{"/clean/src/clean.py"}, {"/README.md"}, {"/other/src/a"}])
+    affected = []
+    with pytest.raises(KeyboardInterrupt):
+        for tasks, returncode in pdp.watch(watcher, debounce=0):
+            affected.append(tasks)
+
+    expect(affected).to(equal([{"clean", "model"}, {"other"}]))
+    expect(runs).to(equal(["clean", "model", "other"]))
+
+
+def test_pdp_watches_input_and_src_folders(pdp):
+    pdp.create_task("hello")
+
+    expect(pdp.watched_folders).to(equal([Path("/hello/input"), Path("/hello/src")]))
+
+
+def test_pdp_load_reads_unchanged_configs_from_manifest(pdp):
+    pdp.create_task("hello").create_subtask("foo")
+    in_an_hour = time.time_ns() + 3600 * 10**9
+    with patch("pdp.pdp_config.time.time_ns", return_value=in_an_hour):
+        PDP().load()
+    GenericConfig.clear_cache()
+
+    with patch.object(GenericConfig, "parse_config_file") as mock_parse:
+        pdp2 = PDP()
+        pdp2.load()
+
+        mock_parse.assert_not_called()
+
+    expect(Path("/.pdp/manifest.json").exists()).to(be_true)
+    expect(pdp2.tasks[0].subtasks[0].task_name).to(equal("foo"))
+
+
+def test_pdp_loads_project_that_cannot_be_written_to(fs):
+    os.makedirs("/project")
+    os.chdir("/project")
+    PDP("test").initialize()
+    PDP().create_task("hello")
+    shutil.rmtree("/project/.pdp", ignore_errors=True)
+    os.chmod("/project", 0o555)
+    GenericConfig.clear_cache()
+
+    set_uid(65534)
+    try:
+        in_an_hour = time.time_ns() + 3600 * 10**9
+        with patch("pdp.pdp_config.time.time_ns", return_value=in_an_hour):
+            pdp = PDP()
+            pdp.load()
+    finally:
+        reset_ids()
+
+    expect(pdp.tasks[0].task_name).to(equal("hello"))
+    expect(Path("/project/.pdp").exists()).to(be_false)
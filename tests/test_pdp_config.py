@@ -1,11 +1,13 @@
 import os
+import time
 from pathlib import Path
+from unittest.mock import patch
 
 from ruamel.yaml import YAML
 from expects import *
 import pytest
 
-from pdp.pdp_config import PDPConfig, TaskConfig
+from pdp.pdp_config import GenericConfig, PDPConfig, TaskConfig
 
 
 @pytest.fixture
@@ -51,6 +53,27 @@ def test_config_add_task(config, fs):
     expect(config_dict["tasks"]).to(equal(["hello", "world"]))
 
 
+def test_config_add_task_does_not_reparse_listed_tasks(config, fs):
+    config.initialize()
+    config.add_task("hello")
+
+    with patch.object(YAML, "load") as load:
+        config.add_task("hello")
+
+    load.assert_not_called()
+
+
+def test_config_add_task_keeps_comments(config, fs):
+    with open("pdp.yml", "w") as f:
+        f.write("name: test  # the project\ntasks:\n  - import   # raw data\n")
+    config.config = config.read_config_file()
+
+    config.add_task("model")
+
+    expect(read_config_file("pdp.yml")["tasks"]).to(equal(["import", "model"]))
+    expect(Path("pdp.yml").read_text()).to(contain("# the project", "# raw data"))
+
+
 def test_config_validate(config, fs):
     config.initialize()
 
@@ -90,6 +113,33 @@ def test_task_config_validation_requires_subtasks_and_entrypoint(fs):
     expect(config.validate()).to(be_false)
 
 
+def test_task_config_validation_requires_boolean_atomic_output(fs):
+    config = TaskConfig("task1", "task.yml")
+    config.initialize()
+
+    config.update_config({"entrypoint": "make", "subtasks": [], "atomic_output": True})
+    expect(config.validate()).to(be_true)
+
+    config.update_config({"entrypoint": "make", "subtasks": [], "atomic_output": "yes"})
+    expect(config.validate()).to(be_false)
+
+
+def test_task_config_validates_timeout_and_retries(fs):
+    config = TaskConfig("task1", "task.yml")
+    config.initialize()
+
+    for options, valid in [
+        ({"timeout": 30, "retries": 2}, True),
+        ({"timeout": 0.5}, True),
+        ({"timeout": 0}, False),
+        ({"timeout": "1h"}, False),
+        ({"retries": -1}, False),
+        ({"retries": 1.5}, False),
+    ]:
+        config.update_config({"entrypoint": "make", "subtasks": [], **options})
+        expect(config.validate()).to(equal(valid))
+
+
 def test_task_adds_its_own_tasks(fs):
     config = TaskConfig("task1", "task.yml")
     config.initialize()
@@ -109,3 +159,165 @@ def test_task_config_repr_prints_name_and_path(fs):
 
 def test_pdp_config_repr_prints_config_path(config, fs):
     expect(str(config)).to(equal("PDPConfig(test, /pdp.yml)"))
+
+
+def test_config_file_is_parsed_once_while_unchanged(fs):
+    config = TaskConfig("task1", "task.yml")
+    config.initialize()
+    GenericConfig.clear_cache()
+
+    with patch.object(
+        GenericConfig,
+        "parse_config_file",
+        autospec=True,
+        side_effect=GenericConfig.parse_config_file,
+    ) as mock_parse:
+        config.entrypoint
+        config.entrypoint
+        TaskConfig("task1", "task.yml").entrypoint
+
+        expect(mock_parse.call_count).to(equal(1))
+
+
+def test_config_cache_picks_up_changes_on_disk(fs):
+    config = TaskConfig("task1", "task.yml")
+    config.initialize()
+    expect(config.entrypoint).to(equal(""))
+
+    with open("task.yml", "w") as f:
+        f.write("entrypoint: make\nsubtasks: []")
+
+    expect(config.entrypoint).to(equal("make"))
+
+
+def test_config_cache_returns_independent_copies(fs):
+    config = TaskConfig("task1", "task.yml")
+    config.initialize()
+
+    config.read_config_file()["subtasks"].append("task2")
+
+    expect(config.read_config_file()["subtasks"]).to(equal([]))
+
+
+def test_config_batch_writes_once(config, fs):
+    config.initialize()
+
+    with patch.object(
+        PDPConfig, "write_config_file", wraps=config.write_config_file
+    ) as mock_write:
+        with config.batch():
+            for name in ["a", "b", "c"]:
+                config.add_task(name)
+
+            expect(read_config_file("pdp.yml")["tasks"]).to(equal([]))
+
+        mock_write.assert_called_once()
+
+    expect(read_config_file("pdp.yml")["tasks"]).to(equal(["a", "b", "c"]))
+
+
+def test_config_nested_batches_write_when_outermost_exits(config, fs):
+    config.initialize()
+
+    with config.batch():
+        with config.batch():
+            config.add_task("a")
+
+        expect(read_config_file("pdp.yml")["tasks"]).to(equal([]))
+
+    expect(read_config_file("pdp.yml")["tasks"]).to(equal(["a"]))
+
+
+def test_task_config_keeps_batched_changes_when_reading_entrypoint(fs):
+    config = TaskConfig("task1", "task.yml")
+    config.initialize()
+
+    with config.batch():
+        config.add_task("task2")
+        config.entrypoint
+
+        expect(config.tasks).to(equal(["task2"]))
+
+    expect(read_config_file("task.yml")["subtasks"]).to(equal(["task2"]))
+
+
+def test_config_write_leaves_file_intact_if_dump_fails(config, fs):
+    config.initialize()
+
+    with patch.object(config.yaml, "dump", side_effect=RuntimeError):
+        with pytest.raises(RuntimeError):
+            config.add_task("hello")
+
+    expect(read_config_file("pdp.yml")["tasks"]).to(equal([]))
+    expect(os.listdir("/")).not_to(contain(start_with(".pdp.yml")))
+
+
+def save_manifest_later(paths):
+    """Save the manifest as if an hour had passed since the files changed."""
+    in_an_hour = time.time_ns() + 3600 * 10**9
+    with patch("pdp.pdp_config.time.time_ns", return_value=in_an_hour):
+        return GenericConfig.save_manifest(Path("/.pdp/manifest.json"), paths)
+
+
+def test_manifest_seeds_cache_for_unchanged_files(fs):
+    config = TaskConfig("task1", "/task.yml")
+    config.initialize()
+    GenericConfig.clear_cache()
+    config.read_config_file()
+
+    save_manifest_later([Path("/task.yml")])
+    GenericConfig.clear_cache()
+    GenericConfig.load_manifest(Path("/.pdp/manifest.json"))
+
+    with patch.object(GenericConfig, "parse_config_file") as mock_parse:
+        expect(TaskConfig("task1", "/task.yml").entrypoint).to(equal(""))
+        mock_parse.assert_not_called()
+
+
+def test_manifest_entries_are_ignored_once_files_change(fs):
+    config = TaskConfig("task1", "/task.yml")
+    config.initialize()
+    save_manifest_later([Path("/task.yml")])
+    GenericConfig.clear_cache()
+
+    with open("/task.yml", "w") as f:
+        f.write("entrypoint: make\nsubtasks: []")
+    GenericConfig.load_manifest(Path("/.pdp/manifest.json"))
+
+    expect(TaskConfig("task1", "/task.yml").entrypoint).to(equal("make"))
+
+
+def test_manifest_skips_recently_changed_files(fs):
+    config = TaskConfig("task1", "/task.yml")
+    config.initialize()
+
+    configs = GenericConfig.save_manifest(
+        Path("/.pdp/manifest.json"), [Path("/task.yml")]
+    )
+
+    expect(configs).to(equal({}))
+    expect(Path("/.pdp/manifest.json").exists()).to(be_false)
+
+
+def test_manifest_of_another_version_is_ignored(fs):
+    fs.create_file("/.pdp/manifest.json", contents='{"version": 0, "configs": {}}')
+
+    expect(GenericConfig.load_manifest(Path("/.pdp/manifest.json"))).to(equal({}))
+
+
+@pytest.mark.parametrize(
+    "configs",
+    [
+        "[]",
+        '{"/task.yml": 5}',
+        '{"/task.yml": [[1, 2]]}',
+        '{"/task.yml": [5, {}]}',
+        '{"/task.yml": [[1, 2], "name: task"]}',
+    ],
+)
+def test_manifest_with_invalid_configs_is_ignored(fs, configs):
+    fs.create_file(
+        "/.pdp/manifest.json", contents=f'{{"version": 1, "configs": {configs}}}'
+    )
+
+    expect(GenericConfig.load_manifest(Path("/.pdp/manifest.json"))).to(equal({}))
@@ -0,0 +1,83 @@
+import time
+from unittest.mock import patch
+
+from expects import *
+import pytest
+
+from pdp.prefetch import Prefetcher, advise_willneed
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    (tmp_path / "upstream").mkdir()
+    (tmp_path / "upstream" / "b.csv").write_bytes(b"b" * 300)
+    (tmp_path / "input").mkdir()
+    (tmp_path / "input" / "a.csv").write_bytes(b"a" * 200)
+    (tmp_path / "input" / "b.csv").symlink_to(tmp_path / "upstream" / "b.csv")
+
+    return tmp_path / "input"
+
+
+@pytest.fixture
+def advised():
+    advised = []
+    with patch(
+        "pdp.prefetch.advise_willneed",
+        side_effect=lambda path, length: advised.append(
+            (path.rsplit("/", 1)[1], length)
+        ),
+    ):
+        yield advised
+
+
+@pytest.fixture
+def prefetcher():
+    prefetcher = Prefetcher(500)
+    yield prefetcher
+    prefetcher.close()
+
+
+def test_prefetcher_warms_inputs_through_symlinks(inputs, advised, prefetcher):
+    prefetcher._warm("model", inputs)
+
+    expect(advised).to(equal([("a.csv", 200), ("b.csv", 300)]))
+
+
+def test_prefetcher_stays_within_budget(inputs, advised, prefetcher):
+    prefetcher.budget = 250
+    prefetcher._warm("model", inputs)
+
+    expect(advised).to(equal([("a.csv", 200), ("b.csv", 50)]))
+
+
+def test_prefetcher_releases_budget_of_started_tasks(inputs, advised, prefetcher):
+    prefetcher._warm("model", inputs)
+    prefetcher._warm("report", inputs)
+    expect(prefetcher.reserved).to(equal({"model": 500}))
+
+    prefetcher.started("model")
+    prefetcher._warm("report", inputs)
+
+    expect(prefetcher.reserved).to(equal({"report": 500}))
+    expect(len(advised)).to(equal(4))
+
+
+def test_prefetcher_skips_started_tasks(inputs, advised, prefetcher):
+    prefetcher.started("model")
+    prefetcher._warm("model", inputs)
+
+    expect(advised).to(be_empty)
+
+
+def test_prefetcher_warms_in_the_background(inputs, advised, prefetcher):
+    prefetcher.prefetch("model", inputs)
+
+    deadline = time.monotonic() + 5
+    while len(advised) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    expect(prefetcher.reserved).to(equal({"model": 500}))
+
+
+def test_advise_willneed_accepts_partial_lengths(inputs):
+    advise_willneed(str(inputs / "a.csv"), 100)
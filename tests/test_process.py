@@ -0,0 +1,163 @@
+import signal
+import sys
+import threading
+from unittest.mock import MagicMock, patch
+
+from expects import *
+
+from pdp.process import (
+    ChildProcesses,
+    ProcessResult,
+    child_processes,
+    run_process,
+    run_with_retries,
+)
+
+
+def test_run_process_runs_command_through_shell_in_cwd(tmp_path):
+    result = run_process("echo hello > greeting.txt && exit 3", cwd=tmp_path)
+
+    expect(result.returncode).to(equal(3))
+    expect((tmp_path / "greeting.txt").read_text()).to(equal("hello\n"))
+
+
+def test_run_process_runs_command_in_given_environment(tmp_path):
+    run_process("echo $GREETING > greeting.txt", cwd=tmp_path, env={"GREETING": "hi"})
+
+    expect((tmp_path / "greeting.txt").read_text()).to(equal("hi\n"))
+
+
+def test_run_process_measures_time_and_memory(tmp_path):
+    command = (
+        f"{sys.executable} -c "
+        '"data = bytearray(50 * 1024 * 1024); sum(range(3_000_000))"'
+    )
+
+    result = run_process(command, cwd=tmp_path)
+
+    expect(result.returncode).to(equal(0))
+    expect(result.wall_time).to(be_above(0))
+    expect(result.user_time + result.system_time).to(be_above(0))
+    expect(result.max_rss).to(be_above(50 * 1024 * 1024))
+
+
+def test_process_result_round_trips_through_dict():
+    result = ProcessResult(1, 2.0, 1.5, 0.5, 1024, timed_out=True, attempts=3)
+
+    expect(ProcessResult.from_dict(result.to_dict())).to(equal(result))
+
+
+def test_process_result_reads_results_without_newer_fields():
+    result = ProcessResult.from_dict(
+        {
+            "returncode": 0,
+            "wall_time": 1.0,
+            "user_time": 0.5,
+            "system_time": 0.1,
+            "max_rss": 1024,
+        }
+    )
+
+    expect(result.attempts).to(equal(1))
+    expect(result.timed_out).to(be_false)
+
+
+def test_run_process_streams_output_to_log_files(tmp_path, capsys):
+    result = run_process(
+        "echo out; echo err >&2",
+        cwd=tmp_path,
+        log_directory=tmp_path / "logs",
+        prefix="hello",
+    )
+
+    expect(result.returncode).to(equal(0))
+    expect((tmp_path / "logs" / "stdout.log").read_text()).to(equal("out\n"))
+    expect((tmp_path / "logs" / "stderr.log").read_text()).to(equal("err\n"))
+
+    captured = capsys.readouterr()
+    expect(captured.out).to(equal("[hello] out\n"))
+    expect(captured.err).to(equal("[hello] err\n"))
+
+
+def test_run_process_without_tee_keeps_console_quiet(tmp_path, capsys):
+    run_process("echo out", cwd=tmp_path, log_directory=tmp_path / "logs", tee=False)
+
+    expect((tmp_path / "logs" / "stdout.log").read_text()).to(equal("out\n"))
+    expect(capsys.readouterr().out).to(equal(""))
+
+
+def test_run_process_drains_chatty_output(tmp_path):
+    command = f"{sys.executable} -c \"import sys; sys.stdout.write('x' * 10_000_000)\""
+
+    result = run_process(command, cwd=tmp_path, log_directory=tmp_path, tee=False)
+
+    expect(result.returncode).to(equal(0))
+    expect((tmp_path / "stdout.log").stat().st_size).to(equal(10_000_000))
+
+
+def test_child_processes_terminates_commands_and_what_they_started(tmp_path):
+    processes = ChildProcesses()
+    token = child_processes.set(processes)
+    try:
+        threading.Timer(0.2, processes.terminate).start()
+        result = run_process("sleep 30; touch done.txt", cwd=tmp_path)
+    finally:
+        child_processes.reset(token)
+
+    expect(result.returncode).to(equal(-signal.SIGTERM))
+    expect(result.wall_time).to(be_below(10))
+    expect((tmp_path / "done.txt").exists()).to(be_false)
+
+
+def test_run_process_terminates_command_and_its_children_after_timeout(tmp_path):
+    result = run_process("sleep 30; touch done.txt", cwd=tmp_path, timeout=0.2)
+
+    expect(result.timed_out).to(be_true)
+    expect(result.returncode).to(equal(-signal.SIGTERM))
+    expect(result.wall_time).to(be_below(10))
+    expect((tmp_path / "done.txt").exists()).to(be_false)
+
+
+def test_run_process_kills_commands_that_ignore_sigterm(tmp_path):
+    command = "trap '' TERM; sleep 30"
+
+    with patch("pdp.process.KILL_GRACE", 0.2):
+        result = run_process(command, cwd=tmp_path, timeout=0.2)
+
+    expect(result.timed_out).to(be_true)
+    expect(result.wall_time).to(be_below(10))
+
+
+def test_run_with_retries_backs_off_exponentially_until_success(capsys):
+    run = MagicMock(side_effect=[ProcessResult(1), ProcessResult(1), ProcessResult(0)])
+    cancelled = MagicMock()
+    cancelled.wait.return_value = False
+
+    result = run_with_retries(run, retries=5, prefix="hello", cancelled=cancelled)
+
+    expect(result.returncode).to(equal(0))
+    expect(result.attempts).to(equal(3))
+    expect([c.args[0] for c in cancelled.wait.call_args_list]).to(equal([1, 2]))
+    expect(capsys.readouterr().err).to(contain("[hello] Failed with exit code 1"))
+
+
+def test_run_with_retries_gives_up_after_last_retry():
+    run = MagicMock(return_value=ProcessResult(1))
+
+    with patch("pdp.process.RETRY_DELAY", 0):
+        result = run_with_retries(run, retries=2)
+
+    expect(result.returncode).to(equal(1))
+    expect(result.attempts).to(equal(3))
+    expect(run.call_count).to(equal(3))
+
+
+def test_run_with_retries_stops_once_cancelled():
+    run = MagicMock(return_value=ProcessResult(1))
+    cancelled = threading.Event()
+    cancelled.set()
+
+    result = run_with_retries(run, retries=5, cancelled=cancelled)
+
+    expect(run.call_count).to(equal(1))
+    expect(result.attempts).to(equal(1))
@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from expects import *
+from rich.console import Console
+import pytest
+
+from pdp.pdp import PDP
+from pdp.process import ProcessResult
+from pdp.profiling import Profile, critical_path, latest_durations, read_reports
+from pdp.report import RunReport
+
+
+@pytest.fixture
+def pdp(fs):
+    pdp = PDP("test")
+    pdp.initialize()
+
+    yield pdp
+
+
+def make_report(minutes, durations):
+    return RunReport(
+        started_at=datetime(2025, 4, 1, tzinfo=timezone.utc)
+        + timedelta(minutes=minutes),
+        wall_time=sum(durations.values()),
+        returncode=0,
+        jobs=1,
+        results={key: ProcessResult(0, t) for key, t in durations.items()},
+        skipped=[],
+    )
+
+
+def render(table):
+    console = Console(width=200, record=True)
+    console.print(table)
+    return console.export_text()
+
+
+@pytest.fixture
+def diamond(pdp):
+    # model depends on clean and geocode, which both depend on import
+    for name in ["import", "clean", "geocode", "model"]:
+        pdp.create_task(name)
+
+    depends_on = {
+        "clean": "[import]",
+        "geocode": "[import]",
+        "model": "[clean, geocode]",
+    }
+    for name, dependencies in depends_on.items():
+        with open(f"/{name}/task.yml", "w") as f:
+            f.write(f"entrypoint: make\nsubtasks: []\ndepends_on: {dependencies}")
+
+    return pdp.dependency_graph()
+
+
+def test_critical_path_follows_slowest_chain(diamond):
+    durations = {"import": 1.0, "clean": 2.0, "geocode": 10.0, "model": 3.0}
+
+    path, length = critical_path(diamond, durations)
+
+    expect(path).to(equal(["import", "geocode", "model"]))
+    expect(length).to(equal(14.0))
+
+
+def test_profile_estimates_speedup_from_concurrency(diamond):
+    report = make_report(
+        0, {"import": 1.0, "clean": 2.0, "geocode": 10.0, "model": 3.0}
+    )
+
+    profile = Profile(diamond, [report])
+
+    expect(profile.total_time).to(equal(16.0))
+    expect(profile.max_speedup).to(equal(16.0 / 14.0))
+
+
+def test_latest_durations_keep_times_of_skipped_tasks():
+    reports = [
+        make_report(0, {"import": 1.0, "clean": 2.0}),
+        make_report(1, {"clean": 4.0}),
+    ]
+
+    expect(latest_durations(reports)).to(equal({"import": 1.0, "clean": 4.0}))
+
+
+def test_read_reports_returns_most_recent_runs_oldest_first(fs):
+    for minutes in range(5):
+        make_report(minutes, {"import": float(minutes)}).write(Path("/.pdp/runs"))
+
+    reports = read_reports(Path("/.pdp/runs"), 3)
+
+    expect([r.results["import"].wall_time for r in reports]).to(equal([2.0, 3.0, 4.0]))
+
+
+def test_trend_table_shows_change_across_runs(diamond):
+    reports = [make_report(0, {"geocode": 10.0}), make_report(1, {"geocode": 15.0})]
+
+    text = render(Profile(diamond, reports).trend_table())
+
+    expect(text).to(contain("10.00s"))
+    expect(text).to(contain("15.00s"))
+    expect(text).to(contain("+50%"))
+
+
+def test_pdp_profile_reads_recorded_runs(diamond, pdp):
+    make_report(0, {"import": 1.0, "model": 2.0}).write(pdp.runs_directory)
+
+    profile = pdp.profile()
+
+    expect(profile.critical_path).to(equal(["import", "clean", "model"]))
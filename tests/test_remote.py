@@ -0,0 +1,224 @@
+import socket
+import threading
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+from expects import *
+import pytest
+
+from pdp.remote import RemoteExecutor, WorkerHandler, WorkerServer, parse_address
+from pdp.task import Task
+
+
+@pytest.fixture
+def worker():
+    servers = []
+
+    def start(slots=1, token=None):
+        server = WorkerServer(("127.0.0.1", 0), slots=slots, token=token)
+        threading.Thread(
+            target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True
+        ).start()
+        servers.append(server)
+        return f"127.0.0.1:{server.server_address[1]}"
+
+    yield start
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def make_task(tmp_path, name, entrypoint):
+    task = Task(name, tmp_path / name)
+    task.scaffold()
+    with open(task.task_config.path_to_config, "w") as f:
+        f.write(f"name: {name}\nentrypoint: {entrypoint}\nsubtasks: []\n")
+
+    return task
+
+
+def test_parse_address():
+    expect(parse_address("node1:9000")).to(equal(("node1", 9000)))
+    expect(parse_address("node1")).to(equal(("node1", 8765)))
+    expect(parse_address("[::1]:9000")).to(equal(("::1", 9000)))
+    expect(lambda: parse_address("node1:http")).to(raise_error(ValueError))
+
+
+def test_remote_executor_runs_tasks_on_worker(worker, tmp_path, capsys):
+    task = make_task(tmp_path, "hello", "echo hello > output/hello.txt; echo done")
+    executor = RemoteExecutor([worker()])
+
+    result = executor.run(task, log_directory=tmp_path / "logs", prefix="hello")
+    executor.close()
+
+    expect(result.returncode).to(equal(0))
+    expect((task.output_folder / "hello.txt").read_text()).to(equal("hello\n"))
+    expect((tmp_path / "logs" / "stdout.log").read_text()).to(equal("done\n"))
+    expect(capsys.readouterr().out).to(equal("[hello] done\n"))
+
+
+def test_remote_executor_stages_atomic_outputs(worker, tmp_path):
+    task = make_task(tmp_path, "hello", "echo hello > $PDP_OUTPUT/hello.txt")
+    with open(task.task_config.path_to_config, "a") as f:
+        f.write("atomic_output: true\n")
+    executor = RemoteExecutor([worker()])
+
+    result = executor.run(task)
+    executor.close()
+
+    expect(result.returncode).to(equal(0))
+    expect((task.output_folder / "hello.txt").read_text()).to(equal("hello\n"))
+
+
+def test_remote_executor_reports_failures_and_stderr(worker, tmp_path):
+    task = make_task(tmp_path, "hello", "echo oops >&2; exit 3")
+    executor = RemoteExecutor([worker()])
+
+    result = executor.run(task, log_directory=tmp_path / "logs", tee=False)
+    executor.close()
+
+    expect(result.returncode).to(equal(3))
+    expect((tmp_path / "logs" / "stderr.log").read_text()).to(equal("oops\n"))
+
+
+def test_remote_executor_reports_commands_that_cannot_start(worker, tmp_path):
+    missing = make_task(tmp_path, "missing", "echo missing")
+    missing.task_directory = tmp_path / "not-mounted"
+    task = make_task(tmp_path, "hello", "echo done")
+    executor = RemoteExecutor([worker()])
+
+    result = executor.run(missing, log_directory=tmp_path / "logs", tee=False)
+    expect(result.returncode).to(equal(127))
+    expect((tmp_path / "logs" / "stderr.log").read_text()).to(contain("not-mounted"))
+
+    expect(executor.run(task, tee=False).returncode).to(equal(0))
+    executor.close()
+
+
+def test_remote_executor_skips_tasks_without_entrypoint(worker, tmp_path):
+    task = make_task(tmp_path, "hello", "''")
+    executor = RemoteExecutor([worker()])
+
+    expect(executor.run(task)).to(be_none)
+    executor.close()
+
+
+def test_remote_executor_opens_a_connection_per_slot(worker):
+    executor = RemoteExecutor([worker(slots=2), worker()])
+
+    expect(executor.slots).to(equal(3))
+    executor.close()
+
+
+def test_remote_executor_runs_tasks_on_free_workers(worker, tmp_path):
+    tasks = [make_task(tmp_path, name, "sleep 0.5") for name in ["a", "b"]]
+    executor = RemoteExecutor([worker(), worker()])
+
+    threads = [
+        threading.Thread(target=executor.run, args=(task,), kwargs={"tee": False})
+        for task in tasks
+    ]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Each task ran on its own worker, so neither waited for the other.
+    expect(time.monotonic() - start).to(be_below(0.9))
+    executor.close()
+
+
+def test_worker_rejects_wrong_token(worker):
+    address = worker(token="secret")
+
+    expect(lambda: RemoteExecutor([address], token="guess")).to(
+        raise_error(ConnectionError, contain("Invalid token"))
+    )
+    RemoteExecutor([address], token="secret").close()
+
+
+def test_worker_accepts_non_ascii_token(worker):
+    address = worker(token="sécret")
+
+    expect(lambda: RemoteExecutor([address], token="secret")).to(
+        raise_error(ConnectionError, contain("Invalid token"))
+    )
+    RemoteExecutor([address], token="sécret").close()
+
+
+def test_worker_closes_connection_on_invalid_hello(worker):
+    host, port = parse_address(worker(token="secret"))
+
+    with patch.object(WorkerServer, "handle_error") as handle_error:
+        with socket.create_connection((host, port)) as sock:
+            sock.sendall(b"[]\n")
+            expect(sock.recv(1024)).to(equal(b""))
+
+    handle_error.assert_not_called()
+
+
+def test_remote_executor_retries_tasks_of_lost_workers(worker, tmp_path, capsys):
+    task = make_task(tmp_path, "hello", "echo done")
+    executor = RemoteExecutor([worker(), worker()])
+
+    lost = executor._free.get()
+    lost.close()
+    executor._free.put(lost)
+    executor._free.put(executor._free.get())
+
+    result = executor.run(task, log_directory=tmp_path / "logs", prefix="hello")
+    executor.close()
+
+    expect(result.returncode).to(equal(0))
+    expect(capsys.readouterr().err).to(contain(f"[hello] Lost worker {lost.address}"))
+
+
+def test_remote_executor_fails_tasks_when_no_workers_are_left(worker, tmp_path):
+    task = make_task(tmp_path, "hello", "echo done")
+    executor = RemoteExecutor([worker()])
+
+    lost = executor._free.get()
+    lost.close()
+    executor._free.put(lost)
+
+    expect(executor.run(task, tee=False).returncode).to(equal(1))
+
+
+def test_worker_closes_connection_when_a_request_fails(worker, tmp_path):
+    task = make_task(tmp_path, "hello", "echo done")
+    executor = RemoteExecutor([worker()])
+
+    with patch.object(WorkerHandler, "run", side_effect=OSError):
+        result = executor.run(task, tee=False)
+    executor.close()
+
+    expect(result.returncode).to(equal(1))
+
+
+def test_remote_executor_cancel_terminates_running_commands(worker, tmp_path):
+    task = make_task(tmp_path, "hello", "sleep 30; touch output/done.txt")
+    executor = RemoteExecutor([worker()])
+
+    threading.Timer(0.2, executor.cancel).start()
+    start = time.monotonic()
+    result = executor.run(task)
+    executor.close()
+
+    expect(result.returncode).to(equal(-15))
+    expect(time.monotonic() - start).to(be_below(10))
+    expect((task.output_folder / "done.txt").exists()).to(be_false)
+
+
+def test_remote_executor_times_out_and_retries(worker, tmp_path):
+    task = make_task(tmp_path, "hello", "sleep 30")
+    executor = RemoteExecutor([worker()])
+
+    with patch("pdp.process.RETRY_DELAY", 0):
+        result = executor.run(task, timeout=0.2, retries=1)
+    executor.close()
+
+    expect(result.timed_out).to(be_true)
+    expect(result.attempts).to(equal(2))
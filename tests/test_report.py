@@ -0,0 +1,84 @@
+from datetime import datetime, timezone
+from pathlib import Path
+
+from expects import *
+from rich.console import Console
+import pytest
+
+from pdp.process import ProcessResult
+from pdp.report import RunReport, format_bytes, format_duration
+
+
+@pytest.fixture
+def report():
+    return RunReport(
+        started_at=datetime(2025, 4, 1, 12, 30, tzinfo=timezone.utc),
+        wall_time=75.0,
+        returncode=1,
+        jobs=2,
+        results={
+            "clean": ProcessResult(0, 5.0, 4.0, 0.5, 10 * 1024**2),
+            "model": ProcessResult(2, 70.0, 60.0, 1.0, 3 * 1024**3),
+        },
+        skipped=["import"],
+    )
+
+
+def render(table):
+    console = Console(width=120, record=True)
+    console.print(table)
+    return console.export_text()
+
+
+def test_report_round_trips_through_json_file(report, fs):
+    path = report.write(Path("/.pdp/runs"))
+
+    expect(path.name).to(equal("20250401T123000000000Z.json"))
+    expect(RunReport.read(path).to_dict()).to(equal(report.to_dict()))
+
+
+def test_summary_table_lists_slowest_tasks_first(report):
+    text = render(report.summary_table())
+
+    expect(text.index("model")).to(be_below(text.index("clean")))
+    expect(text.index("clean")).to(be_below(text.index("import")))
+    expect(text).to(contain("3.0 GiB"))
+    expect(text).to(contain("skipped"))
+
+
+def test_summary_table_lists_tasks_that_were_not_run(report):
+    report.blocked = ["report"]
+    report.cancelled = ["export"]
+
+    text = render(report.summary_table())
+
+    expect(text).to(contain("blocked"))
+    expect(text).to(contain("cancelled"))
+    expect(text).to(contain("1 failed, 2 not run"))
+
+
+def test_summary_table_names_signals_that_killed_tasks(report):
+    report.results["model"].returncode = -15
+
+    expect(render(report.summary_table())).to(contain("SIGTERM"))
+
+
+def test_summary_table_shows_timeouts_and_attempts(report):
+    report.results["model"].timed_out = True
+    report.results["model"].attempts = 3
+
+    text = render(report.summary_table())
+
+    expect(text).to(contain("timeout"))
+    expect(text).to(contain("Attempts"))
+
+
+def test_format_duration():
+    expect(format_duration(1.234)).to(equal("1.23s"))
+    expect(format_duration(75)).to(equal("1m15.0s"))
+    expect(format_duration(3725)).to(equal("1h02m05s"))
+
+
+def test_format_bytes():
+    expect(format_bytes(512)).to(equal("512 B"))
+    expect(format_bytes(1536)).to(equal("1.5 KiB"))
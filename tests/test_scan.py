@@ -0,0 +1,87 @@
+import os
+from pathlib import Path
+
+from expects import *
+
+from pdp.scan import is_empty, scan_files, top_level_files
+
+
+def test_scan_files_lists_files_before_subdirectories_in_name_order(fs):
+    for path in ["/data/b.csv", "/data/a/z.csv", "/data/a/y/x.csv", "/data/c/w.csv"]:
+        fs.create_file(path)
+
+    relative_paths = [entry.relative_path for entry in scan_files("/data")]
+
+    expect(relative_paths).to(equal(["b.csv", "a/z.csv", "a/y/x.csv", "c/w.csv"]))
+
+
+def test_scan_files_includes_stat_of_each_file(fs):
+    fs.create_file("/data/a.csv", contents="a,b\n")
+
+    (entry,) = scan_files("/data")
+
+    expect(entry.path).to(equal(os.path.join("/data", "a.csv")))
+    expect(entry.stat.st_size).to(equal(4))
+
+
+def test_scan_files_follows_symlinks(fs):
+    fs.create_file("/upstream/output/a.csv")
+    os.makedirs("/data")
+    Path("/data/linked").symlink_to("/upstream/output")
+
+    relative_paths = [entry.relative_path for entry in scan_files("/data")]
+
+    expect(relative_paths).to(equal(["linked/a.csv"]))
+
+
+def test_scan_files_marks_dangling_symlinks(fs):
+    os.makedirs("/data")
+    Path("/data/missing.csv").symlink_to("/nowhere.csv")
+
+    (entry,) = scan_files("/data")
+
+    expect(entry.relative_path).to(equal("missing.csv"))
+    expect(entry.stat).to(be_none)
+
+
+def test_scan_files_marks_symlink_loops_as_dangling(fs):
+    os.makedirs("/data")
+    Path("/data/loop.csv").symlink_to("/data/loop.csv")
+
+    (entry,) = scan_files("/data")
+
+    expect(entry.relative_path).to(equal("loop.csv"))
+    expect(entry.stat).to(be_none)
+
+
+def test_scan_files_stops_at_symlink_cycles(fs):
+    fs.create_file("/data/a.csv")
+    Path("/data/loop").symlink_to("/data")
+
+    relative_paths = [entry.relative_path for entry in scan_files("/data")]
+
+    expect(relative_paths).to(equal(["a.csv"]))
+
+
+def test_scan_files_of_missing_folder_is_empty(fs):
+    expect(list(scan_files("/missing"))).to(be_empty)
+
+
+def test_top_level_files_lists_files_but_not_folders(fs):
+    fs.create_file("/task/task.yml")
+    fs.create_file("/task/Makefile")
+    fs.create_file("/task/src/main.py")
+    Path("/task/missing.mk").symlink_to("/nowhere.mk")
+
+    names = [entry.relative_path for entry in top_level_files("/task")]
+
+    expect(names).to(equal(["Makefile", "task.yml"]))
+
+
+def test_is_empty(fs):
+    os.makedirs("/empty")
+    fs.create_file("/full/a.csv")
+
+    expect(is_empty("/empty")).to(be_true)
+    expect(is_empty("/missing")).to(be_true)
+    expect(is_empty("/full")).to(be_false)
@@ -0,0 +1,381 @@
+import threading
+from pathlib import Path
+from unittest.mock import MagicMock
+
+from expects import *
+import pytest
+
+from pdp.pdp import PDP
+from pdp.process import ProcessResult
+from pdp.scheduler import Scheduler
+from pdp.cache import OutputCache
+from pdp.journal import RunJournal
+from pdp.state import BuildState
+
+
+@pytest.fixture
+def pdp(fs):
+    pdp = PDP("test")
+    pdp.initialize()
+
+    yield pdp
+
+
+def record_runs(pdp, runs, side_effect=None):
+    for key, task in pdp.dependency_graph().tasks.items():
+
+        def run_entrypoint(key=key, **kwargs):
+            if side_effect:
+                side_effect(key)
+            runs.append(key)
+            return ProcessResult(returncode=0)
+
+        task.run_entrypoint = MagicMock(side_effect=run_entrypoint)
+
+
+def test_scheduler_runs_tasks_in_declared_order(pdp):
+    hello = pdp.create_task("hello")
+    hello.create_subtask("child")
+    pdp.create_task("world")
+
+    runs = []
+    record_runs(pdp, runs)
+
+    return_code = Scheduler(pdp.dependency_graph()).run()
+
+    expect(runs).to(equal(["hello/child", "hello", "world"]))
+    expect(return_code).to(equal(0))
+
+
+def test_scheduler_runs_independent_tasks_concurrently(pdp):
+    pdp.create_task("hello")
+    pdp.create_task("world")
+
+    barrier = threading.Barrier(2, timeout=5)
+    runs = []
+    record_runs(pdp, runs, side_effect=lambda key: barrier.wait())
+
+    return_code = Scheduler(pdp.dependency_graph(), jobs=2).run()
+
+    expect(sorted(runs)).to(equal(["hello", "world"]))
+    expect(return_code).to(equal(0))
+
+
+def test_scheduler_waits_for_dependencies(pdp):
+    first = pdp.create_task("first")
+    pdp.create_task("second")
+    with open(first.task_config.path_to_config, "w") as f:
+        f.write("entrypoint: make\nsubtasks: []\ndepends_on: [second]")
+
+    runs = []
+    record_runs(pdp, runs)
+
+    Scheduler(pdp.dependency_graph(), jobs=4).run()
+
+    expect(runs).to(equal(["second", "first"]))
+
+
+def test_scheduler_returns_nonzero_if_any_task_fails(pdp):
+    hello = pdp.create_task("hello")
+    world = pdp.create_task("world")
+    hello.run_entrypoint = MagicMock(return_value=ProcessResult(returncode=2))
+    world.run_entrypoint = MagicMock(return_value=ProcessResult(returncode=0))
+
+    scheduler = Scheduler(pdp.dependency_graph())
+
+    expect(scheduler.run()).to(equal(1))
+    expect(scheduler.returncodes).to(equal({"hello": 2, "world": 0}))
+
+
+def test_scheduler_requires_at_least_one_job(pdp):
+    with pytest.raises(ValueError):
+        Scheduler(pdp.dependency_graph(), jobs=0)
+
+
+def test_scheduler_skips_up_to_date_tasks(pdp):
+    pdp.create_task("hello")
+    pdp.create_task("world")
+    state = BuildState("/.pdp/state.json")
+
+    runs = []
+    record_runs(pdp, runs)
+    Scheduler(pdp.dependency_graph(), state=state).run()
+
+    runs.clear()
+    scheduler = Scheduler(pdp.dependency_graph(), state=state)
+    scheduler.run()
+
+    expect(runs).to(equal([]))
+    expect(scheduler.skipped).to(equal({"hello", "world"}))
+
+
+def test_scheduler_reruns_changed_tasks_and_their_dependents(pdp):
+    first = pdp.create_task("first")
+    second = pdp.create_task("second")
+    pdp.create_task("third")
+    with open(first.task_config.path_to_config, "w") as f:
+        f.write("entrypoint: make\nsubtasks: []\ndepends_on: [second]")
+    state = BuildState("/.pdp/state.json")
+
+    runs = []
+    record_runs(pdp, runs)
+    Scheduler(pdp.dependency_graph(), state=state).run()
+
+    runs.clear()
+    (second.src_folder / "main.py").write_text("print('changed')")
+    Scheduler(pdp.dependency_graph(), state=state).run()
+
+    expect(runs).to(equal(["second", "first"]))
+
+
+def test_scheduler_force_runs_up_to_date_tasks(pdp):
+    pdp.create_task("hello")
+    state = BuildState("/.pdp/state.json")
+
+    runs = []
+    record_runs(pdp, runs)
+    Scheduler(pdp.dependency_graph(), state=state).run()
+    Scheduler(pdp.dependency_graph(), state=state, force=True).run()
+
+    expect(runs).to(equal(["hello", "hello"]))
+
+
+def test_scheduler_reruns_failed_tasks(pdp):
+    hello = pdp.create_task("hello")
+    state = BuildState("/.pdp/state.json")
+
+    hello.run_entrypoint = MagicMock(return_value=ProcessResult(returncode=1))
+    Scheduler(pdp.dependency_graph(), state=state).run()
+    Scheduler(pdp.dependency_graph(), state=state).run()
+
+    expect(hello.run_entrypoint.call_count).to(equal(2))
+
+
+def test_scheduler_logs_each_task_to_its_own_folder(pdp):
+    hello = pdp.create_task("hello")
+    foo = hello.create_subtask("foo")
+    hello.run_entrypoint = MagicMock(return_value=None)
+    foo.run_entrypoint = MagicMock(return_value=None)
+
+    Scheduler(pdp.dependency_graph(), log_directory=Path("/.pdp/logs"), tee=False).run()
+
+    foo.run_entrypoint.assert_called_once_with(
+        log_directory=Path("/.pdp/logs/hello/foo"),
+        prefix="hello/foo",
+        tee=False,
+        timeout=None,
+        retries=None,
+    )
+
+
+def test_scheduler_restores_outputs_from_cache_instead_of_running(pdp):
+    hello = pdp.create_task("hello")
+    with open(hello.task_config.path_to_config, "w") as f:
+        f.write("entrypoint: make\nsubtasks: []")
+
+    def make(**kwargs):
+        (hello.output_folder / "result.csv").write_text("a,b\n")
+        return ProcessResult(returncode=0)
+
+    hello.run_entrypoint = MagicMock(side_effect=make)
+    cache = OutputCache("/cache")
+
+    Scheduler(pdp.dependency_graph(), cache=cache).run()
+    (hello.output_folder / "result.csv").unlink()
+    scheduler = Scheduler(pdp.dependency_graph(), cache=cache)
+    scheduler.run()
+
+    hello.run_entrypoint.assert_called_once()
+    expect(scheduler.restored).to(equal({"hello"}))
+    expect((hello.output_folder / "result.csv").read_text()).to(equal("a,b\n"))
+
+
+def test_scheduler_does_not_restore_outputs_of_another_task(pdp):
+    for name in ("hello", "world"):
+        task = pdp.create_task(name)
+        with open(task.task_config.path_to_config, "w") as f:
+            f.write("entrypoint: make\nsubtasks: []")
+
+    runs = []
+    record_runs(pdp, runs)
+    scheduler = Scheduler(pdp.dependency_graph(), cache=OutputCache("/cache"))
+    scheduler.run()
+
+    expect(sorted(runs)).to(equal(["hello", "world"]))
+    expect(scheduler.restored).to(equal(set()))
+
+
+def test_scheduler_reruns_dependents_of_changed_outputs_despite_cache(pdp):
+    first = pdp.create_task("first")
+    second = pdp.create_task("second")
+    with open(first.task_config.path_to_config, "w") as f:
+        f.write("entrypoint: make\nsubtasks: []\ndepends_on: [second]")
+    with open(second.task_config.path_to_config, "w") as f:
+        f.write("entrypoint: make\nsubtasks: []")
+    (second.src_folder / "main.py").write_text("print('hello')")
+    cache = OutputCache("/cache")
+
+    runs = []
+
+    def write_output(key):
+        if key == "second":
+            source = (second.src_folder / "main.py").read_text()
+            (second.output_folder / "result.csv").write_text(source)
+
+    record_runs(pdp, runs, side_effect=write_output)
+    Scheduler(pdp.dependency_graph(), cache=cache).run()
+
+    runs.clear()
+    (second.src_folder / "main.py").write_text("print('changed')")
+    scheduler = Scheduler(pdp.dependency_graph(), cache=cache)
+    scheduler.run()
+
+    expect(runs).to(equal(["second", "first"]))
+    expect(scheduler.restored).to(equal(set()))
+
+
+def test_scheduler_does_not_cache_failed_runs(pdp):
+    hello = pdp.create_task("hello")
+    with open(hello.task_config.path_to_config, "w") as f:
+        f.write("entrypoint: make\nsubtasks: []")
+    hello.run_entrypoint = MagicMock(return_value=ProcessResult(returncode=1))
+    cache = OutputCache("/cache")
+
+    Scheduler(pdp.dependency_graph(), cache=cache).run()
+    Scheduler(pdp.dependency_graph(), cache=cache).run()
+
+    expect(hello.run_entrypoint.call_count).to(equal(2))
+
+
+def test_scheduler_prefetches_inputs_of_the_next_task(pdp):
+    for name in ["clean", "model", "report"]:
+        pdp.create_task(name)
+
+    events = []
+    prefetcher = MagicMock()
+    prefetcher.prefetch.side_effect = lambda key, folder: events.append(
+        ("prefetch", key, folder)
+    )
+    prefetcher.started.side_effect = lambda key: events.append(("started", key))
+    record_runs(pdp, [])
+
+    Scheduler(pdp.dependency_graph(), prefetcher=prefetcher).run()
+
+    expect(events).to(
+        contain_exactly(
+            ("started", "clean"),
+            ("prefetch", "model", Path("/model/input")),
+            ("started", "model"),
+            ("prefetch", "report", Path("/report/input")),
+            ("started", "report"),
+        )
+    )
+
+
+def test_scheduler_runs_tasks_with_its_executor(pdp):
+    pdp.create_task("hello")
+    executor = MagicMock()
+    executor.run.return_value = ProcessResult(returncode=0)
+
+    graph = pdp.dependency_graph()
+    Scheduler(graph, executor=executor, log_directory=Path("/.pdp/logs")).run()
+
+    executor.run.assert_called_once_with(
+        graph.tasks["hello"],
+        log_directory=Path("/.pdp/logs/hello"),
+        prefix="hello",
+        tee=True,
+        timeout=None,
+        retries=None,
+    )
+
+
+def write_depends_on(task, *dependencies):
+    with open(task.task_config.path_to_config, "w") as f:
+        f.write(
+            f"entrypoint: make\nsubtasks: []\ndepends_on: [{', '.join(dependencies)}]"
+        )
+
+
+def test_scheduler_does_not_run_dependents_of_failed_tasks(pdp):
+    pdp.create_task("clean")
+    write_depends_on(pdp.create_task("model"), "clean")
+    write_depends_on(pdp.create_task("report"), "model")
+    pdp.create_task("other")
+
+    executor = MagicMock()
+    executor.run.side_effect = lambda task, **kwargs: ProcessResult(
+        returncode=1 if task.task_name == "clean" else 0
+    )
+    scheduler = Scheduler(pdp.dependency_graph(), executor=executor)
+
+    expect(scheduler.run()).to(equal(1))
+    expect(scheduler.returncodes).to(equal({"clean": 1, "other": 0}))
+    expect(scheduler.blocked).to(equal({"model", "report"}))
+    expect(scheduler.cancelled).to(be_empty)
+
+
+def test_scheduler_fail_fast_cancels_tasks_that_have_not_started(pdp):
+    for name in ["clean", "model", "other"]:
+        pdp.create_task(name)
+
+    executor = MagicMock()
+    executor.run.return_value = ProcessResult(returncode=1)
+    scheduler = Scheduler(pdp.dependency_graph(), executor=executor, fail_fast=True)
+
+    expect(scheduler.run()).to(equal(1))
+    expect(executor.run.call_count).to(equal(1))
+    expect(scheduler.cancelled).to(equal({"model", "other"}))
+    executor.cancel.assert_called_once_with()
+
+
+def test_scheduler_fail_fast_terminates_running_tasks(pdp):
+    pdp.create_task("clean")
+    pdp.create_task("model")
+
+    terminated = threading.Event()
+
+    def run(task, **kwargs):
+        if task.task_name == "clean":
+            return ProcessResult(returncode=1)
+
+        terminated.wait(timeout=5)
+        return ProcessResult(returncode=-15)
+
+    executor = MagicMock()
+    executor.run.side_effect = run
+    executor.cancel.side_effect = terminated.set
+    scheduler = Scheduler(
+        pdp.dependency_graph(), jobs=2, executor=executor, fail_fast=True
+    )
+
+    expect(scheduler.run()).to(equal(1))
+    expect(terminated.is_set()).to(be_true)
+    expect(scheduler.returncodes).to(equal({"clean": 1, "model": -15}))
+
+
+def test_scheduler_journals_tasks_as_they_succeed(pdp):
+    pdp.create_task("clean")
+    write_depends_on(pdp.create_task("model"), "clean")
+    pdp.create_task("other")
+
+    executor = MagicMock()
+    executor.run.side_effect = lambda task, **kwargs: ProcessResult(
+        returncode=1 if task.task_name == "clean" else 0
+    )
+    journal = RunJournal("/.pdp/journal.json")
+    Scheduler(pdp.dependency_graph(), executor=executor, journal=journal).run()
+
+    journal = RunJournal.read("/.pdp/journal.json")
+    expect(journal.tasks).to(equal(["clean", "model", "other"]))
+    expect(journal.remaining).to(equal(["clean", "model"]))
+
+
+def test_scheduler_passes_timeout_and_retries_overrides(pdp):
+    pdp.create_task("hello")
+    executor = MagicMock()
+    executor.run.return_value = ProcessResult(returncode=0)
+
+    Scheduler(pdp.dependency_graph(), executor=executor, timeout=60, retries=2).run()
+
+    expect(executor.run.call_args.kwargs).to(have_keys(timeout=60, retries=2))
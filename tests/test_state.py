@@ -0,0 +1,95 @@
+from pathlib import Path
+
+from expects import *
+import pytest
+
+from pdp.task import Task
+from pdp.state import BuildState, input_fingerprint, output_fingerprint
+
+
+@pytest.fixture
+def task(fs):
+    task = Task("hello", Path("hello"))
+    task.scaffold()
+
+    return task
+
+
+def test_input_fingerprint_changes_when_src_changes(task):
+    before = input_fingerprint(task)
+
+    (task.src_folder / "clean.py").write_text("print('hello')")
+
+    expect(input_fingerprint(task)).not_to(equal(before))
+
+
+def test_input_fingerprint_changes_when_entrypoint_changes(task):
+    before = input_fingerprint(task)
+
+    with open(task.task_config.path_to_config, "w") as f:
+        f.write("entrypoint: make\nsubtasks: []")
+
+    expect(input_fingerprint(task)).not_to(equal(before))
+
+
+def test_input_fingerprint_changes_when_files_in_task_directory_change(task):
+    before = input_fingerprint(task)
+
+    Path("hello/Makefile").write_text("all:\n\ttouch output/done\n")
+
+    expect(input_fingerprint(task)).not_to(equal(before))
+
+
+def test_input_fingerprint_ignores_outputs_and_subtasks(task):
+    before = input_fingerprint(task)
+
+    (task.output_folder / "data.csv").write_text("a,b\n")
+    Path("hello/.output.previous").mkdir()
+    Path("hello/world").mkdir()
+    Path("hello/world/Makefile").write_text("all:\n")
+
+    expect(input_fingerprint(task)).to(equal(before))
+
+
+def test_input_fingerprint_follows_symlinks(task, fs):
+    upstream = Path("/upstream.csv")
+    upstream.write_text("a,b\n")
+    (task.input_folder / "data.csv").symlink_to(upstream)
+    before = input_fingerprint(task)
+
+    upstream.write_text("a,b\n1,2\n")
+
+    expect(input_fingerprint(task)).not_to(equal(before))
+
+
+def test_output_fingerprint_ignores_inputs(task):
+    before = output_fingerprint(task)
+
+    (task.input_folder / "data.csv").write_text("a,b\n")
+
+    expect(output_fingerprint(task)).to(equal(before))
+
+
+def test_build_state_round_trips_through_file(task):
+    state = BuildState("/.pdp/state.json")
+    state.record_success("hello", task, input_fingerprint(task))
+
+    expect(BuildState("/.pdp/state.json").is_up_to_date("hello", task)).to(be_true)
+
+
+def test_build_state_detects_changed_outputs(task):
+    state = BuildState("/.pdp/state.json")
+    state.record_success("hello", task, input_fingerprint(task))
+
+    (task.output_folder / "result.csv").write_text("a,b\n")
+
+    expect(state.is_up_to_date("hello", task)).to(be_false)
+
+
+def test_build_state_forgets_failed_tasks(task):
+    state = BuildState("/.pdp/state.json")
+    state.record_success("hello", task, input_fingerprint(task))
+
+    state.record_failure("hello")
+
+    expect(BuildState("/.pdp/state.json").is_up_to_date("hello", task)).to(be_false)
@@ -1,5 +1,4 @@
 import os
-import subprocess
 from pathlib import Path
 from unittest.mock import patch
 from itertools import count
@@ -9,6 +8,7 @@ from expects import *
 import pytest
 
 from pdp.task import Task
+from pdp.process import ProcessResult
 from pdp.pdp_config import TaskConfig
 
 
@@ -30,13 +30,17 @@ def test_task_runs_entrypoint_in_config(task, fs):
     with open(task.task_config.path_to_config, "w") as f:
         f.write("entrypoint: echo hello\nsubtasks: []")
 
-    mock_result = subprocess.CompletedProcess(
-        args=["echo", "hello"], returncode=0, stdout="hello\n"
-    )
+    mock_result = ProcessResult(returncode=0)
 
-    with patch("subprocess.run", return_value=mock_result) as mock_run:
+    with patch("pdp.task.run_process", return_value=mock_result) as mock_run:
         return_code = task.run()
-        mock_run.assert_called_once_with("echo hello", cwd=task.task_directory)
+        mock_run.assert_called_once_with(
+            "echo hello",
+            cwd=task.task_directory,
+            log_directory=None,
+            prefix="hello",
+            tee=True,
+        )
         expect(return_code).to(equal(0))
 
 
@@ -108,16 +112,124 @@ def test_task_runs_subtasks_if_exist(task, fs):
     with open(subtask.task_config.path_to_config, "w") as f:
         f.write("entrypoint: echo world\nsubtasks: []")
 
-    mock_result = subprocess.CompletedProcess(
-        args=["echo", "world"], returncode=0, stdout="world\n"
-    )
+    mock_result = ProcessResult(returncode=0)
 
-    with patch("subprocess.run", return_value=mock_result) as mock_run:
+    with patch("pdp.task.run_process", return_value=mock_result) as mock_run:
         return_code = task.run()
-        mock_run.assert_called_once_with("echo world", cwd=subtask.task_directory)
+        mock_run.assert_called_once_with(
+            "echo world",
+            cwd=subtask.task_directory,
+            log_directory=None,
+            prefix="world",
+            tee=True,
+        )
         expect(return_code).to(equal(0))
 
 
+def make_failing_subtasks(task):
+    task.scaffold()
+    with open(task.task_config.path_to_config, "w") as f:
+        f.write("entrypoint: echo hello\nsubtasks: [first, second]")
+
+    for name in ["first", "second"]:
+        subtask = task.create_subtask(name)
+        with open(subtask.task_config.path_to_config, "w") as f:
+            f.write(f"entrypoint: echo {name}\nsubtasks: []")
+
+
+def test_task_run_stops_at_first_failed_subtask(task, fs):
+    make_failing_subtasks(task)
+
+    with patch(
+        "pdp.task.run_process", return_value=ProcessResult(returncode=1)
+    ) as mock_run:
+        return_code = task.run()
+
+    expect(mock_run.call_count).to(equal(1))
+    expect(return_code).to(equal(1))
+
+
+@pytest.fixture
+def atomic_task(task, fs):
+    task.scaffold()
+    task.task_config.update_config({"entrypoint": "make", "atomic_output": True})
+    (task.output_folder / "old.csv").write_text("old")
+
+    return task
+
+
+def write_output(returncode):
+    def run_process(command, env, **kwargs):
+        (Path(env["PDP_OUTPUT"]) / "new.csv").write_text("new")
+        return ProcessResult(returncode=returncode)
+
+    return run_process
+
+
+def test_task_atomic_output_replaces_outputs_on_success(atomic_task, fs):
+    with patch("pdp.task.run_process", side_effect=write_output(0)):
+        atomic_task.run_entrypoint()
+
+    expect(os.listdir(atomic_task.output_folder)).to(equal(["new.csv"]))
+    expect(os.listdir(atomic_task.previous_output_folder)).to(equal(["old.csv"]))
+    expect(list(atomic_task.task_directory.glob(".output.staging.*"))).to(be_empty)
+
+
+def test_task_atomic_output_keeps_outputs_on_failure(atomic_task, fs):
+    with patch("pdp.task.run_process", side_effect=write_output(2)):
+        atomic_task.run_entrypoint()
+
+    expect(os.listdir(atomic_task.output_folder)).to(equal(["old.csv"]))
+    expect(list(atomic_task.task_directory.glob(".output.staging.*"))).to(be_empty)
+
+
+def test_task_rollback_output_swaps_previous_outputs_back(atomic_task, fs):
+    with patch("pdp.task.run_process", side_effect=write_output(0)):
+        atomic_task.run_entrypoint()
+
+    atomic_task.rollback_output()
+    expect(os.listdir(atomic_task.output_folder)).to(equal(["old.csv"]))
+
+    atomic_task.rollback_output()
+    expect(os.listdir(atomic_task.output_folder)).to(equal(["new.csv"]))
+
+
+def test_task_rollback_output_errs_without_previous_outputs(atomic_task, fs):
+    expect(atomic_task.rollback_output).to(raise_error(ValueError))
+
+
+def test_task_runs_entrypoint_with_timeout_and_retries_from_config(task, fs):
+    task.scaffold()
+    with open(task.task_config.path_to_config, "w") as f:
+        f.write("entrypoint: make\nsubtasks: []\ntimeout: 60\nretries: 2")
+
+    results = [ProcessResult(returncode=1, timed_out=True), ProcessResult(0)]
+
+    with (
+        patch("pdp.process.RETRY_DELAY", 0),
+        patch("pdp.task.run_process", side_effect=results) as mock_run,
+    ):
+        result = task.run_entrypoint()
+
+    expect(mock_run.call_count).to(equal(2))
+    expect(mock_run.call_args.kwargs["timeout"]).to(equal(60))
+    expect(result.attempts).to(equal(2))
+
+
+def test_task_run_entrypoint_overrides_timeout_and_retries(task, fs):
+    task.scaffold()
+    with open(task.task_config.path_to_config, "w") as f:
+        f.write("entrypoint: make\nsubtasks: []\ntimeout: 60\nretries: 2")
+
+    with patch(
+        "pdp.task.run_process", return_value=ProcessResult(returncode=1)
+    ) as mock_run:
+        task.run_entrypoint(timeout=5, retries=0)
+
+    expect(mock_run.call_count).to(equal(1))
+    expect(mock_run.call_args.kwargs["timeout"]).to(equal(5))
+
+
 def test_task_traverses_subtree(task, fs):
     task.scaffold()
     subtask = task.create_subtask("world")
@@ -133,3 +245,19 @@ def test_task_traverses_subtree(task, fs):
     expect(results).to(
         equal([(1, "hello"), (2, "world"), (3, "world2"), (4, "world_child")])
     )
+
+
+def test_task_detects_changed_inputs(task, fs):
+    task.scaffold()
+    (task.input_folder / "same.csv").write_text("a")
+    (task.input_folder / "changed.csv").write_text("b")
+    (task.input_folder / "removed.csv").write_text("c")
+    previous = task.input_digests()
+
+    (task.input_folder / "changed.csv").write_text("B")
+    (task.input_folder / "removed.csv").unlink()
+    (task.input_folder / "added.csv").write_text("d")
+
+    expect(task.changed_inputs(previous)).to(
+        equal({"changed.csv", "removed.csv", "added.csv"})
+    )
@@ -0,0 +1,122 @@
+import ctypes
+import errno
+import os
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+from expects import *
+import pytest
+
+from pdp.watch import (
+    InotifyWatcher,
+    PollingWatcher,
+    debounced,
+    walk_directories,
+    watch_folders,
+)
+
+
+@pytest.fixture
+def folder(fs):
+    fs.create_file("/hello/src/main.py", contents="print('hello')")
+
+    return Path("/hello/src")
+
+
+def test_walk_directories_does_not_follow_symlinks(fs):
+    os.makedirs("/hello/input/nested")
+    os.makedirs("/clean/output/nested")
+    os.symlink("/clean/output", "/hello/input/linked")
+
+    expect(sorted(walk_directories("/hello/input"))).to(
+        equal(["/hello/input", "/hello/input/nested"])
+    )
+
+
+def test_polling_watcher_reports_modified_added_and_removed_files(folder):
+    watcher = PollingWatcher([folder], interval=0.01)
+
+    (folder / "main.py").write_text("print('world')")
+    (folder / "new.py").write_text("")
+    expect(watcher.read()).to(equal({"/hello/src/main.py", "/hello/src/new.py"}))
+
+    (folder / "new.py").unlink()
+    expect(watcher.read()).to(equal({"/hello/src/new.py"}))
+
+
+def test_polling_watcher_times_out_without_changes(folder):
+    watcher = PollingWatcher([folder], interval=0.01)
+
+    expect(watcher.read(0.02)).to(equal(set()))
+
+
+def test_debounced_collects_bursts_of_changes():
+    class Watcher:
+        reads = [{"a"}, {"b"}, set(), {"c"}, set()]
+
+        def read(self, timeout=None):
+            return self.reads.pop(0)
+
+    bursts = debounced(Watcher(), 0.1)
+
+    expect(next(bursts)).to(equal({"a", "b"}))
+    expect(next(bursts)).to(equal({"c"}))
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="inotify is Linux only")
+def test_inotify_watcher_reports_changes_in_new_directories(tmp_path):
+    (tmp_path / "src").mkdir()
+    watcher = InotifyWatcher([tmp_path / "src"])
+
+    try:
+        (tmp_path / "src" / "main.py").write_text("print('hello')")
+        expect(watcher.read(1)).to(contain(str(tmp_path / "src" / "main.py")))
+
+        (tmp_path / "src" / "nested").mkdir()
+        watcher.read(1)
+        (tmp_path / "src" / "nested" / "a.py").write_text("")
+        changed = set()
+        while more := watcher.read(0.1):
+            changed |= more
+        expect(changed).to(contain(str(tmp_path / "src" / "nested" / "a.py")))
+
+        expect(watcher.read(0.01)).to(equal(set()))
+    finally:
+        watcher.close()
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="inotify is Linux only")
+def test_inotify_watcher_polls_once_watches_run_out(tmp_path, capsys):
+    (tmp_path / "src").mkdir()
+    watcher = InotifyWatcher([tmp_path / "src"])
+
+    def no_watches_left(*args):
+        ctypes.set_errno(errno.ENOSPC)
+        return -1
+
+    watcher._add_watch = no_watches_left
+
+    try:
+        (tmp_path / "src" / "nested").mkdir()
+        expect(watcher.read(1)).to(contain(str(tmp_path / "src" / "nested")))
+        expect(capsys.readouterr().err).to(contain("max_user_watches"))
+
+        (tmp_path / "src" / "nested" / "a.py").write_text("")
+        expect(watcher.read(2)).to(contain(str(tmp_path / "src" / "nested" / "a.py")))
+    finally:
+        watcher.close()
+
+
+def test_watch_folders_polls_when_folders_cannot_be_watched(folder, capsys):
+    error = OSError(errno.ENOSPC, os.strerror(errno.ENOSPC), "/hello/src")
+
+    with patch("pdp.watch.InotifyWatcher", side_effect=error):
+        watcher = watch_folders([folder])
+
+    expect(watcher).to(be_a(PollingWatcher))
+    expect(capsys.readouterr().err).to(contain("polling instead"))
+
+
+def test_watch_folders_falls_back_to_polling(folder):
+    expect(watch_folders([folder], poll=True)).to(be_a(PollingWatcher))